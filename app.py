@@ -5,15 +5,51 @@ import os
 from PySide6.QtWidgets import (
     QApplication,
     QFileDialog,
-    QMessageBox
+    QMessageBox,
+    QInputDialog
+)
+from PySide6.QtCore import (
+    QTimer,
+    QFileSystemWatcher
 )
 
 from ui import UI
 from model import Model
+from workers import (
+    FileLoader,
+    FileBatchLoader,
+    FileSaver,
+    IndexBuilder,
+    SnapshotWriter,
+    JournalRecovery,
+    CompareWorker,
+    SchemaValidation
+)
+from search import MAX_RESULTS
+from cache import DocumentCache
+from journal import (
+    EditJournal,
+    defaultJournalDir,
+    findJournals,
+    deleteJournal
+)
+from profiler import profiler
+from compare import CompareDialog
+from schema import (
+    SchemaChecker,
+    compileSchema
+)
 
 # GLOBALS
 CURR_DIR = os.path.dirname(os.path.realpath(__file__))
 TEMP_MSG_TIMEOUT = 3000
+# indents offered for saved files, None is compact json
+SAVE_FORMATS = [ 4, 2, None ]
+# ms between two checks for edit journals to compact
+JOURNAL_CHECK_INTERVAL = 10000
+# ms of quiet after a change notification before the file is read, another
+# program may write it in several steps
+RELOAD_DELAY = 500
 
 
 class CaseEditor:
@@ -25,52 +61,217 @@ class CaseEditor:
         self.app = QApplication([])
         self.model = Model()
         self.ui = UI()
+        self.fileLoader = None
+        # FileBatchLoader of the files opened together, if any
+        self.batchLoader = None
+        self.fileSavers = []
+        self.indexBuilders = []
+        self.documentCache = DocumentCache()
+        self.journalDir = defaultJournalDir()
+        self.journalTimer = QTimer(self.ui)
+        self.snapshotWriters = []
+        self.journalRecoveries = []
+        # open files are watched for changes made by other programs
+        self.fileWatcher = QFileSystemWatcher(self.ui)
+        self.changedFiles = set()
+        self.reloadTimer = QTimer(self.ui)
+        self.reloadTimer.setSingleShot(True)
+        self.reloadTimer.setInterval(RELOAD_DELAY)
+        self.fileReloaders = []
+        self.compareLoaders = []
+        self.compareWorkers = []
+        self.schemaValidations = []
 
     def run(self):
-        sys.exit(self.app.exec())
+        self.recoverJournals()
+        exitCode = self.app.exec()
+        for index in range(self.ui.tabList.count()):
+            self.storeViewState(index)
+        self.waitForWorkers()
+        # journals of unsaved tabs stay on disk for the next start
+        for tabData in self.model.tabDataList:
+            if( tabData.journal is not None ):
+                tabData.journal.close()
+        sys.exit(exitCode)
 
     def _createConnections(self):
         self.ui.tabList.tabCloseRequested.connect(self.tabClose)
+        self.ui.tabList.currentChanged.connect(self.tabChangedHandler)
+        self.ui.cancelButton.clicked.connect(self.cancelLoadHandler)
+        self.ui.tabEdited.connect(self.tabEditedHandler)
+        self.ui.searchRequested.connect(self.searchHandler)
+        self.journalTimer.timeout.connect(self.compactJournals)
+        self.journalTimer.start(JOURNAL_CHECK_INTERVAL)
+        self.fileWatcher.fileChanged.connect(self.fileChangedHandler)
+        self.reloadTimer.timeout.connect(self.checkChangedFiles)
 
         # fileMenu actions
         self.ui.newAction.triggered.connect(self.newActionHandler)
         self.ui.openAction.triggered.connect(self.openActionHandler)
+        self.ui.openFolderAction.triggered.connect(self.openFolderActionHandler)
         self.ui.saveAction.triggered.connect(self.saveActionHandler)
         self.ui.saveAsAction.triggered.connect(self.saveAsActionHandler)
         self.ui.closeAction.triggered.connect(self.closeActionHandler)
+        self.ui.saveFormatAction.triggered.connect(self.saveFormatActionHandler)
+        self.ui.clearCacheAction.triggered.connect(self.clearCacheActionHandler)
+        self.ui.reloadAction.triggered.connect(self.reloadActionHandler)
+        self.ui.attachSchemaAction.triggered.connect(self.attachSchemaActionHandler)
+        self.ui.detachSchemaAction.triggered.connect(self.detachSchemaActionHandler)
+
+        # viewMenu actions
+        self.ui.memoryBudgetAction.triggered.connect(self.memoryBudgetActionHandler)
+        self.ui.compareTabsAction.triggered.connect(self.compareTabsActionHandler)
+        self.ui.compareFilesAction.triggered.connect(self.compareFilesActionHandler)
 
         # editMenu actions
+        self.ui.undoAction.triggered.connect(self.undoActionHandler)
+        self.ui.redoAction.triggered.connect(self.redoActionHandler)
         self.ui.deleteAction.triggered.connect(self.deleteActionHandler)
         self.ui.insertAction.triggered.connect(self.insertActionHandler)
         self.ui.replaceAction.triggered.connect(self.replaceActionHandler)
+        self.ui.bulkReplaceAction.triggered.connect(self.bulkReplaceActionHandler)
 
+    @profiler.profiled("delete")
     def deleteActionHandler(self):
         currIndex = self.ui.tabList.currentIndex()
         if( currIndex < 0 ):
             return
-        deletionCount = self.ui.deleteCurrentSelectedItems()
+        with self.model.undoStack(currIndex).step():
+            deletionCount = self.ui.deleteCurrentSelectedItems()
         if( deletionCount > 0 ):
             self.model.setChangesSaved(False, currIndex)
+            self.ui.refreshSearch()
         self.ui.statusBar.showMessage(f"{deletionCount} items deleted.", TEMP_MSG_TIMEOUT)
 
+    @profiler.profiled("insert")
     def insertActionHandler(self):
         currIndex = self.ui.tabList.currentIndex()
         if( currIndex < 0 ):
             return
-        insertionCount = self.ui.insertCurrentSelectedItems()
+        with self.model.undoStack(currIndex).step():
+            insertionCount = self.ui.insertCurrentSelectedItems()
         if( insertionCount > 0 ):
             self.model.setChangesSaved(False, currIndex)
+            self.ui.refreshSearch()
         self.ui.statusBar.showMessage(f"{insertionCount} items inserted.", TEMP_MSG_TIMEOUT)
 
+    @profiler.profiled("replace")
     def replaceActionHandler(self):
+        self.replaceSelected(False)
+
+    @profiler.profiled("find and replace")
+    def bulkReplaceActionHandler(self):
+        self.replaceSelected(True)
+
+    def replaceSelected(self, bulk : bool):
         currIndex = self.ui.tabList.currentIndex()
         if( currIndex < 0 ):
             return
-        replaceCount = self.ui.replaceCurrentSelectedItems()
+        with self.model.undoStack(currIndex).step():
+            replaceCount = self.ui.replaceCurrentSelectedItems(bulk)
         if( replaceCount > 0 ):
             self.model.setChangesSaved(False, currIndex)
+            self.ui.refreshSearch()
         self.ui.statusBar.showMessage(f"{replaceCount} items replaced.", TEMP_MSG_TIMEOUT)
 
+    @profiler.profiled("undo")
+    def undoActionHandler(self):
+        self.revertStep(False)
+
+    @profiler.profiled("redo")
+    def redoActionHandler(self):
+        self.revertStep(True)
+
+    def revertStep(self, redo : bool):
+        currIndex = self.ui.tabList.currentIndex()
+        if( currIndex < 0 ):
+            return
+        revertCount = self.ui.undoCurrentTab(self.model.undoStack(currIndex), redo)
+        if( revertCount == 0 ):
+            self.ui.statusBar.showMessage(f"Nothing to {'redo' if redo else 'undo'}.", TEMP_MSG_TIMEOUT)
+            return
+        self.model.setChangesSaved(False, currIndex)
+        self.ui.refreshSearch()
+        self.ui.statusBar.showMessage(f"{revertCount} edits {'redone' if redo else 'undone'}.", TEMP_MSG_TIMEOUT)
+
+    def tabEditedHandler(self, tree):
+        index = self.ui.tabList.indexOf(tree)
+        if( index != -1 ):
+            self.model.setChangesSaved(False, index)
+            self.ui.refreshSearch()
+
+    def searchHandler(self, text : str):
+        currIndex = self.ui.tabList.currentIndex()
+        if( currIndex < 0 ):
+            return
+        searchIndex = self.model.searchIndex(currIndex)
+        if( text.strip() == "" ):
+            self.ui.showSearchResults([], MAX_RESULTS)
+            return
+        if( not searchIndex.isReady ):
+            # searched again by indexBuiltHandler
+            self.ui.statusBar.showMessage("Search index is still being built.")
+            return
+        with profiler.operation("search") as operation:
+            with operation.phase("query"):
+                paths = searchIndex.search(text)
+            operation.count("matches", len(paths))
+            self.ui.showSearchResults(paths, MAX_RESULTS)
+
+    def startIndexing(self, tabData, fileDataDict : dict):
+        '''
+        Build the search index of a tab in an IndexBuilder. The parsed data
+        is never mutated by the document, so it is shared, not copied.
+        '''
+        builder = IndexBuilder(tabData.searchIndex, fileDataDict)
+        builder.finished.connect(lambda: self.indexBuiltHandler(builder))
+        self.indexBuilders.append(builder)
+        builder.start()
+
+    def indexBuiltHandler(self, builder : IndexBuilder):
+        self.indexBuilders.remove(builder)
+        builder.deleteLater()
+        builder.searchIndex.finishBuild()
+        currIndex = self.ui.tabList.currentIndex()
+        if( currIndex >= 0 and self.model.searchIndex(currIndex) is builder.searchIndex and self.ui.searchEdit.text() != "" ):
+            self.searchHandler(self.ui.searchEdit.text())
+
+    def tabChangedHandler(self, index : int):
+        if( index < 0 ):
+            return
+        self.model.setActive(index)
+        if( self.ui.isTabHibernated(index) ):
+            with profiler.operation("wake"):
+                document = self.model.document(index)
+                document.wake()
+                self.ui.wakeTab(index, document)
+                self.ui.setTabSchema(index, self.model.tabData(index).schemaChecker)
+                if( self.model.tabData(index).diskChanged ):
+                    # changed on disk while hibernated
+                    self.reloadTab(index)
+        self.enforceMemoryBudget()
+
+    def enforceMemoryBudget(self):
+        '''
+        Hibernate the least recently active tabs until the estimated memory
+        of all tabs fits in the budget. Their edits are kept, see Document.hibernate.
+        '''
+        indexes = self.model.tabsToHibernate(self.ui.tabList.currentIndex())
+        if( len(indexes) == 0 ):
+            return
+        with profiler.operation("hibernate") as operation:
+            for index in indexes:
+                self.ui.hibernateTab(index)
+                self.model.document(index).hibernate()
+            operation.count("tabs", len(indexes))
+
+    def storeViewState(self, index : int):
+        if( self.model.isUntitledFile(index) or not self.ui.rememberViewAction.isChecked() ):
+            return
+        tree = self.ui.tabList.widget(index)
+        self.documentCache.setViewState(self.model.filePath(index), self.ui.viewState(tree))
+
+    @profiler.profiled("close")
     def tabClose(self, index):
         if( self.model.isUntitledFile(index) ):
             dlg = QMessageBox(self.ui)
@@ -81,9 +282,13 @@ class CaseEditor:
             button = dlg.exec()
 
             if( button == QMessageBox.Discard ):
+                self.discardJournal(index)
+                self.detachSchema(index)
+                self.model.searchIndex(index).cancel()
                 self.model.closeFile(index)
-                self.ui.tabList.removeTab(index)
+                self.ui.closeTab(index)
         else:
+            filePath = self.model.filePath(index)
             if( not self.model.areChangesSaved(index) ):
                 selected = QMessageBox.warning(
                     self.ui,
@@ -95,33 +300,258 @@ class CaseEditor:
                 if( selected == QMessageBox.Cancel):
                     return
                 if( selected == QMessageBox.Ok):
-                    self.model.saveFile(index, self.ui.tabToDict(index))
+                    # a running save must not land after this one
+                    self.waitForSave(self.model.tabData(index))
+                    self.model.saveFile(index)
+            self.storeViewState(index)
+            self.discardJournal(index)
+            self.detachSchema(index)
+            self.model.searchIndex(index).cancel()
             self.model.closeFile(index)
-            self.ui.tabList.removeTab(index)
+            self.ui.closeTab(index)
+            self.unwatchFile(filePath)
 
+    @profiler.profiled("new")
     def newActionHandler(self):
-        self.model.newFile()
-        self.ui.createTab("untitled", {})
+        document = self.model.newFile()
+        self.attachJournal(self.model.tabData(len(self.model.tabDataList) - 1))
+        self.ui.createTab("untitled", document)
+
+    def attachJournal(self, tabData, journal : EditJournal = None):
+        tabData.journal = journal or EditJournal(self.journalDir, tabData.filePath)
+        tabData.document.addListener(tabData.journal.applyEdit)
+
+    def discardJournal(self, index : int):
+        journal = self.model.tabData(index).journal
+        if( journal is not None ):
+            journal.discard()
+
+    def compactJournals(self):
+        '''
+        Write a snapshot of every tab whose journal grew too big, in a
+        SnapshotWriter. The journal is rotated first, edits made while the
+        snapshot is written go to the new one.
+        '''
+        writing = { writer.tabData for writer in self.snapshotWriters }
+        for index,tabData in enumerate(self.model.tabDataList):
+            journal = tabData.journal
+            if( journal is None or tabData in writing or tabData.document.isHibernated() or not journal.needsCompaction() ):
+                continue
+            gen = journal.rotate()
+            view = tabData.document.openView()
+            writer = SnapshotWriter(journal.snapshotPath(gen), view)
+            writer.tabData = tabData
+            writer.view = view
+            writer.finished.connect(lambda writer=writer, gen=gen: self.snapshotWrittenHandler(writer, gen))
+            self.snapshotWriters.append(writer)
+            writer.start()
+
+    def snapshotWrittenHandler(self, writer : SnapshotWriter, gen : int):
+        self.snapshotWriters.remove(writer)
+        writer.deleteLater()
+        writer.tabData.document.closeView(writer.view)
+        if( writer.error is None ):
+            writer.tabData.journal.commitCheckpoint(gen, "snapshot")
+
+    def recoverJournals(self):
+        '''
+        Offer to reopen the unsaved work found in the journals of editors
+        that did not exit cleanly.
+        '''
+        metas = findJournals(self.journalDir)
+        if( len(metas) == 0 ):
+            return
+        names = "\n".join( meta["filePath"] or "untitled" for meta in metas )
+        selected = QMessageBox.question(
+            self.ui,
+            "Recover Unsaved Changes",
+            f"Unsaved changes of {len(metas)} files were found:\n{names}\nRecover them?",
+            (QMessageBox.Ok | QMessageBox.Discard | QMessageBox.Cancel),
+            QMessageBox.Ok
+        )
+        if( selected == QMessageBox.Discard ):
+            for meta in metas:
+                deleteJournal(self.journalDir, meta)
+            return
+        if( selected != QMessageBox.Ok ):
+            return
+
+        for meta in metas:
+            recovery = JournalRecovery(self.journalDir, meta)
+            recovery.recovered.connect(self.journalRecoveredHandler)
+            recovery.failed.connect(self.journalRecoveryFailedHandler)
+            recovery.finished.connect(lambda recovery=recovery: self.journalRecoveryFinishedHandler(recovery))
+            self.journalRecoveries.append(recovery)
+            recovery.start()
+
+    def journalRecoveredHandler(self, meta : dict, dataDict : dict):
+        filePath = meta["filePath"]
+        document = self.model.openFile(filePath, dataDict)
+        index = len(self.model.tabDataList) - 1
+        tabData = self.model.tabData(index)
+        self.attachJournal(tabData, EditJournal.resume(self.journalDir, meta))
+        self.model.setChangesSaved(False, index)
+        if( filePath != "" ):
+            tabData.diskStat = Model.diskStat(filePath)
+            self.watchFile(filePath)
+        self.ui.createTab(filePath.split("/")[-1] if filePath != "" else "untitled", document)
+        self.startIndexing(tabData, dataDict)
+        self.ui.statusBar.showMessage(f"Recovered : {filePath or 'untitled'}", TEMP_MSG_TIMEOUT)
+
+    def journalRecoveryFailedHandler(self, meta : dict, error : str):
+        QMessageBox.warning(self.ui, "Recovery Failed", f"Could not recover {meta['filePath'] or 'untitled'}\n{error}")
+
+    def journalRecoveryFinishedHandler(self, recovery : JournalRecovery):
+        self.journalRecoveries.remove(recovery)
+        recovery.deleteLater()
 
     def openActionHandler(self):
-        filePath, _ = QFileDialog.getOpenFileName(
+        filePaths, _ = QFileDialog.getOpenFileNames(
             self.ui, 
-            "Open Case File", 
+            "Open Case Files", 
             CURR_DIR, 
             "Text files ( *.json )",
         )
+        self.openFiles(filePaths)
 
-        if( filePath == "" ):
+    def openFolderActionHandler(self):
+        dirPath = QFileDialog.getExistingDirectory(self.ui, "Open Folder", CURR_DIR)
+        if( dirPath == "" ):
+            return
+        filePaths = sorted(
+            entry.path
+            for entry in os.scandir(dirPath)
+            if entry.name.lower().endswith(".json") and entry.is_file()
+        )
+        if( not filePaths ):
+            self.ui.statusBar.showMessage(f"No json files in {dirPath}", TEMP_MSG_TIMEOUT)
             return
+        self.openFiles(filePaths)
 
-        if( self.model.isFileOpen(filePath) ):
+    def openFiles(self, filePaths : list):
+        '''
+        Open a tab for each file not open yet. A single file is loaded by a
+        FileLoader, with progress for its read, several are parsed side by
+        side by a FileBatchLoader and get their tab as each one finishes.
+        '''
+        keys = set()
+        toOpen = []
+        for filePath in filePaths:
+            key = Model.pathKey(filePath)
+            if( key not in keys and not self.model.isFileOpen(filePath) ):
+                keys.add(key)
+                toOpen.append(filePath)
+        if( not toOpen ):
+            return
+
+        if( self.fileLoader is not None or self.batchLoader is not None ):
+            self.ui.statusBar.showMessage("Another file is still loading.", TEMP_MSG_TIMEOUT)
             return
-    
-        tabName = filePath.split("/")[-1]
-        tabData = self.model.openFile(filePath)
-        self.ui.createTab(tabName, tabData)
+
+        if( len(toOpen) > 1 ):
+            self.startBatchLoad(toOpen)
+            return
+
+        filePath = toOpen[0]
+        self.fileLoader = FileLoader(filePath, self.documentCache.cacheDir)
+        self.fileLoader.progress.connect(self.ui.setProgress)
+        self.fileLoader.parsing.connect(lambda: self.ui.setProgressBusy(f"Parsing : {filePath}"))
+        self.fileLoader.loaded.connect(self.fileLoadedHandler)
+        self.fileLoader.failed.connect(self.fileLoadFailedHandler)
+        self.fileLoader.cancelled.connect(self.fileLoadCancelledHandler)
+        self.fileLoader.finished.connect(self.fileLoaderFinishedHandler)
+        self.ui.startProgress(f"Loading : {filePath}")
+        self.fileLoader.start()
+
+    def startBatchLoad(self, filePaths : list):
+        self.batchLoader = FileBatchLoader(filePaths, self.documentCache.cacheDir)
+        # (filePath, error) of the files that could not be opened, shown at the end
+        failures = []
+        self.batchLoader.progress.connect(self.ui.setProgress)
+        self.batchLoader.loaded.connect(self.batchFileLoadedHandler)
+        self.batchLoader.failed.connect(lambda filePath, error: failures.append(( filePath, error )))
+        self.batchLoader.cancelled.connect(lambda: self.ui.statusBar.showMessage("Loading cancelled.", TEMP_MSG_TIMEOUT))
+        self.batchLoader.finished.connect(lambda: self.batchLoaderFinishedHandler(failures))
+        self.ui.startProgress(f"Loading {len(filePaths)} files")
+        self.batchLoader.start()
+
+    def cancelLoadHandler(self):
+        if( self.fileLoader is not None ):
+            self.fileLoader.cancel()
+        if( self.batchLoader is not None ):
+            self.batchLoader.cancel()
+
+    def fileLoadedHandler(self, filePath : str, fileDataDict : dict):
+        loader = self.fileLoader
+        self.ui.stopProgress()
+        if( loader is None ):
+            self.addLoadedTab(filePath, fileDataDict, Model.diskStat(filePath), [], None)
+        else:
+            self.addLoadedTab(filePath, fileDataDict, loader.diskStat, loader.phases, loader.threadId)
         self.ui.statusBar.showMessage(f"File opened : {filePath}", TEMP_MSG_TIMEOUT)
 
+    def batchFileLoadedHandler(self, filePath : str, fileDataDict : dict):
+        loader = self.batchLoader
+        if( self.model.isFileOpen(filePath) ):
+            # opened another way while it was loading, e.g. recovered
+            return
+        self.addLoadedTab(filePath, fileDataDict, loader.diskStats[filePath], loader.phases[filePath], loader.threadId)
+        self.ui.statusBar.showMessage(f"File opened : {filePath}")
+
+    def addLoadedTab(self, filePath : str, fileDataDict : dict, diskStat, phases : list, threadId):
+        '''
+        Create the tab of a file parsed by a loader. phases are the loader's
+        (name, start, end) for the profiler, diskStat the Model.diskStat of
+        the file as it was read.
+        '''
+        start = phases[0][1] if phases else None
+        with profiler.operation("open", start) as operation:
+            for name,phaseStart,phaseEnd in phases:
+                operation.addPhase(name, phaseStart, phaseEnd, threadId)
+            tabName = filePath.split("/")[-1]
+            viewState = None
+            if( self.ui.rememberViewAction.isChecked() ):
+                viewState = self.documentCache.viewState(filePath)
+            with operation.phase("build tree"):
+                document = self.model.openFile(filePath, fileDataDict)
+                tabData = self.model.tabData(len(self.model.tabDataList) - 1)
+                self.attachJournal(tabData)
+                self.ui.createTab(tabName, document, viewState)
+            tabData.diskStat = diskStat
+            self.watchFile(filePath)
+            self.startIndexing(self.model.tabData(self.ui.tabList.count() - 1), fileDataDict)
+            schemaPath = self.documentCache.schemaPath(filePath)
+            if( schemaPath is not None ):
+                try:
+                    self.attachSchema(self.ui.tabList.count() - 1, schemaPath, fileDataDict)
+                except (OSError, ValueError) as e:
+                    self.ui.statusBar.showMessage(f"Could not attach the schema {schemaPath} : {e}", TEMP_MSG_TIMEOUT)
+            self.enforceMemoryBudget()
+
+    def fileLoadFailedHandler(self, filePath : str, error : str):
+        self.ui.stopProgress()
+        QMessageBox.warning(self.ui, "Open Failed", f"Could not open {filePath}\n{error}")
+
+    def fileLoadCancelledHandler(self, filePath : str):
+        self.ui.stopProgress()
+        self.ui.statusBar.showMessage(f"Loading cancelled : {filePath}", TEMP_MSG_TIMEOUT)
+
+    def fileLoaderFinishedHandler(self):
+        self.fileLoader.deleteLater()
+        self.fileLoader = None
+
+    def batchLoaderFinishedHandler(self, failures : list):
+        loader = self.batchLoader
+        self.batchLoader = None
+        loader.deleteLater()
+        self.ui.progressBar.hide()
+        self.ui.cancelButton.hide()
+        if( failures ):
+            details = "\n".join( f"{filePath}\n{error}" for filePath,error in failures )
+            QMessageBox.warning(self.ui, "Open Failed", f"Could not open {len(failures)} of {len(loader.filePaths)} files\n{details}")
+        elif( not loader.wasCancelled ):
+            self.ui.statusBar.showMessage(f"Opened {len(loader.filePaths)} files", TEMP_MSG_TIMEOUT)
+
     def saveActionHandler(self):
         currIndex = self.ui.tabList.currentIndex()
         if( currIndex == -1 ):
@@ -130,9 +560,7 @@ class CaseEditor:
         if( self.model.isUntitledFile(currIndex) ):
             self.saveAsActionHandler()
         else:
-            self.model.saveFile(currIndex, self.ui.tabToDict(currIndex))
-            filePath = self.model.filePath(currIndex)
-            self.ui.statusBar.showMessage(f"File saved : {filePath}", TEMP_MSG_TIMEOUT)
+            self.startSave(currIndex, self.model.filePath(currIndex), False)
 
     def saveAsActionHandler(self):
         currIndex = self.ui.tabList.currentIndex()
@@ -149,12 +577,430 @@ class CaseEditor:
         if( filePath == "" ):
             return
 
+        if( self.model.tabData(currIndex).isSaving ):
+            self.ui.statusBar.showMessage("File is still being saved.", TEMP_MSG_TIMEOUT)
+            return
+
         if( self.model.isUntitledFile(currIndex) ):
             self.ui.setTabName(currIndex, filePath.split("/")[-1])
             
-        dataDict = self.ui.tabToDict(currIndex)
-        self.model.saveAsFile(currIndex, dataDict, filePath)
-        self.ui.statusBar.showMessage(f"File Saved As : {filePath}", TEMP_MSG_TIMEOUT)
+        self.startSave(currIndex, filePath, True)
+
+    def startSave(self, index : int, filePath : str, isSaveAs : bool):
+        '''
+        Snapshot the tab on the GUI thread, then serialize and write it in a
+        FileSaver. A save requested while one is running for the same tab is
+        started when the running one finishes.
+        '''
+        tabData = self.model.tabData(index)
+        if( tabData.isSaving ):
+            tabData.saveRequested = True
+            self.ui.statusBar.showMessage("Save queued, file is still being saved.", TEMP_MSG_TIMEOUT)
+            return
+        if( tabData.diskChanged and filePath == tabData.filePath ):
+            selected = QMessageBox.warning(
+                self.ui,
+                "File Changed on Disk",
+                f"{filePath} was changed by another program since it was opened. Overwrite it?",
+                (QMessageBox.Ok | QMessageBox.Cancel),
+                QMessageBox.Cancel
+            )
+            if( selected != QMessageBox.Ok ):
+                return
+
+        tree = self.ui.tabList.widget(index)
+        # ended when the saver finishes, see fileSaverFinishedHandler
+        operation = profiler.begin("save")
+        with operation.phase("snapshot"):
+            view = tabData.document.openView()
+        saver = FileSaver(tabData, filePath, view, isSaveAs, self.model.saveIndent, operation)
+        # closed when the saver finishes, see fileSaverFinishedHandler
+        saver.view = view
+        # edits made from here on are not in the saved file
+        saver.journalGen = tabData.journal.rotate() if tabData.journal is not None else None
+        saver.saved.connect(lambda: self.fileSavedHandler(saver, tree))
+        saver.failed.connect(lambda error: self.fileSaveFailedHandler(saver, tree, error))
+        saver.finished.connect(lambda: self.fileSaverFinishedHandler(saver, tree))
+
+        tabData.isSaving = True
+        tabData.saveRequested = False
+        self.fileSavers.append(saver)
+        self.ui.setTabSaving(tree, True)
+        saver.start()
+
+    def fileSavedHandler(self, saver : FileSaver, tree):
+        tabData = saver.tabData
+        self.model.finishSave(tabData, saver.filePath, saver.editCount, saver.isSaveAs)
+        if( tabData.filePath == saver.filePath ):
+            tabData.diskStat = saver.diskStat
+            tabData.diskChanged = False
+            self.watchFile(saver.filePath)
+            index = self.ui.tabList.indexOf(tree)
+            if( index != -1 ):
+                self.ui.setTabConflict(index, False)
+        # a save as of a file that keeps its path does not change the tab's checkpoint
+        if( tabData.journal is not None and tabData.filePath == saver.filePath ):
+            tabData.journal.setFilePath(tabData.filePath)
+            if( tabData.areChangesSaved ):
+                tabData.journal.discard()
+            else:
+                tabData.journal.commitCheckpoint(saver.journalGen, "file")
+        if( saver.isSaveAs ):
+            self.ui.statusBar.showMessage(f"File Saved As : {saver.filePath}", TEMP_MSG_TIMEOUT)
+        else:
+            self.ui.statusBar.showMessage(f"File saved : {saver.filePath}", TEMP_MSG_TIMEOUT)
+
+    def fileSaveFailedHandler(self, saver : FileSaver, tree, error : str):
+        saver.tabData.isSaving = False
+        QMessageBox.warning(self.ui, "Save Failed", f"Could not save {saver.filePath}\n{error}")
+
+    def fileSaverFinishedHandler(self, saver : FileSaver, tree):
+        self.fileSavers.remove(saver)
+        saver.deleteLater()
+        saver.tabData.document.closeView(saver.view)
+
+        # the worker phases ran back to back from its start
+        phaseStart = saver.startTime
+        for name in ("serialize", "write", "sync"):
+            if( name in saver.timings ):
+                phaseEnd = phaseStart + saver.timings[name]
+                saver.operation.addPhase(name, phaseStart, phaseEnd, saver.threadId)
+                phaseStart = phaseEnd
+        profiler.end(saver.operation)
+
+        # the tab may have been closed while saving
+        index = self.ui.tabList.indexOf(tree)
+        if( index == -1 ):
+            return
+        self.ui.setTabSaving(tree, False)
+        if( saver.tabData.saveRequested and not self.model.isUntitledFile(index) ):
+            self.startSave(index, self.model.filePath(index), False)
+
+    def waitForSave(self, tabData):
+        for saver in self.fileSavers:
+            if( saver.tabData is tabData ):
+                saver.wait()
+
+    def waitForWorkers(self):
+        if( self.fileLoader is not None ):
+            self.fileLoader.cancel()
+            self.fileLoader.wait()
+        if( self.batchLoader is not None ):
+            self.batchLoader.cancel()
+            self.batchLoader.wait()
+        for builder in list(self.indexBuilders):
+            builder.searchIndex.cancel()
+            builder.wait()
+        for validation in list(self.schemaValidations):
+            validation.schemaChecker.cancel()
+            validation.wait()
+        for reloader in list(self.fileReloaders + self.compareLoaders):
+            reloader.cancel()
+            reloader.wait()
+        for worker in self.snapshotWriters + self.journalRecoveries + self.compareWorkers:
+            worker.wait()
+        # never quit in the middle of a save
+        for saver in list(self.fileSavers):
+            saver.wait()
+
+    def saveFormatActionHandler(self):
+        current = SAVE_FORMATS.index(self.model.saveIndent) if self.model.saveIndent in SAVE_FORMATS else 0
+        names = [ "Compact" if indent is None else f"Indent {indent}" for indent in SAVE_FORMATS ]
+        name, ok = QInputDialog.getItem(self.ui, "Save Format", "Format of saved files:", names, current, False)
+        if( ok ):
+            self.model.saveIndent = SAVE_FORMATS[names.index(name)]
+
+    def memoryBudgetActionHandler(self):
+        budget, ok = QInputDialog.getInt(
+            self.ui,
+            "Memory Budget",
+            "MB of open files kept before inactive tabs are hibernated:",
+            self.model.memoryBudget // ( 1024 * 1024 ),
+            16,
+            1024 * 1024
+        )
+        if( ok ):
+            self.model.memoryBudget = budget * 1024 * 1024
+            self.enforceMemoryBudget()
+
+    def watchFile(self, filePath : str):
+        if( filePath not in self.fileWatcher.files() and os.path.exists(filePath) ):
+            self.fileWatcher.addPath(filePath)
+
+    def unwatchFile(self, filePath : str):
+        if( filePath != "" and not self.model.isFileOpen(filePath) ):
+            self.fileWatcher.removePath(filePath)
+
+    def fileChangedHandler(self, filePath : str):
+        self.changedFiles.add(filePath)
+        self.reloadTimer.start()
+
+    def checkChangedFiles(self):
+        '''
+        Reload the tabs whose file was changed by another program. The
+        tab's own saves leave the file with the Model.diskStat it recorded.
+        '''
+        changedFiles = self.changedFiles
+        self.changedFiles = set()
+        for filePath in changedFiles:
+            # a file replaced by a rename is not watched anymore
+            self.watchFile(filePath)
+            for index,tabData in enumerate(self.model.tabDataList):
+                if( tabData.filePath != filePath or tabData.isSaving ):
+                    continue
+                diskStat = Model.diskStat(filePath)
+                if( diskStat is None ):
+                    self.ui.statusBar.showMessage(f"File deleted on disk : {filePath}")
+                    continue
+                if( diskStat == tabData.diskStat ):
+                    continue
+                tabData.diskChanged = True
+                self.reloadTab(index)
+
+    def reloadTab(self, index : int, discardChanges : bool = False):
+        '''
+        Read the file of a tab again in a FileLoader and patch the changes
+        into its tree, see reloadLoadedHandler. A tab with unsaved changes
+        is only flagged unless discardChanges, a hibernated tab is reloaded
+        when it is shown again.
+        '''
+        tabData = self.model.tabData(index)
+        filePath = tabData.filePath
+        if( not tabData.areChangesSaved and not discardChanges ):
+            self.ui.setTabConflict(index, True)
+            self.ui.statusBar.showMessage(f"{filePath} changed on disk, File > Reload from Disk discards the unsaved changes.")
+            return
+        if( self.ui.isTabHibernated(index) ):
+            return
+        for reloader in self.fileReloaders:
+            if( reloader.tabData is tabData ):
+                # read again once the running one is done
+                reloader.again = True
+                reloader.discardChanges = reloader.discardChanges or discardChanges
+                return
+        reloader = FileLoader(filePath, self.documentCache.cacheDir)
+        reloader.tabData = tabData
+        reloader.again = False
+        reloader.discardChanges = discardChanges
+        reloader.loaded.connect(lambda filePath, dataDict: self.reloadLoadedHandler(reloader, dataDict))
+        reloader.failed.connect(lambda filePath, error: self.ui.statusBar.showMessage(f"Could not reload {filePath} : {error}", TEMP_MSG_TIMEOUT))
+        reloader.finished.connect(lambda: self.reloaderFinishedHandler(reloader))
+        self.fileReloaders.append(reloader)
+        reloader.start()
+
+    def reloadLoadedHandler(self, reloader : FileLoader, dataDict : dict):
+        tabData = reloader.tabData
+        if( tabData not in self.model.tabDataList or reloader.again ):
+            return
+        index = self.model.tabDataList.index(tabData)
+        if( self.ui.isTabHibernated(index) or tabData.isSaving ):
+            # picked up again on wake or by the next change notification
+            return
+        if( not tabData.areChangesSaved and not reloader.discardChanges ):
+            # edited while the file was read
+            self.ui.setTabConflict(index, True)
+            return
+        with profiler.operation("reload", reloader.phases[0][1] if reloader.phases else None) as operation:
+            for name,phaseStart,phaseEnd in reloader.phases:
+                operation.addPhase(name, phaseStart, phaseEnd, reloader.threadId)
+            try:
+                with operation.phase("patch"):
+                    with self.model.undoStack(index).step():
+                        editCount = self.ui.patchTab(index, dataDict)
+            except ValueError as e:
+                self.ui.statusBar.showMessage(f"Could not reload {tabData.filePath} : {e}, close and open it again.")
+                return
+            operation.count("edits", editCount)
+        tabData.diskStat = reloader.diskStat
+        tabData.diskChanged = False
+        # the tab holds the file as it is on disk now
+        self.model.setChangesSaved(True, index)
+        if( tabData.journal is not None ):
+            tabData.journal.discard()
+        self.ui.setTabConflict(index, False)
+        self.ui.refreshSearch()
+        self.ui.statusBar.showMessage(f"Reloaded : {tabData.filePath} ({editCount} edits)", TEMP_MSG_TIMEOUT)
+
+    def reloaderFinishedHandler(self, reloader : FileLoader):
+        self.fileReloaders.remove(reloader)
+        reloader.deleteLater()
+        tabData = reloader.tabData
+        if( reloader.again and tabData in self.model.tabDataList ):
+            self.reloadTab(self.model.tabDataList.index(tabData), reloader.discardChanges)
+
+    def reloadActionHandler(self):
+        currIndex = self.ui.tabList.currentIndex()
+        if( currIndex < 0 or self.model.isUntitledFile(currIndex) ):
+            return
+        if( not self.model.areChangesSaved(currIndex) ):
+            selected = QMessageBox.warning(
+                self.ui,
+                "Reload from Disk",
+                "The unsaved changes will be lost!",
+                (QMessageBox.Ok | QMessageBox.Cancel),
+                QMessageBox.Cancel
+            )
+            if( selected != QMessageBox.Ok ):
+                return
+        self.reloadTab(currIndex, True)
+
+    def attachSchemaActionHandler(self):
+        currIndex = self.ui.tabList.currentIndex()
+        if( currIndex < 0 ):
+            return
+        schemaPath, _ = QFileDialog.getOpenFileName(
+            self.ui,
+            "Attach Schema",
+            CURR_DIR,
+            "Json Schema files ( *.json )",
+        )
+        if( schemaPath == "" ):
+            return
+        try:
+            self.attachSchema(currIndex, schemaPath)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self.ui, "Attach Schema Failed", f"Could not use {schemaPath}\n{e}")
+            return
+        if( not self.model.isUntitledFile(currIndex) ):
+            self.documentCache.setSchemaPath(self.model.filePath(currIndex), schemaPath)
+
+    def detachSchemaActionHandler(self):
+        currIndex = self.ui.tabList.currentIndex()
+        if( currIndex < 0 or self.model.tabData(currIndex).schemaChecker is None ):
+            return
+        self.detachSchema(currIndex)
+        if( not self.model.isUntitledFile(currIndex) ):
+            self.documentCache.setSchemaPath(self.model.filePath(currIndex), None)
+
+    def attachSchema(self, index : int, schemaPath : str, dataDict : dict = None):
+        '''
+        Validate a tab against the json schema in schemaPath, compiled once:
+        the whole data in a SchemaValidation, then edit by edit. dataDict is
+        the data of the tab if at hand, a snapshot is taken otherwise.
+        Raises OSError, or ValueError for a bad schema.
+        '''
+        schema = compileSchema(Model.readFile(schemaPath))
+        self.detachSchema(index)
+        tabData = self.model.tabData(index)
+        checker = SchemaChecker(schema, schemaPath)
+        checker.onChange = self.ui.schemaChanged
+        tabData.schemaChecker = checker
+        tabData.document.addListener(checker.applyEdit)
+        self.ui.setTabSchema(index, checker)
+        if( dataDict is None ):
+            dataDict = self.model.snapshot(index)
+        validation = SchemaValidation(checker, dataDict)
+        validation.finished.connect(lambda: self.schemaValidatedHandler(validation))
+        self.schemaValidations.append(validation)
+        validation.start()
+
+    def detachSchema(self, index : int):
+        tabData = self.model.tabData(index)
+        checker = tabData.schemaChecker
+        if( checker is None ):
+            return
+        checker.cancel()
+        checker.onChange = None
+        tabData.document.removeListener(checker.applyEdit)
+        tabData.schemaChecker = None
+        self.ui.setTabSchema(index, None)
+
+    def schemaValidatedHandler(self, validation : SchemaValidation):
+        self.schemaValidations.remove(validation)
+        validation.deleteLater()
+        checker = validation.schemaChecker
+        if( not any( tabData.schemaChecker is checker for tabData in self.model.tabDataList ) ):
+            # detached meanwhile
+            return
+        checker.finishBuild()
+
+    def compareTabsActionHandler(self):
+        currIndex = self.ui.tabList.currentIndex()
+        if( currIndex < 0 ):
+            return
+        others = [ index for index in range(self.ui.tabList.count()) if index != currIndex ]
+        if( len(others) == 0 ):
+            self.ui.statusBar.showMessage("Open another tab to compare with.", TEMP_MSG_TIMEOUT)
+            return
+        names = [ f"{index + 1} : {self.ui.tabTitle(index)}" for index in others ]
+        name, ok = QInputDialog.getItem(self.ui, "Compare with Tab", f"Compare {self.ui.tabTitle(currIndex)} with:", names, 0, False)
+        if( not ok ):
+            return
+        otherIndex = others[names.index(name)]
+        self.startCompare(
+            self.ui.tabTitle(currIndex),
+            self.ui.tabTitle(otherIndex),
+            self.model.snapshot(currIndex),
+            self.model.snapshot(otherIndex)
+        )
+
+    def compareFilesActionHandler(self):
+        filePaths = []
+        for side in ( "Left", "Right" ):
+            filePath, _ = QFileDialog.getOpenFileName(
+                self.ui,
+                f"Compare : {side} File",
+                CURR_DIR,
+                "Text files ( *.json )",
+            )
+            if( filePath == "" ):
+                return
+            filePaths.append(filePath)
+
+        # the data of each side once it is loaded, compared when both are
+        loaded = {}
+        loaders = [ FileLoader(filePath, self.documentCache.cacheDir) for filePath in filePaths ]
+
+        def loadedHandler(side : int, dataDict : dict):
+            loaded[side] = dataDict
+            if( len(loaded) == 2 ):
+                self.startCompare(*[ os.path.basename(filePath) for filePath in filePaths ], loaded[0], loaded[1])
+
+        def failedHandler(filePath : str, error : str):
+            for loader in loaders:
+                loader.cancel()
+            QMessageBox.warning(self.ui, "Compare Failed", f"Could not open {filePath}\n{error}")
+
+        for side,loader in enumerate(loaders):
+            loader.loaded.connect(lambda filePath, dataDict, side=side: loadedHandler(side, dataDict))
+            loader.failed.connect(failedHandler)
+            loader.finished.connect(lambda loader=loader: self.compareLoaderFinishedHandler(loader))
+            self.compareLoaders.append(loader)
+            loader.start()
+        self.ui.statusBar.showMessage(f"Loading : {filePaths[0]} and {filePaths[1]}")
+
+    def compareLoaderFinishedHandler(self, loader : FileLoader):
+        self.compareLoaders.remove(loader)
+        loader.deleteLater()
+
+    def startCompare(self, leftName : str, rightName : str, leftData, rightData):
+        '''
+        Diff two documents in a CompareWorker and show the differences in a
+        CompareDialog once it is done.
+        '''
+        worker = CompareWorker(leftData, rightData)
+        worker.finished.connect(lambda: self.compareFinishedHandler(worker, leftName, rightName))
+        self.compareWorkers.append(worker)
+        self.ui.statusBar.showMessage(f"Comparing : {leftName} and {rightName}")
+        worker.start()
+
+    def compareFinishedHandler(self, worker : CompareWorker, leftName : str, rightName : str):
+        self.compareWorkers.remove(worker)
+        worker.deleteLater()
+        if( worker.root is None ):
+            self.ui.statusBar.showMessage(f"Could not compare {leftName} and {rightName}.", TEMP_MSG_TIMEOUT)
+            return
+        with profiler.operation("compare", worker.startTime) as operation:
+            operation.addPhase("diff", worker.startTime, worker.endTime, worker.threadId)
+            operation.count("differences", len(worker.differences))
+            with operation.phase("show"):
+                dialog = CompareDialog(leftName, rightName, worker.differences, worker.truncated, worker.root, self.ui)
+                dialog.show()
+        self.ui.statusBar.showMessage(f"Compared in {worker.endTime - worker.startTime:.2f} s : {leftName} and {rightName}", TEMP_MSG_TIMEOUT)
+
+    def clearCacheActionHandler(self):
+        self.documentCache.clear()
+        self.ui.statusBar.showMessage("Document cache cleared.", TEMP_MSG_TIMEOUT)
 
     def closeActionHandler(self):
         self.ui.close()
@@ -0,0 +1,265 @@
+'''
+Apply the same edits to many json files from the command line, without Qt.
+
+    python batch.py OPERATIONS FILE_OR_DIR [FILE_OR_DIR ...] [--jobs 8] [--indent 4] [--dry-run]
+
+OPERATIONS is a json file holding a list of edits, applied in order to
+every file:
+
+    [
+        { "op" : "insert", "path" : "solver", "key" : "tolerance", "text" : "1e-6" },
+        { "op" : "replace", "path" : "solver.maxIter", "text" : "200" },
+        { "op" : "replace", "path" : "solver.old", "key" : "new" },
+        { "op" : "delete", "path" : [ "mesh", "cells", 0 ] }
+    ]
+
+A path is a list of keys or a string of keys joined by dots, an array item
+is found by its index. Insert appends key and value to the branch at path,
+like Edit > Insert (the key is ignored in an array), replace gives the node
+at path a new key and/or value and delete removes it. A value is given as
+"text", converted like the text typed in the editor (parser.toJSONValue),
+or as "value", taken as is. Inserting or renaming onto a key the branch
+already has fails the file, which is then left as it is.
+
+Files are read, edited and written back atomically by a pool of processes,
+one line is printed per file with its timings. --dry-run prints a diff of
+every file instead of writing it.
+'''
+import argparse
+import concurrent.futures
+import difflib
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import parser
+from model import (
+    CODEC,
+    DEFAULT_INDENT,
+    Document,
+    Model
+)
+
+# GLOBALS
+OPERATIONS = [ "insert", "delete", "replace" ]
+
+
+def parseOperations(operations : list) -> list:
+    '''
+    Check a list of edits as read from the operations file and return them
+    as (op, path, key, value, hasValue) tuples. Raises ValueError.
+    '''
+    if( type(operations) is not list ):
+        raise ValueError("the operations must be a json list")
+    parsed = []
+    for number,operation in enumerate(operations, 1):
+        if( type(operation) is not dict or operation.get("op") not in OPERATIONS ):
+            raise ValueError(f"operation {number}: op must be one of {', '.join(OPERATIONS)}")
+        op = operation["op"]
+        path = operation.get("path", [])
+        if( type(path) is str ):
+            path = [ key for key in path.split(".") if key != "" ]
+        if( type(path) is not list ):
+            raise ValueError(f"operation {number}: path must be a list or a dotted string")
+        if( "text" in operation and "value" in operation ):
+            raise ValueError(f"operation {number}: give either text or value")
+        hasValue = ( "text" in operation or "value" in operation )
+        if( "text" in operation ):
+            if( type(operation["text"]) is not str ):
+                raise ValueError(f"operation {number}: text must be a string")
+            value = parser.toJSONValue(operation["text"])
+        else:
+            value = operation.get("value")
+        key = operation.get("key")
+        if( key is not None and type(key) is not str ):
+            raise ValueError(f"operation {number}: key must be a string")
+
+        if( op == "insert" and ( key is None or not hasValue ) ):
+            raise ValueError(f"operation {number}: insert needs a key and a text or value")
+        if( op in ( "delete", "replace" ) and len(path) == 0 ):
+            raise ValueError(f"operation {number}: {op} needs a path")
+        if( op == "replace" and key is None and not hasValue ):
+            raise ValueError(f"operation {number}: replace needs a key, a text or a value")
+        parsed.append(( op, path, key, value, hasValue ))
+    return parsed
+
+
+def findNode(document : Document, path : list):
+    '''
+    Node at path, where the keys of array items may be given as digit
+    strings, or None.
+    '''
+    node = document.root
+    keys = []
+    for key in path:
+        if( node.isArray and type(key) is str and key.isdigit() ):
+            key = int(key)
+        keys.append(key)
+        node = document.nodeAtPath(keys)
+        if( node is None ):
+            return None
+    return node
+
+
+def applyOperations(document : Document, operations : list, skipMissing : bool) -> int:
+    '''
+    Apply parsed operations to document, returns the number applied. Raises
+    ValueError for a missing path unless skipMissing.
+    '''
+    applied = 0
+    for op, path, key, value, hasValue in operations:
+        node = findNode(document, path)
+        if( node is None ):
+            if( skipMissing ):
+                continue
+            raise ValueError(f"no key path {'.'.join(map(str, path))}")
+
+        if( op == "insert" ):
+            document.insertPairs(node, [ (key, value) ])
+        elif( op == "delete" ):
+            document.removeNode(node)
+        else:
+            if( key is not None and key != node.key ):
+                if( node.parent.isArray ):
+                    raise ValueError(f"{'.'.join(map(str, path))} is an array item, it has no key")
+                document.setKey(node, key)
+            if( hasValue ):
+                document.setValue(node, value)
+        applied += 1
+    return applied
+
+
+def _newResult(filePath : str) -> dict:
+    return { "path" : filePath, "error" : None, "applied" : 0, "timings" : {}, "diff" : None }
+
+
+def editFile(filePath : str, operations : list, indent : int, dryRun : bool, skipMissing : bool) -> dict:
+    '''
+    Read, edit and write one file. Runs in a pool process, so it returns a
+    plain dict: path, error (None on success), applied, timings and diff.
+    '''
+    result = _newResult(filePath)
+    timings = result["timings"]
+    try:
+        start = time.perf_counter()
+        data = Model.readBytes(filePath)
+        parseStart = time.perf_counter()
+        timings["read"] = parseStart - start
+        fileData = CODEC.loads(data)
+        del data
+        editStart = time.perf_counter()
+        timings["parse"] = editStart - parseStart
+        # the document never mutates the parsed data, it is the diff's "before"
+        document = Document(fileData)
+        result["applied"] = applyOperations(document, operations, skipMissing)
+        timings["edit"] = time.perf_counter() - editStart
+
+        if( result["applied"] == 0 ):
+            # nothing changed, the file is left alone
+            return result
+        if( dryRun ):
+            diffStart = time.perf_counter()
+            before = CODEC.dumps(fileData, indent).decode("utf-8").splitlines(keepends=True)
+            after = CODEC.dumps(document.toDict(), indent).decode("utf-8").splitlines(keepends=True)
+            diff = "".join(difflib.unified_diff(before, after, filePath, filePath + " (edited)"))
+            # the dumps end without a newline
+            result["diff"] = diff if diff.endswith("\n") else diff + "\n"
+            timings["diff"] = time.perf_counter() - diffStart
+        else:
+            Model.writeFile(filePath, document.dumpSource(), timings, indent)
+    except (OSError, ValueError, TypeError) as e:
+        result["error"] = str(e)
+    except Exception as e:
+        # e.g. the RecursionError of deeply nested data, only this file fails
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def expandPaths(paths : list) -> list:
+    '''
+    The given files, with every directory replaced by its json files.
+    '''
+    filePaths = []
+    for path in paths:
+        if( os.path.isdir(path) ):
+            filePaths.extend(sorted(glob.glob(os.path.join(glob.escape(path), "*.json"))))
+        else:
+            filePaths.append(path)
+    return filePaths
+
+
+def formatResult(result : dict) -> str:
+    timings = result["timings"]
+    total = sum(timings.values())
+    phases = " ".join( f"{name} {seconds:.3f}s" for name,seconds in timings.items() )
+    if( result["error"] is not None ):
+        return f"failed {total:8.3f}s {result['path']} : {result['error']}"
+    return f"ok     {total:8.3f}s {result['path']} ({result['applied']} edits; {phases})"
+
+
+def runAll(filePaths : list, operations : list, jobs : int, indent : int, dryRun : bool, skipMissing : bool) -> int:
+    '''
+    Edit every file in a pool of jobs processes, printing each result as it
+    comes. Returns the number of files that failed.
+    '''
+    failures = 0
+    start = time.perf_counter()
+
+    def report(result : dict) -> None:
+        nonlocal failures
+        if( result["error"] is not None ):
+            failures += 1
+            print(formatResult(result), file=sys.stderr)
+            return
+        if( result["diff"] ):
+            sys.stdout.write(result["diff"])
+        print(formatResult(result), file=sys.stderr)
+
+    args = ( operations, indent, dryRun, skipMissing )
+    if( jobs == 1 or len(filePaths) == 1 ):
+        for filePath in filePaths:
+            report(editFile(filePath, *args))
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=ctx) as pool:
+            futures = { pool.submit(editFile, filePath, *args) : filePath for filePath in filePaths }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # raised getting the result back, e.g. a worker that died
+                    result = _newResult(futures[future])
+                    result["error"] = f"{type(e).__name__}: {e}"
+                report(result)
+
+    print(f"{len(filePaths) - failures} of {len(filePaths)} files edited in {time.perf_counter() - start:.3f}s", file=sys.stderr)
+    return failures
+
+
+def main() -> None:
+    argParser = argparse.ArgumentParser(description="Apply the same edits to many json files.")
+    argParser.add_argument("operations", help="json file with the list of edits")
+    argParser.add_argument("paths", nargs="+", help="json files, or directories of json files")
+    argParser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="processes editing files in parallel")
+    argParser.add_argument("--indent", default=str(DEFAULT_INDENT), help="spaces per level of the written files, or none for compact json")
+    argParser.add_argument("--dry-run", action="store_true", help="print a diff of every file instead of writing it")
+    argParser.add_argument("--skip-missing", action="store_true", help="skip edits whose path a file does not have instead of failing it")
+    args = argParser.parse_args()
+
+    indent = None if args.indent.lower() == "none" else int(args.indent)
+    try:
+        with open(args.operations, encoding="utf-8") as f:
+            operations = parseOperations(json.load(f))
+    except (OSError, ValueError) as e:
+        sys.exit(f"{args.operations}: {e}")
+
+    filePaths = expandPaths(args.paths)
+    failures = runAll(filePaths, operations, max(args.jobs, 1), indent, args.dry_run, args.skip_missing)
+    sys.exit(1 if failures > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+'''
+Benchmarks of the open, render, edit and save paths.
+
+    python bench.py [--sizes 1000 10000] [--shapes wide deep] [--output results.json]
+    python bench.py --compare before.json after.json
+
+Every (shape, size) case runs in a fresh process on a synthetic file, so the
+peak RSS reported for it is its own. Results are written as json, the
+compare mode prints the time ratio of every operation between two runs.
+'''
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# must be set before Qt is imported
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# GLOBALS
+SIZES = [ 1000, 10000, 100000, 1000000 ]
+SHAPES = [ "wide", "deep", "strings", "arrays" ]
+# nesting of every chain of the deep shape
+DEEP_DEPTH = 32
+LONG_STRING_LENGTH = 256
+ARRAY_LENGTH = 16
+CURR_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+def makeData(shape : str, size : int) -> dict:
+    '''
+    Synthetic json with about size keys in total.
+    wide : every key at the top level
+    deep : chains of DEEP_DEPTH nested keys
+    strings : LONG_STRING_LENGTH character values
+    arrays : number arrays and small arrays of objects as values
+    '''
+    if( shape == "wide" ):
+        values = [ 1, 2.5, "text", True, None ]
+        return { f"key{i}" : values[i % len(values)] for i in range(size) }
+
+    if( shape == "deep" ):
+        data = {}
+        for i in range(max(1, size // DEEP_DEPTH)):
+            chain = { "leaf" : i }
+            for level in range(DEEP_DEPTH - 2, -1, -1):
+                chain = { f"level{level}" : chain }
+            data[f"chain{i}"] = chain
+        return data
+
+    if( shape == "strings" ):
+        text = ( "lorem ipsum dolor sit amet " * ( LONG_STRING_LENGTH // 27 + 1 ) )[:LONG_STRING_LENGTH]
+        return { f"group{i // 100}" : { f"key{j}" : text for j in range(100) } for i in range(0, size, 100) }
+
+    if( shape == "arrays" ):
+        data = {}
+        for i in range(size):
+            if( i % 4 == 0 ):
+                data[f"key{i}"] = [ { "x" : j, "y" : "s" } for j in range(2) ]
+            else:
+                data[f"key{i}"] = list(range(ARRAY_LENGTH))
+        return data
+
+    raise ValueError(f"unknown shape : {shape}")
+
+
+def peakRss() -> int:
+    '''
+    Peak resident set size of this process in KiB, None where unknown.
+    '''
+    if( resource is None ):
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def runCase(shape : str, size : int) -> list:
+    '''
+    Time every operation on one synthetic file. Runs in its own process.
+    '''
+    from PySide6.QtCore import QCoreApplication
+    import app
+    import ui
+    from search import SearchIndex
+
+    # expanding a big file asks for confirmation
+    ui.Dialog.expandAllConfirmDialog = staticmethod(lambda parent, count: True)
+
+    results = []
+    editor = app.CaseEditor()
+
+    def settle(tree) -> None:
+        # run pending events and tree jobs, so rendering is part of the timing
+        while( tree is not None and tree.treeJob is not None ):
+            QCoreApplication.processEvents()
+        QCoreApplication.processEvents()
+
+    def timed(op : str, func, tree=None):
+        start = time.perf_counter()
+        result = func()
+        settle(tree)
+        results.append({
+            "shape" : shape,
+            "size" : size,
+            "op" : op,
+            "seconds" : time.perf_counter() - start,
+            "peakRssKiB" : peakRss()
+        })
+        return result
+
+    with tempfile.TemporaryDirectory() as tempDir:
+        filePath = os.path.join(tempDir, f"{shape}-{size}.json")
+        data = makeData(shape, size)
+        with open(filePath, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+        del data
+
+        document = timed("openFile", lambda: editor.model.openFile(filePath))
+        timed("createTab", lambda: editor.ui.createTab(os.path.basename(filePath), document))
+        tree = editor.ui.tabList.currentWidget()
+        settle(tree)
+
+        timed("buildSearchIndex", lambda: SearchIndex().build(document.toDict()))
+        timed("tabToDict", lambda: editor.ui.tabToDict(0))
+        timed("selectAll", lambda: editor.ui.setCheckedAllCurrentItems(True), tree)
+        timed("getCurrentSelectedItems", editor.ui.getCurrentSelectedItems)
+        timed("unselectAll", lambda: editor.ui.setCheckedAllCurrentItems(False), tree)
+        timed("expandAll", lambda: editor.ui.setExpandedAllCurrentItems(True), tree)
+        timed("collapseAll", lambda: editor.ui.setExpandedAllCurrentItems(False), tree)
+        timed("hideValues", lambda: editor.ui.setCurrentValuesVisibility(False), tree)
+        timed("showValues", lambda: editor.ui.setCurrentValuesVisibility(True), tree)
+        timed("saveFile", lambda: editor.model.saveFile(0))
+
+    return results
+
+
+def gitCommit() -> str:
+    try:
+        return subprocess.run(
+            [ "git", "rev-parse", "--short", "HEAD" ],
+            cwd=CURR_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def runAll(shapes : list, sizes : list, repeat : int) -> dict:
+    '''
+    Run every case repeat times, each in a fresh process, keeping the
+    fastest time and the highest peak RSS of every operation.
+    '''
+    ctx = multiprocessing.get_context("spawn")
+    best = {}
+    for shape in shapes:
+        for size in sizes:
+            for _ in range(repeat):
+                with ctx.Pool(processes=1) as pool:
+                    caseResults = pool.apply(runCase, (shape, size))
+                for result in caseResults:
+                    key = ( shape, size, result["op"] )
+                    if( key not in best ):
+                        best[key] = result
+                        continue
+                    best[key]["seconds"] = min(best[key]["seconds"], result["seconds"])
+                    if( result["peakRssKiB"] is not None ):
+                        best[key]["peakRssKiB"] = max(best[key]["peakRssKiB"], result["peakRssKiB"])
+            for key,result in best.items():
+                if( key[0] == shape and key[1] == size ):
+                    print(f"{shape:8} {size:>8} {result['op']:24} {result['seconds']:9.4f}s {result['peakRssKiB'] or 0:>9} KiB", file=sys.stderr)
+
+    return {
+        "commit" : gitCommit(),
+        "python" : platform.python_version(),
+        "platform" : platform.platform(),
+        "repeat" : repeat,
+        "results" : list(best.values())
+    }
+
+
+def compare(beforePath : str, afterPath : str) -> None:
+    with open(beforePath, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(afterPath, encoding="utf-8") as f:
+        after = json.load(f)
+
+    beforeTimes = { (r["shape"], r["size"], r["op"]) : r["seconds"] for r in before["results"] }
+    print(f"{before['commit']} -> {after['commit']}")
+    for result in after["results"]:
+        key = ( result["shape"], result["size"], result["op"] )
+        if( key not in beforeTimes ):
+            continue
+        old = beforeTimes[key]
+        ratio = result["seconds"] / old if old > 0 else float("inf")
+        print(f"{key[0]:8} {key[1]:>8} {key[2]:24} {old:9.4f}s {result['seconds']:9.4f}s {ratio:6.2f}x")
+
+
+def main() -> None:
+    argParser = argparse.ArgumentParser(description="Benchmark the json editor.")
+    argParser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    argParser.add_argument("--shapes", nargs="+", choices=SHAPES, default=SHAPES)
+    argParser.add_argument("--repeat", type=int, default=1)
+    argParser.add_argument("--output", help="json file for the results, stdout by default")
+    argParser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    args = argParser.parse_args()
+
+    if( args.compare ):
+        compare(*args.compare)
+        return
+
+    report = runAll(args.shapes, args.sizes, args.repeat)
+    if( args.output ):
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+
+if __name__ == "__main__":
+    main()
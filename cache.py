@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+
+# GLOBALS
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+# overrides the platform cache directory
+CACHE_DIR_ENV = "JSON_EDITOR_CACHE_DIR"
+# pickles are only reused by the python that wrote them, an entry holds
+# the pickled pieces of workers.packPayload
+CACHE_FORMAT = f"pieces-pickle{pickle.HIGHEST_PROTOCOL}-py{sys.version_info[0]}.{sys.version_info[1]}"
+META_SUFFIX = ".meta.json"
+DATA_SUFFIX = ".pickle"
+
+
+def defaultCacheDir() -> str:
+    if( os.environ.get(CACHE_DIR_ENV) ):
+        return os.environ[CACHE_DIR_ENV]
+    if( sys.platform == "win32" ):
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    elif( sys.platform == "darwin" ):
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(base, "json-editor")
+
+
+def contentHash(data : bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class DocumentCache:
+    '''
+    Parsed documents pickled on disk, one entry per file. An entry is only
+    used if the path, size, mtime and content hash of the file all match
+    the ones it was made from. Entries are evicted least recently used first
+    once they take more than maxBytes.
+
+    Every entry also keeps the view state of its file and the path of the
+    schema attached to it, which outlive the content: the view state is
+    only a list of key paths and a scroll position.
+
+    Any OSError makes the cache miss instead of failing the open. Files are
+    written through a temp file, so the loader process and the GUI can use
+    the cache at the same time.
+    '''
+    def __init__(self, cacheDir : str = None, maxBytes : int = CACHE_MAX_BYTES):
+        self.cacheDir = cacheDir or defaultCacheDir()
+        self.maxBytes = maxBytes
+
+    def _entryPath(self, filePath : str) -> str:
+        name = hashlib.sha1(os.path.realpath(filePath).encode("utf-8", "surrogatepass")).hexdigest()
+        return os.path.join(self.cacheDir, name)
+
+    def _readMeta(self, filePath : str) -> dict:
+        try:
+            with open(self._entryPath(filePath) + META_SUFFIX, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _writeAtomic(self, path : str, data : bytes) -> None:
+        os.makedirs(self.cacheDir, exist_ok=True)
+        fd, tempPath = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=self.cacheDir)
+        try:
+            with open(fd, "wb") as f:
+                f.write(data)
+            os.replace(tempPath, path)
+        except BaseException:
+            try:
+                os.unlink(tempPath)
+            except OSError:
+                pass
+            raise
+
+    def _writeMeta(self, filePath : str, meta : dict) -> None:
+        data = json.dumps(meta).encode("utf-8")
+        self._writeAtomic(self._entryPath(filePath) + META_SUFFIX, data)
+
+    def load(self, filePath : str, fileStat : os.stat_result, digest : str) -> bytes:
+        '''
+        Pickled document of filePath, None if there is no matching entry.
+        '''
+        meta = self._readMeta(filePath)
+        if( meta is None or meta.get("format") != CACHE_FORMAT ):
+            return None
+        if( meta.get("size") != fileStat.st_size or meta.get("mtime") != fileStat.st_mtime_ns or meta.get("hash") != digest ):
+            return None
+        dataPath = self._entryPath(filePath) + DATA_SUFFIX
+        try:
+            with open(dataPath, "rb") as f:
+                payload = f.read()
+            # the meta file's mtime is the last use, see evict()
+            os.utime(self._entryPath(filePath) + META_SUFFIX)
+        except OSError:
+            return None
+        if( len(payload) != meta.get("bytes") ):
+            return None
+        return payload
+
+    def store(self, filePath : str, fileStat : os.stat_result, digest : str, payload : bytes) -> None:
+        '''
+        Keep the pickled document of filePath, replacing an older entry.
+        '''
+        if( len(payload) > self.maxBytes ):
+            return
+        meta = self._readMeta(filePath) or {}
+        meta.update({
+            "path" : os.path.realpath(filePath),
+            "format" : CACHE_FORMAT,
+            "size" : fileStat.st_size,
+            "mtime" : fileStat.st_mtime_ns,
+            "hash" : digest,
+            "bytes" : len(payload)
+        })
+        try:
+            # data first, a meta file never describes a missing pickle
+            self._writeAtomic(self._entryPath(filePath) + DATA_SUFFIX, payload)
+            self._writeMeta(filePath, meta)
+            self.evict()
+        except OSError:
+            pass
+
+    def viewState(self, filePath : str) -> dict:
+        meta = self._readMeta(filePath)
+        return None if meta is None else meta.get("viewState")
+
+    def setViewState(self, filePath : str, viewState : dict) -> None:
+        meta = self._readMeta(filePath) or { "path" : os.path.realpath(filePath) }
+        meta["viewState"] = viewState
+        try:
+            self._writeMeta(filePath, meta)
+        except OSError:
+            pass
+
+    def schemaPath(self, filePath : str) -> str:
+        meta = self._readMeta(filePath)
+        return None if meta is None else meta.get("schemaPath")
+
+    def setSchemaPath(self, filePath : str, schemaPath : str) -> None:
+        '''
+        Remember the schema attached to filePath, None forgets it.
+        '''
+        meta = self._readMeta(filePath) or { "path" : os.path.realpath(filePath) }
+        meta["schemaPath"] = schemaPath
+        try:
+            self._writeMeta(filePath, meta)
+        except OSError:
+            pass
+
+    def evict(self) -> None:
+        '''
+        Remove the least recently used entries until the pickles fit in maxBytes.
+        '''
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.cacheDir)
+        except OSError:
+            return
+        for name in names:
+            if( not name.endswith(DATA_SUFFIX) ):
+                continue
+            base = os.path.join(self.cacheDir, name[:-len(DATA_SUFFIX)])
+            try:
+                size = os.path.getsize(base + DATA_SUFFIX)
+            except OSError:
+                continue
+            try:
+                lastUsed = os.path.getmtime(base + META_SUFFIX)
+            except OSError:
+                # a pickle without meta is unusable, evict it first
+                lastUsed = 0
+            total += size
+            entries.append((lastUsed, size, base))
+
+        entries.sort()
+        for lastUsed,size,base in entries:
+            if( total <= self.maxBytes ):
+                break
+            for suffix in ( DATA_SUFFIX, META_SUFFIX ):
+                try:
+                    os.unlink(base + suffix)
+                except OSError:
+                    pass
+            total -= size
+
+    def clear(self) -> None:
+        try:
+            names = os.listdir(self.cacheDir)
+        except OSError:
+            return
+        for name in names:
+            if( name.endswith(DATA_SUFFIX) or name.endswith(META_SUFFIX) ):
+                try:
+                    os.unlink(os.path.join(self.cacheDir, name))
+                except OSError:
+                    pass
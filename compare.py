@@ -0,0 +1,388 @@
+'''
+Structural diff of two json documents, and a window showing it side by side.
+
+The diff walks both documents from the top. A subtree equal on both sides
+is skipped after one comparison done in C, == followed by a comparison of
+the json text, which tells 1, 1.0 and true apart. Only the subtrees that
+differ are walked into. The items of an array that differ are matched by
+the hash of their json, each hashed once, so an item inserted in the middle
+of an array is one added row rather than every later item changed.
+'''
+import difflib
+from bisect import bisect_left
+from collections import (
+    Counter,
+    namedtuple
+)
+
+from PySide6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QLabel,
+    QTreeView
+)
+
+from PySide6.QtCore import (
+    Qt,
+    QAbstractItemModel,
+    QModelIndex
+)
+
+from PySide6.QtGui import QColor
+
+from model import CODEC
+from table import cellText
+
+# GLOBALS
+# differences listed at most, a diff of two unrelated files stops there
+MAX_DIFFERENCES = 10000
+# array items matched by difflib at once, from a difference on, longer runs
+# are first cut at the items found once on both sides
+MATCH_LIMIT = 2000
+# equal array items in a row taken as the end of a difference
+RESYNC_LENGTH = 8
+# characters of a value shown in a cell
+MAX_CELL_TEXT = 200
+COMPARE_COLUMNS = [ "Key", "Left", "Right" ]
+KIND_COLORS = {
+    "added" : QColor(200, 240, 200),
+    "removed" : QColor(245, 200, 200),
+    "changed" : QColor(250, 240, 190)
+}
+
+# kind is "added", "removed" or "changed" and path the key path on the
+# right side, or on the left one for a removed entry
+Difference = namedtuple("Difference", "kind path old new")
+
+
+def _sameJson(old, new) -> bool:
+    # old == new already, == alone takes 1, 1.0 and true for the same
+    if( type(old) not in ( dict, list ) ):
+        return ( type(old) is type(new) )
+    return ( CODEC.dumps(old, None) == CODEC.dumps(new, None) )
+
+
+def diffData(old, new, limit : int = MAX_DIFFERENCES) -> tuple:
+    '''
+    (differences, truncated) turning old into new, at most limit of them,
+    in document order.
+    '''
+    differences = []
+    # (kind, path, old, new), kind None for two values still to compare;
+    # the top of the stack comes next in document order
+    stack = [ ( None, [], old, new ) ]
+    while( stack ):
+        if( len(differences) >= limit ):
+            return differences, True
+        kind, path, oldVal, newVal = stack.pop()
+        if( kind is not None ):
+            differences.append(Difference(kind, path, oldVal, newVal))
+        elif( type(oldVal) is dict and type(newVal) is dict ):
+            stack.extend(reversed(_objectEntries(path, oldVal, newVal)))
+        elif( type(oldVal) is list and type(newVal) is list ):
+            stack.extend(reversed(_arrayEntries(path, oldVal, newVal)))
+        elif( oldVal is not newVal and not ( oldVal == newVal and _sameJson(oldVal, newVal) ) ):
+            differences.append(Difference("changed", path, oldVal, newVal))
+    return differences, False
+
+
+def _objectEntries(path : list, oldDict : dict, newDict : dict) -> list:
+    if( oldDict is newDict ):
+        return []
+    equalKeys = [ key for key,val in oldDict.items() if key in newDict and val == newDict[key] ]
+    if( equalKeys and not _sameJson({ key : oldDict[key] for key in equalKeys }, { key : newDict[key] for key in equalKeys }) ):
+        # a value only changed type somewhere below, compare them one by one
+        equalKeys = [ key for key in equalKeys if _sameJson(oldDict[key], newDict[key]) ]
+    equalKeys = set(equalKeys)
+
+    entries = []
+    for key,val in oldDict.items():
+        if( key not in newDict ):
+            entries.append(( "removed", path + [ key ], val, None ))
+        elif( key not in equalKeys ):
+            entries.append(( None, path + [ key ], val, newDict[key] ))
+    entries.extend( ( "added", path + [ key ], None, val ) for key,val in newDict.items() if key not in oldDict )
+    return entries
+
+
+def _arrayEntries(path : list, oldList : list, newList : list) -> list:
+    if( oldList is newList ):
+        return []
+    entries = []
+    for tag,i1,i2,j1,j2 in arrayOpcodes(oldList, newList):
+        if( tag == "equal" ):
+            continue
+        common = min(i2 - i1, j2 - j1)
+        for k in range(common):
+            entries.append(( None, path + [ j1 + k ], oldList[i1 + k], newList[j1 + k] ))
+        for i in range(i1 + common, i2):
+            entries.append(( "removed", path + [ i ], oldList[i], None ))
+        for j in range(j1 + common, j2):
+            entries.append(( "added", path + [ j ], None, newList[j] ))
+    return entries
+
+
+def _itemHashes(items : list) -> list:
+    # the json tells 1, 1.0 and true apart
+    return [ hash(CODEC.dumps(item, None)) for item in items ]
+
+
+def _equalRun(oldList : list, i : int, newList : list, j : int) -> int:
+    # number of items equal from oldList[i] and newList[j] on, compared a
+    # slice at a time in C, each slice twice as long as the last
+    count = min(len(oldList) - i, len(newList) - j)
+    run = 0
+    step = 1
+    while( run < count ):
+        size = min(step, count - run)
+        if( oldList[i + run:i + run + size] == newList[j + run:j + run + size] ):
+            run += size
+            step *= 2
+        elif( size == 1 ):
+            break
+        else:
+            step = 1
+    if( run > 0 and not _sameJson(oldList[i:i + run], newList[j:j + run]) ):
+        # a type change in the run, it ends there
+        run = next( k for k in range(run) if not _sameJson(oldList[i + k], newList[j + k]) )
+    return run
+
+
+def arrayOpcodes(oldList : list, newList : list) -> list:
+    '''
+    Opcodes as difflib.SequenceMatcher.get_opcodes() gives them, turning
+    oldList into newList. Runs of equal items are skipped by comparing
+    slices, at a difference the next MATCH_LIMIT items of each side are
+    matched by their hash until a run of RESYNC_LENGTH equal items is
+    found. Without one there, the rest is matched whole by matchItems.
+    '''
+    opcodes = []
+    i = j = 0
+    while( True ):
+        run = _equalRun(oldList, i, newList, j)
+        if( run > 0 ):
+            opcodes.append(( "equal", i, i + run, j, j + run ))
+            i += run
+            j += run
+        if( i == len(oldList) and j == len(newList) ):
+            return opcodes
+
+        oldWindow = oldList[i:i + MATCH_LIMIT]
+        newWindow = newList[j:j + MATCH_LIMIT]
+        atEnd = ( i + len(oldWindow) == len(oldList) and j + len(newWindow) == len(newList) )
+        if( atEnd ):
+            windowOpcodes = matchItems(_itemHashes(oldWindow), _itemHashes(newWindow))
+        else:
+            windowOpcodes = difflib.SequenceMatcher(None, _itemHashes(oldWindow), _itemHashes(newWindow), autojunk=False).get_opcodes()
+            resync = next(( n for n,( tag, i1, i2, j1, j2 ) in enumerate(windowOpcodes) if tag == "equal" and i2 - i1 >= RESYNC_LENGTH ), None)
+            if( resync is None ):
+                # nothing in common nearby, match all that is left
+                windowOpcodes = matchItems(_itemHashes(oldList[i:]), _itemHashes(newList[j:]))
+                atEnd = True
+            else:
+                windowOpcodes = windowOpcodes[:resync + 1]
+        for tag,i1,i2,j1,j2 in windowOpcodes:
+            opcodes.append(( tag, i1 + i, i2 + i, j1 + j, j2 + j ))
+        if( atEnd ):
+            return opcodes
+        i = opcodes[-1][2]
+        j = opcodes[-1][4]
+
+
+def matchItems(oldKeys : list, newKeys : list) -> list:
+    '''
+    Opcodes as difflib.SequenceMatcher.get_opcodes() gives them, turning
+    oldKeys into newKeys. Short runs are matched by difflib. Longer ones are
+    cut at the keys found exactly once on both sides, in the longest order
+    they share (patience diff), and the runs between are matched again.
+    A long run without such keys is replaced index by index.
+    '''
+    if( len(oldKeys) == 0 and len(newKeys) == 0 ):
+        return []
+    if( max(len(oldKeys), len(newKeys)) <= MATCH_LIMIT ):
+        return difflib.SequenceMatcher(None, oldKeys, newKeys, autojunk=False).get_opcodes()
+
+    anchors = _uniqueAnchors(oldKeys, newKeys)
+    if( len(anchors) == 0 ):
+        return [ ( "replace", 0, len(oldKeys), 0, len(newKeys) ) ]
+    opcodes = []
+    prevOld = prevNew = 0
+    for i,j in anchors + [ ( len(oldKeys), len(newKeys) ) ]:
+        if( i > prevOld or j > prevNew ):
+            for tag,i1,i2,j1,j2 in matchItems(oldKeys[prevOld:i], newKeys[prevNew:j]):
+                opcodes.append(( tag, i1 + prevOld, i2 + prevOld, j1 + prevNew, j2 + prevNew ))
+        if( i < len(oldKeys) ):
+            if( opcodes and opcodes[-1][0] == "equal" and opcodes[-1][2] == i ):
+                # the anchor right after the last one, one run of equal items
+                opcodes[-1] = ( "equal", opcodes[-1][1], i + 1, opcodes[-1][3], j + 1 )
+            else:
+                opcodes.append(( "equal", i, i + 1, j, j + 1 ))
+        prevOld = i + 1
+        prevNew = j + 1
+    return opcodes
+
+
+def _uniqueAnchors(oldKeys : list, newKeys : list) -> list:
+    # (old index, new index) of the keys found once on each side, the
+    # longest run of them in the same order on both
+    oldCounts = Counter(oldKeys)
+    newCounts = Counter(newKeys)
+    newIndexes = { key : j for j,key in enumerate(newKeys) if newCounts[key] == 1 }
+    pairs = [ ( i, newIndexes[key] ) for i,key in enumerate(oldKeys) if oldCounts[key] == 1 and key in newIndexes ]
+
+    newOrder = [ j for i,j in pairs ]
+    if( newOrder == sorted(newOrder) ):
+        # nothing moved, the usual case
+        return pairs
+
+    # longest increasing run of new indexes, by patience sorting
+    tails = []
+    tailPairs = []
+    previous = [ None ] * len(pairs)
+    for n,( i, j ) in enumerate(pairs):
+        pile = bisect_left(tails, j)
+        if( pile == len(tails) ):
+            tails.append(j)
+            tailPairs.append(n)
+        else:
+            tails[pile] = j
+            tailPairs[pile] = n
+        previous[n] = tailPairs[pile - 1] if pile > 0 else None
+    anchors = []
+    n = tailPairs[-1] if tailPairs else None
+    while( n is not None ):
+        anchors.append(pairs[n])
+        n = previous[n]
+    anchors.reverse()
+    return anchors
+
+
+class DiffNode:
+    '''
+    Row of the compare tree: a difference, or a key above some of them.
+    '''
+    __slots__ = ( "key", "difference", "parent", "children", "childIndex", "row" )
+
+    def __init__(self, key, difference : Difference = None, parent=None):
+        self.key = key
+        self.difference = difference
+        self.parent = parent
+        self.children = []
+        # key -> child above differences, the rows of differences are not looked up
+        self.childIndex = {}
+        self.row = 0
+
+    def addChild(self, child : "DiffNode") -> "DiffNode":
+        child.row = len(self.children)
+        self.children.append(child)
+        return child
+
+
+def buildDiffTree(differences : list) -> DiffNode:
+    '''
+    Tree of the differences under the keys leading to them.
+    '''
+    root = DiffNode("")
+    for difference in differences:
+        node = root
+        for key in difference.path[:-1]:
+            child = node.childIndex.get(key)
+            if( child is None ):
+                child = node.childIndex[key] = node.addChild(DiffNode(key, None, node))
+            node = child
+        node.addChild(DiffNode(difference.path[-1] if difference.path else "", difference, node))
+    return root
+
+
+def _cellText(value) -> str:
+    text = cellText(value)
+    return text if len(text) <= MAX_CELL_TEXT else text[:MAX_CELL_TEXT] + "…"
+
+
+class CompareModel(QAbstractItemModel):
+    '''
+    Read-only tree of a buildDiffTree, one column per side.
+    '''
+    def __init__(self, root : DiffNode, parent=None):
+        super().__init__(parent)
+        self.root = root
+
+    def nodeFromIndex(self, index : QModelIndex) -> DiffNode:
+        return index.internalPointer() if index.isValid() else self.root
+
+    def index(self, row : int, column : int, parent : QModelIndex = QModelIndex()) -> QModelIndex:
+        node = self.nodeFromIndex(parent)
+        if( not 0 <= row < len(node.children) ):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index : QModelIndex) -> QModelIndex:
+        if( not index.isValid() ):
+            return QModelIndex()
+        parentNode = index.internalPointer().parent
+        if( parentNode is None or parentNode is self.root ):
+            return QModelIndex()
+        return self.createIndex(parentNode.row, 0, parentNode)
+
+    def rowCount(self, parent : QModelIndex = QModelIndex()) -> int:
+        if( parent.column() > 0 ):
+            return 0
+        return len(self.nodeFromIndex(parent).children)
+
+    def columnCount(self, parent : QModelIndex = QModelIndex()) -> int:
+        return len(COMPARE_COLUMNS)
+
+    def data(self, index : QModelIndex, role : int = Qt.DisplayRole):
+        if( not index.isValid() ):
+            return None
+        node = index.internalPointer()
+        difference = node.difference
+        if( role == Qt.BackgroundRole ):
+            return None if difference is None else KIND_COLORS[difference.kind]
+        if( role != Qt.DisplayRole ):
+            return None
+        col = index.column()
+        if( col == 0 ):
+            return str(node.key)
+        if( difference is None ):
+            return ""
+        if( col == 1 ):
+            return "" if difference.kind == "added" else _cellText(difference.old)
+        return "" if difference.kind == "removed" else _cellText(difference.new)
+
+    def headerData(self, section : int, orientation, role : int = Qt.DisplayRole):
+        if( role != Qt.DisplayRole or orientation != Qt.Horizontal ):
+            return None
+        return COMPARE_COLUMNS[section]
+
+
+class CompareDialog(QDialog):
+    '''
+    The differences of two documents as a tree, the left document's values
+    next to the right one's.
+    '''
+    def __init__(self, leftName : str, rightName : str, differences : list, truncated : bool, root : DiffNode = None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Compare : {leftName} ↔ {rightName}")
+        self.resize(900, 600)
+
+        counts = Counter( difference.kind for difference in differences )
+        summary = f"{len(differences)} differences : {counts['changed']} changed, {counts['added']} added, {counts['removed']} removed"
+        if( truncated ):
+            summary += f" (only the first {len(differences)} are listed)"
+        if( len(differences) == 0 ):
+            summary = "The documents are identical."
+        self.summaryLabel = QLabel(summary)
+
+        self.compareModel = CompareModel(root or buildDiffTree(differences), self)
+        self.treeView = QTreeView()
+        self.treeView.setUniformRowHeights(True)
+        self.treeView.setModel(self.compareModel)
+        self.treeView.expandAll()
+        self.treeView.setColumnWidth(0, 250)
+        self.treeView.setColumnWidth(1, 300)
+
+        dlgLayout = QVBoxLayout(self)
+        dlgLayout.addWidget(self.summaryLabel)
+        dlgLayout.addWidget(self.treeView)
+        self.setAttribute(Qt.WA_DeleteOnClose)
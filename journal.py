@@ -0,0 +1,319 @@
+import glob
+import json
+import os
+import sys
+import time
+import uuid
+
+from cache import defaultCacheDir
+from model import (
+    CODEC,
+    Document,
+    Model
+)
+
+# GLOBALS
+# journal bytes after which the tab is compacted into a snapshot
+JOURNAL_COMPACT_BYTES = 8 * 1024 * 1024
+META_SUFFIX = ".meta.json"
+JOURNAL_SUFFIX = ".journal"
+SNAPSHOT_SUFFIX = ".snapshot"
+
+
+def defaultJournalDir() -> str:
+    return os.path.join(defaultCacheDir(), "journal")
+
+
+def _isRunning(pid : int) -> bool:
+    if( pid == os.getpid() ):
+        return True
+    if( sys.platform == "win32" ):
+        # os.kill would terminate the process, journals are never taken as in use
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # exists, owned by another user
+        return True
+    return True
+
+
+class EditJournal:
+    '''
+    Append-only log of the edits of one tab, so unsaved work survives a
+    crash. It is a document listener writing one json line per Edit, an
+    edit costs a few bytes however big the document is.
+
+    The state of a tab is a checkpoint plus the journals written since.
+    A checkpoint is the file on disk (after open or save), an empty
+    document (untitled tab) or a snapshot made by compaction. Journals are
+    numbered by generation, rotate() starts a new one when a checkpoint is
+    taken and commitCheckpoint() drops the older ones once it is on disk,
+    so a crash in between still finds a complete chain.
+
+    Nothing is written before the first edit. Write errors disable the
+    journal instead of failing the edit.
+    '''
+    def __init__(self, journalDir : str, filePath : str = "", journalId : str = None):
+        self.journalDir = journalDir
+        self.id = journalId or uuid.uuid4().hex
+        self.filePath = filePath
+        self.gen = 0
+        self.checkpoint = self._checkpointOf(0, filePath)
+        self.file = None
+        # bytes written to the journal of the current generation
+        self.bytesWritten = 0
+        self.isEnabled = True
+
+    @classmethod
+    def resume(cls, journalDir : str, meta : dict) -> "EditJournal":
+        '''
+        Journal of a recovered tab, appending to the chain it was recovered from.
+        '''
+        journal = cls(journalDir, meta["filePath"], meta["id"])
+        journal.checkpoint = meta["checkpoint"]
+        gens = journalGens(journalDir, meta["id"])
+        journal.gen = max(gens + [ journal.checkpoint["gen"] ])
+        journal._writeMeta()
+        return journal
+
+    @staticmethod
+    def _checkpointOf(gen : int, filePath : str) -> dict:
+        if( filePath == "" ):
+            return { "gen" : gen, "kind" : "empty" }
+        try:
+            fileStat = os.stat(filePath)
+        except OSError:
+            return { "gen" : gen, "kind" : "file", "size" : None, "mtime" : None }
+        return { "gen" : gen, "kind" : "file", "size" : fileStat.st_size, "mtime" : fileStat.st_mtime_ns }
+
+    def _path(self, gen : int, suffix : str) -> str:
+        return os.path.join(self.journalDir, f"{self.id}.{gen}{suffix}")
+
+    def _metaPath(self) -> str:
+        return os.path.join(self.journalDir, self.id + META_SUFFIX)
+
+    def _writeMeta(self) -> None:
+        meta = {
+            "id" : self.id,
+            "filePath" : self.filePath,
+            "checkpoint" : self.checkpoint,
+            "pid" : os.getpid(),
+            "time" : time.time()
+        }
+        os.makedirs(self.journalDir, exist_ok=True)
+        tempPath = self._metaPath() + ".tmp"
+        with open(tempPath, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tempPath, self._metaPath())
+
+    # recording
+
+    def applyEdit(self, edit) -> None:
+        '''
+        Document listener, see model.Edit. The node is written as the key
+        path of its parent and its row, like an UndoRecord.
+        '''
+        if( not self.isEnabled ):
+            return
+        row = edit.row if edit.kind in ( "insert", "remove" ) else edit.node.row
+        record = {
+            "kind" : edit.kind,
+            "path" : edit.path[:-1],
+            "row" : row,
+            "key" : edit.path[-1],
+            "value" : None if edit.kind == "remove" else edit.value
+        }
+        try:
+            line = CODEC.dumps(record, None) + b"\n"
+            if( self.file is None ):
+                self._writeMeta()
+                self.file = open(self._path(self.gen, JOURNAL_SUFFIX), "ab")
+            self.file.write(line)
+            # flushed per edit, the OS keeps it if only the editor crashes
+            self.file.flush()
+            self.bytesWritten += len(line)
+        except (OSError, TypeError, ValueError):
+            self.isEnabled = False
+
+    def hasFiles(self) -> bool:
+        return os.path.exists(self._metaPath())
+
+    def needsCompaction(self) -> bool:
+        return ( self.isEnabled and self.bytesWritten > JOURNAL_COMPACT_BYTES )
+
+    def rotate(self) -> int:
+        '''
+        Start the journal of a new generation, returns it. Call it when
+        taking the data of a checkpoint, edits after it go to the new journal.
+        '''
+        self._closeFile()
+        self.gen += 1
+        self.bytesWritten = 0
+        return self.gen
+
+    def snapshotPath(self, gen : int) -> str:
+        return self._path(gen, SNAPSHOT_SUFFIX)
+
+    def commitCheckpoint(self, gen : int, kind : str) -> None:
+        '''
+        Record that the data at the rotate() that returned gen is on disk,
+        as the tab's file (kind "file") or as snapshotPath(gen) ("snapshot"),
+        and drop what came before it.
+        '''
+        if( gen <= self.checkpoint["gen"] ):
+            return
+        if( kind == "file" ):
+            self.checkpoint = self._checkpointOf(gen, self.filePath)
+        else:
+            self.checkpoint = { "gen" : gen, "kind" : kind }
+        if( not self.hasFiles() ):
+            # no edit since the last discard, the next one writes the meta
+            return
+        try:
+            self._writeMeta()
+        except OSError:
+            self.isEnabled = False
+            return
+        for oldGen in range(gen):
+            for suffix in ( JOURNAL_SUFFIX, SNAPSHOT_SUFFIX ):
+                try:
+                    os.unlink(self._path(oldGen, suffix))
+                except OSError:
+                    pass
+
+    def setFilePath(self, filePath : str) -> None:
+        self.filePath = filePath
+        if( self.hasFiles() ):
+            try:
+                self._writeMeta()
+            except OSError:
+                self.isEnabled = False
+
+    def _closeFile(self) -> None:
+        if( self.file is not None ):
+            self.file.close()
+            self.file = None
+
+    def close(self) -> None:
+        '''
+        Stop writing but keep the files for a recovery.
+        '''
+        self._closeFile()
+
+    def discard(self) -> None:
+        '''
+        Delete every file of the journal, e.g. when the tab is saved or
+        closed. Later edits start a new chain on the current checkpoint.
+        '''
+        self._closeFile()
+        for path in glob.glob(os.path.join(glob.escape(self.journalDir), glob.escape(self.id) + ".*")):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self.gen = 0
+        self.bytesWritten = 0
+        self.checkpoint = self._checkpointOf(0, self.filePath)
+
+
+def journalGens(journalDir : str, journalId : str) -> list:
+    gens = []
+    for path in glob.glob(os.path.join(glob.escape(journalDir), glob.escape(journalId) + ".*" + JOURNAL_SUFFIX)):
+        gen = os.path.basename(path)[len(journalId) + 1:-len(JOURNAL_SUFFIX)]
+        if( gen.isdigit() ):
+            gens.append(int(gen))
+    return sorted(gens)
+
+
+def findJournals(journalDir : str = None) -> list:
+    '''
+    Meta of the journals left by editors that are no longer running, most
+    recent first.
+    '''
+    journalDir = journalDir or defaultJournalDir()
+    metas = []
+    for path in glob.glob(os.path.join(glob.escape(journalDir), "*" + META_SUFFIX)):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if( not _isRunning(meta.get("pid", 0)) ):
+            metas.append(meta)
+    metas.sort(key=lambda meta: meta.get("time", 0), reverse=True)
+    return metas
+
+
+def deleteJournal(journalDir : str, meta : dict) -> None:
+    EditJournal(journalDir, meta["filePath"], meta["id"]).discard()
+
+
+def replay(document : Document, records) -> int:
+    '''
+    Apply journal records to document. Returns the number applied.
+    '''
+    count = 0
+    for record in records:
+        parent = document.nodeAtPath(record["path"])
+        if( parent is None ):
+            raise ValueError(f"journal does not match its checkpoint at {record['path']}")
+        row = record["row"]
+        if( record["kind"] == "insert" ):
+            document.insertNode(parent, row, record["key"], record["value"])
+            count += 1
+            continue
+
+        missing = row + 1 - parent.childCount()
+        if( missing > 0 ):
+            document.fetch(parent, missing)
+        if( row >= parent.childCount() ):
+            raise ValueError(f"journal does not match its checkpoint at {record['path']}")
+        node = parent.children[row]
+        if( record["kind"] == "remove" ):
+            document.removeNode(node)
+        elif( record["kind"] == "key" ):
+            # checked when the edit was made, a check per record would make
+            # replaying many renames in one branch quadratic
+            document.setKey(node, record["value"], False)
+        elif( record["kind"] == "value" ):
+            document.setValue(node, record["value"])
+        count += 1
+    return count
+
+
+def _readRecords(path : str):
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                yield CODEC.loads(line)
+            except ValueError:
+                # the last line may be torn by a crash, nothing after it is valid
+                return
+
+
+def recoverData(journalDir : str, meta : dict) -> dict:
+    '''
+    Data of the tab a journal was written for: its checkpoint with every
+    journal since replayed on it. Raises ValueError if the checkpoint is
+    gone or the file it refers to changed, OSError if it can not be read.
+    '''
+    checkpoint = meta["checkpoint"]
+    gen = checkpoint["gen"]
+    if( checkpoint["kind"] == "empty" ):
+        data = {}
+    elif( checkpoint["kind"] == "snapshot" ):
+        data = Model.readFile(os.path.join(journalDir, f"{meta['id']}.{gen}{SNAPSHOT_SUFFIX}"))
+    else:
+        fileStat = os.stat(meta["filePath"])
+        if( fileStat.st_size != checkpoint["size"] or fileStat.st_mtime_ns != checkpoint["mtime"] ):
+            raise ValueError(f"{meta['filePath']} changed on disk since the edits were made")
+        data = Model.readFile(meta["filePath"])
+
+    document = Document(data)
+    for journalGen in journalGens(journalDir, meta["id"]):
+        if( journalGen >= gen ):
+            replay(document, _readRecords(os.path.join(journalDir, f"{meta['id']}.{journalGen}{JOURNAL_SUFFIX}")))
+    return document.toDict()
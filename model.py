@@ -1,44 +1,1392 @@
 
 import json
+import os
+import pickle
+import re
+import stat
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import (
+    contextmanager,
+    nullcontext
+)
+from itertools import (
+    chain,
+    islice
+)
+from operator import itemgetter
+
+from profiler import profiler
+from search import SearchIndex
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# bytes read between two progress reports when loading a file
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+# buffer between the json encoder and the file when saving
+WRITE_BUFFER_SIZE = 1024 * 1024
+# entries of a container encoded by one call when saving
+DUMP_BATCH_SIZE = 1024
+# values, nested ones included, encoded by one call when saving
+DUMP_NODE_BUDGET = 64 * 1024
+# entries of a container looked into when estimating the values it holds,
+# and levels below which a value counts as too large for one call
+DUMP_PROBE_SIZE = 16
+DUMP_PROBE_DEPTH = 16
+# spaces per level of saved files, None saves compact json
+DEFAULT_INDENT = 4
+# undo steps kept per tab, the oldest are dropped first
+UNDO_LIMIT = 100
+# estimated memory of the open tabs above which inactive tabs are hibernated
+DEFAULT_MEMORY_BUDGET = 1024 * 1024 * 1024
+# rough memory of parsed json per byte of file and of one fetched node,
+# see Document.memoryEstimate
+PARSED_BYTES_PER_FILE_BYTE = 3
+NODE_BYTES = 128
+
+# every digit as 0, to find the floats orjson formats differently from
+# json.dumps, see JsonCodec._writesLikeJson
+_DIGITS_AS_ZERO = bytes.maketrans(b"123456789", b"000000000")
+# null as a value in json, i.e. after the start, a colon, a comma or a
+# bracket; in a string, e.g. a key "nullable", it follows another character
+_NULL_VALUE_RE = re.compile(rb"(?:^|[:,\[])\s*null")
+
+# permission bits of files created by open(), used for new files saved through a temp file
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+NEW_FILE_MODE = 0o666 & ~_UMASK
+
+
+class JsonCodec:
+    '''
+    Reads and writes json as UTF-8 bytes, with orjson when it is installed
+    and the standard library otherwise. Both keep key order and write the
+    same bytes as json.dumps: non-ASCII characters escaped as \\uXXXX,
+    floats as repr() does, e.g. 1e-07, and NaN and infinities as such.
+    indent is the number of spaces per level, None writes compact json.
+
+    orjson only indents by two spaces, other indents are made by widening
+    its output. Data orjson rejects, e.g. integers beyond 64 bits, or may
+    write differently, see _writesLikeJson, is handled by the standard
+    library, chunk by chunk when writing.
+    '''
+    def __init__(self, useOrjson : bool = True):
+        self.useOrjson = ( useOrjson and orjson is not None )
+
+    def name(self) -> str:
+        return "orjson" if self.useOrjson else "json"
+
+    def loads(self, data : bytes):
+        if( self.useOrjson ):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+        return json.loads(data)
+
+    def dumps(self, obj, indent : int = DEFAULT_INDENT, sortKeys : bool = False) -> bytes:
+        if( self.useOrjson and indent is None and not sortKeys ):
+            # the common case of comparing values, often small ones
+            try:
+                result = orjson.dumps(obj)
+            except orjson.JSONEncodeError:
+                pass
+            else:
+                if( self._writesLikeJson(result) ):
+                    return result
+        return b"".join(self.iterDumps(obj, indent, sortKeys))
+
+    def iterDumps(self, obj, indent : int = DEFAULT_INDENT, sortKeys : bool = False):
+        '''
+        Yield the json of obj in chunks, one per piece of splitData, so
+        memory stays bounded by a chunk rather than the document and a
+        worker thread gives the GIL back between chunks. obj may also be a
+        Node, read in place, or a DocumentView.
+        '''
+        pad = b"" if indent is None else b" " * indent
+        # "{" and "}" compact, "{" and "\n}" indented, same for arrays
+        closing = 1 if indent is None else 2
+        keySeparator = b":" if indent is None else b": "
+        # [ isArray, whether an entry was written ] per open container, the
+        # level of its entries being the length of the stack
+        stack = []
+        for piece in splitData(obj, sortKeys):
+            kind = piece[0]
+            if( kind == "entries" ):
+                chunk = self._encode(piece[1], indent, sortKeys)[1:-closing]
+                if( len(stack) > 1 and indent is not None ):
+                    chunk = chunk.replace(b"\n", b"\n" + pad * ( len(stack) - 1 ))
+                yield b"," + chunk if stack[-1][1] else chunk
+                stack[-1][1] = True
+            elif( kind == "open" ):
+                head = b""
+                if( stack ):
+                    if( stack[-1][1] ):
+                        head = b","
+                    if( indent is not None ):
+                        head += b"\n" + pad * len(stack)
+                    if( not stack[-1][0] ):
+                        head += self._encode(piece[1], None, False) + keySeparator
+                    stack[-1][1] = True
+                stack.append([ piece[2], False ])
+                yield head + ( b"[" if piece[2] else b"{" )
+            elif( kind == "close" ):
+                isArray = stack.pop()[0]
+                end = b"]" if isArray else b"}"
+                yield end if indent is None else b"\n" + pad * len(stack) + end
+            else:
+                yield self._encode(piece[1], indent, sortKeys)
+
+    def _encode(self, data, indent : int, sortKeys : bool) -> bytes:
+        '''
+        json of data in one call, by orjson unless it rejects the data, see
+        the class docstring.
+        '''
+        if( self.useOrjson ):
+            option = 0
+            if( indent is not None ):
+                option |= orjson.OPT_INDENT_2
+            if( sortKeys ):
+                option |= orjson.OPT_SORT_KEYS
+            try:
+                result = orjson.dumps(data, option=option)
+            except orjson.JSONEncodeError:
+                pass
+            else:
+                if( self._writesLikeJson(result) ):
+                    return result if indent in ( None, 2 ) else self._widenIndent(result, indent)
+        separators = ( ",", ":" ) if indent is None else None
+        return json.dumps(data, indent=indent, separators=separators, sort_keys=sortKeys).encode("ascii")
+
+    @staticmethod
+    def _writesLikeJson(data : bytes) -> bool:
+        '''
+        Whether orjson wrote data as json.dumps would. orjson writes NaN and
+        infinities as null and does not escape non-ASCII characters. It finds
+        the same digits for a float but writes 1e-07 as 1e-7, 1e+20 as 1e20
+        and 1e-05 as 0.00001, while floats written alike never have a digit
+        then e or 0.0000. Rewriting such output would be slower than
+        json.dumps itself. These are looked for in the strings too, a string
+        holding one, e.g. ":null", only costs the faster path.
+        '''
+        if( not data.isascii() or b"\x7f" in data ):
+            return False
+        if( b"null" in data and _NULL_VALUE_RE.search(data) is not None ):
+            return False
+        digits = data.translate(_DIGITS_AS_ZERO)
+        return ( b"0e" not in digits and b"0.0000" not in digits )
+
+    @staticmethod
+    def _widenIndent(data : bytes, indent : int) -> bytes:
+        '''
+        Turn every two space level at the start of a line into indent spaces.
+        Raw newlines only appear between values, never inside strings, and
+        neither does a NUL byte, so NUL can mark the levels while replacing
+        them from the deepest up.
+        '''
+        depth = 0
+        while( b"\n" + b"  " * ( depth + 1 ) in data ):
+            depth += 1
+        for level in range(depth, 0, -1):
+            data = data.replace(b"\n" + b"  " * level, b"\n" + b"\0" * level)
+        return data.replace(b"\0", b" " * indent)
+
+
+def splitData(obj, sortKeys : bool = False):
+    '''
+    Yield obj, json data or a Node, in pieces small enough to encode or
+    pickle in one call, walking it with a stack instead of recursion:
+    ("open", key, isArray) and ("close",) around the entries of a container,
+    key being None for the top level and array items, and ("entries", run)
+    for a run of its entries, a list or a dict of plain data holding at
+    most DUMP_NODE_BUDGET values in all and DUMP_BATCH_SIZE entries. Data
+    that fits in one run comes as a single ("value", data). A Node is read
+    in place, entries never fetched come straight from the parsed data.
+    joinData puts the pieces together again.
+
+    A DocumentView is read as the document was when it was opened, each
+    piece made while holding its lock, see DocumentView.
+    '''
+    recorded = None
+    lock = nullcontext()
+    if( type(obj) is DocumentView ):
+        recorded = obj.recorded
+        lock = obj.lock
+        obj = obj.root
+
+    with lock:
+        whole = None
+        if( _budgetLeft([ obj ], DUMP_NODE_BUDGET, recorded) >= 0 ):
+            whole = ( "value", _data(obj, recorded) )
+        else:
+            isArray, entries, hasNodes = _entries(obj, sortKeys, recorded)
+    if( whole is not None ):
+        yield whole
+        return
+
+    yield ( "open", None, isArray )
+    # one frame per open container: isArray, its entries (values of an
+    # array, pairs of an object), whether they hold nodes, and the current
+    # batch of entries with the position of the first one not yielded yet
+    stack = [ [ isArray, entries, hasNodes, [], 0 ] ]
+    while( stack ):
+        with lock:
+            piece = _nextPiece(stack, sortKeys, recorded)
+        if( piece is not None ):
+            yield piece
+
+
+def _nextPiece(stack : list, sortKeys : bool, recorded : dict) -> tuple:
+    '''
+    The next piece of splitData from its stack of frames, None for none yet.
+    '''
+    frame = stack[-1]
+    isArray, entries, hasNodes, batch, position = frame
+    run = None
+    if( position == len(batch) ):
+        batch = list(islice(entries, DUMP_BATCH_SIZE))
+        position = 0
+        if( not batch ):
+            stack.pop()
+            return ( "close", )
+        run = batch if isArray else dict(batch)
+        if( _budgetLeft(run, DUMP_NODE_BUDGET, recorded) >= 0 ):
+            batch = []
+        else:
+            run = None
+
+    if( run is None ):
+        # the batch holds a large value, split it around the values
+        # that do not fit in one run
+        start = position
+        budget = DUMP_NODE_BUDGET
+        while( len(batch) > 1 and position < len(batch) ):
+            value = batch[position] if isArray else batch[position][1]
+            budget = _budgetLeft([ value ], budget, recorded)
+            if( budget < 0 ):
+                break
+            position += 1
+        run = batch[start:position] if isArray else dict(batch[start:position])
+
+    piece = None
+    child = None
+    if( run ):
+        if( hasNodes and isArray ):
+            run = [ _data(value, recorded) for value in run ]
+        elif( hasNodes ):
+            run = { key : _data(value, recorded) for key,value in run.items() }
+        piece = ( "entries", run )
+    elif( position < len(batch) ):
+        # a value too large for one run on its own gets a frame
+        if( isArray ):
+            key, child = None, batch[position]
+        else:
+            key, child = batch[position]
+        position += 1
+        childIsArray, childEntries, childHasNodes = _entries(child, sortKeys, recorded)
+        piece = ( "open", key, childIsArray )
+    frame[3:] = [ batch, position ]
+    if( child is not None ):
+        stack.append([ childIsArray, childEntries, childHasNodes, [], 0 ])
+    return piece
+
+
+def joinData(pieces):
+    '''
+    The data split by splitData, from its pieces in order.
+    '''
+    stack = []
+    data = None
+    for piece in pieces:
+        kind = piece[0]
+        if( kind == "entries" ):
+            if( type(stack[-1]) is list ):
+                stack[-1].extend(piece[1])
+            else:
+                stack[-1].update(piece[1])
+        elif( kind == "open" ):
+            container = [] if piece[2] else {}
+            if( not stack ):
+                data = container
+            elif( type(stack[-1]) is list ):
+                stack[-1].append(container)
+            else:
+                stack[-1][piece[1]] = container
+            stack.append(container)
+        elif( kind == "close" ):
+            stack.pop()
+        else:
+            return piece[1]
+    return data
+
+
+def _data(value, recorded : dict = None):
+    if( type(value) is not Node ):
+        return value
+    if( recorded is not None ):
+        value = recorded.get(value, value)
+    return Document.nodeData(value, recorded)
+
+
+def _entries(value, sortKeys : bool, recorded : dict = None) -> tuple:
+    '''
+    (isArray, entries, hasNodes) of a dict, a list or a Node branch, the
+    entries being the values of an array and the (key, value) pairs of
+    an object. The values of a Node are its child nodes then the raw
+    entries it has not fetched. recorded is that of a DocumentView, the
+    entries then hold the nodes as they are now and must be taken while
+    holding its lock.
+    '''
+    if( type(value) is Node and recorded is not None ):
+        value = recorded.get(value, value)
+    if( type(value) is Node and value.children is None ):
+        value = value.value
+    hasNodes = ( type(value) is Node )
+    if( hasNodes ):
+        isArray = value.isArray
+        children = value.children
+        if( recorded is not None ):
+            # the document may change the live list once the lock is released
+            children = list(children)
+        if( isArray ):
+            entries = iter(children)
+        elif( recorded is None ):
+            entries = ( ( child.key, child ) for child in children )
+        else:
+            entries = ( ( recorded.get(child, child).key, child ) for child in children )
+        if( value.pending is not None ):
+            raw = value.value if isArray else value.value.items()
+            entries = chain(entries, islice(raw, value.fetched, None))
+    else:
+        isArray = ( type(value) is list )
+        entries = iter(value if isArray else value.items())
+    if( sortKeys and not isArray ):
+        entries = iter(sorted(entries, key=itemgetter(0)))
+    return isArray, entries, hasNodes
+
+
+def _budgetLeft(values : list, budget : int, recorded : dict = None) -> int:
+    '''
+    budget less the number of values and of the entries nested in them,
+    negative once it runs out. Only DUMP_PROBE_SIZE entries of a larger
+    container are looked into, each standing for its share of the rest,
+    and DUMP_PROBE_DEPTH levels, so the count is an estimate whose cost does
+    not grow with the data. recorded is as for _entries.
+    '''
+    stack = [ ( values, 1.0, 0 ) ]
+    while( stack ):
+        value, weight, depth = stack.pop()
+        if( depth > DUMP_PROBE_DEPTH ):
+            return -1
+        if( type(value) is Node ):
+            if( recorded is not None ):
+                value = recorded.get(value, value)
+            if( value.children is None ):
+                value = value.value
+            else:
+                count = len(value.children)
+                if( value.pending is not None ):
+                    count += len(value.value) - value.fetched
+                budget -= weight * count
+                if( budget < 0 ):
+                    return -1
+                probe = value.children[:DUMP_PROBE_SIZE]
+                if( probe ):
+                    weight *= count / len(probe)
+                    stack.extend( ( child, weight, depth + 1 ) for child in probe )
+                continue
+        if( type(value) is dict ):
+            probe = list(islice(value.values(), DUMP_PROBE_SIZE))
+        elif( type(value) is list ):
+            probe = value[::len(value) // DUMP_PROBE_SIZE or 1][:DUMP_PROBE_SIZE]
+        else:
+            continue
+        budget -= weight * len(value)
+        if( budget < 0 ):
+            return -1
+        if( probe ):
+            weight *= len(value) / len(probe)
+            stack.extend( ( item, weight, depth + 1 ) for item in probe if type(item) in ( dict, list, Node ) )
+    return budget
+
+
+CODEC = JsonCodec()
+
+
+# One change made to a Document, passed to its listeners.
+# kind is "insert", "remove", "key" or "value". path is the key path of the
+# node before the change (after it for "insert"). value and oldValue are the
+# new and old key or value, parent and row where the node was (for "remove")
+# or is (for "insert").
+Edit = namedtuple("Edit", "kind path node value oldValue parent row")
+
+# An Edit as kept by UndoStack. The node is found again by the key path of
+# its parent and its row, so records outlive the nodes, e.g. a hibernation.
+# node is only kept for "remove", the detached node holds the removed data.
+UndoRecord = namedtuple("UndoRecord", "kind parentPath row key value oldValue node")
+
+
+class Node:
+    '''
+    One key of a document. A branch created from parsed json keeps the raw
+    dict or list in value and only gets child nodes when they are fetched:
+    children is None until the first fetch, pending iterates the raw entries
+    not fetched yet and fetched counts the ones that were.
+
+    The children of an array are keyed by their index, which is kept equal
+    to their row.
+    '''
+    __slots__ = (
+        "key",
+        "value",
+        "parent",
+        "children",
+        "row",
+        "checked",
+        "expanded",
+        "pending",
+        "fetched",
+        "isArray"
+    )
+
+    def __init__(self, key : str = "", value=None, parent=None):
+        self.key = key
+        self.value = value
+        self.parent = parent
+        self.children = None
+        # position in parent.children, kept up to date on insert and delete
+        self.row = 0
+        self.checked = False
+        self.expanded = False
+        self.pending = None
+        self.fetched = 0
+        self.isArray = ( type(value) is list )
+
+    def isBranch(self) -> bool:
+        return ( self.children is not None or type(self.value) in ( dict, list ) )
+
+    def childCount(self) -> int:
+        return 0 if self.children is None else len(self.children)
+
+    def hasChildren(self) -> bool:
+        return ( self.childCount() != 0 or self.pendingCount() != 0 )
+
+    def pendingCount(self) -> int:
+        if( self.children is None ):
+            return len(self.value) if type(self.value) in ( dict, list ) else 0
+        if( self.pending is None ):
+            return 0
+        return len(self.value) - self.fetched
+
+    def path(self) -> list:
+        keys = []
+        node = self
+        while( node.parent is not None ):
+            keys.append(node.key)
+            node = node.parent
+        keys.reverse()
+        return keys
+
+
+class Document:
+    '''
+    Qt independent tree of a json file. It is the only copy of the data,
+    views read it and every edit goes through it.
+
+    A hibernated document has no nodes, only its data pickled, see hibernate().
+    '''
+    def __init__(self, data : dict, dataBytes : int = 0):
+        self.root = Node("", data)
+        # callables notified with an Edit after every change of content
+        self.listeners = []
+        # checked nodes in the order they were checked, a dict used as an
+        # ordered set so the selection never needs a walk over the tree
+        self.checkedNodes = {}
+        # size of the json the data was parsed from and nodes fetched since,
+        # for memoryEstimate
+        self.dataBytes = dataBytes
+        self.nodeCount = 0
+        # pickled data and checked key paths while hibernated
+        self.frozen = None
+        self.frozenChecked = None
+        # DocumentViews being written, see openView
+        self.views = []
+
+    def fetch(self, node : Node, count : int = None) -> int:
+        '''
+        Create up to count pending children of node, all of them if count is None.
+        Returns the number of children created.
+        '''
+        remaining = node.pendingCount()
+        if( remaining == 0 ):
+            return 0
+        if( count is None or count > remaining ):
+            count = remaining
+
+        self._beforeChange(node)
+        if( node.children is None ):
+            node.children = []
+            node.pending = enumerate(node.value) if node.isArray else iter(node.value.items())
+
+        children = node.children
+        row = len(children)
+        isArray = node.isArray
+        for key,val in islice(node.pending, count):
+            # items inserted or removed before the pending ones shift their index
+            child = Node(row if isArray else key, val, node)
+            child.row = row
+            children.append(child)
+            row += 1
+
+        profiler.count("nodes", count)
+        self.nodeCount += count
+        node.fetched += count
+        if( node.fetched == len(node.value) ):
+            # the raw dict is fully represented by children now
+            node.value = None
+            node.pending = None
+            node.fetched = 0
+        return count
+
+    def fetchAll(self, node : Node = None) -> None:
+        stack = [ node or self.root ]
+        while( stack ):
+            curr = stack.pop()
+            self.fetch(curr)
+            if( curr.children is not None ):
+                stack.extend(curr.children)
+
+    def iterNodes(self, node : Node = None):
+        '''
+        Yield every fetched node under node in pre-order, node itself excluded.
+        '''
+        start = node or self.root
+        stack = list(reversed(start.children or []))
+        while( stack ):
+            curr = stack.pop()
+            yield curr
+            if( curr.children ):
+                stack.extend(reversed(curr.children))
+
+    def countNodes(self, limit : int) -> int:
+        '''
+        Count nodes, fetched or not, stopping once limit is reached.
+        '''
+        count = 0
+        stack = [ self.root ]
+        while( stack and count < limit ):
+            curr = stack.pop()
+            if( curr.children is not None ):
+                count += len(curr.children)
+                stack.extend(curr.children)
+            if( curr.pendingCount() != 0 ):
+                rawStack = [ curr.value ]
+                while( rawStack and count < limit ):
+                    raw = rawStack.pop()
+                    count += len(raw)
+                    values = raw if type(raw) is list else raw.values()
+                    rawStack.extend( val for val in values if type(val) in ( dict, list ) )
+        return min(count, limit)
+
+    def nodeAtPath(self, path : list, fetch=None) -> Node:
+        '''
+        Node at a key path, fetching just enough along the way to reach it
+        with fetch(node, count), Document.fetch by default. Returns None if
+        there is no such node.
+        '''
+        fetch = fetch or self.fetch
+        node = self.root
+        for key in path:
+            child = None
+            if( node.isArray ):
+                # the index is the row
+                if( type(key) is not int or key < 0 ):
+                    return None
+                missing = key + 1 - node.childCount()
+                if( missing > 0 and node.pendingCount() >= missing ):
+                    fetch(node, missing)
+                if( key >= node.childCount() ):
+                    return None
+                node = node.children[key]
+                continue
+            for fetchedChild in node.children or ():
+                if( fetchedChild.key == key ):
+                    child = fetchedChild
+                    break
+            if( child is None and node.pendingCount() != 0 ):
+                # find the position among the raw entries and fetch up to it at once
+                for offset,pendingKey in enumerate(islice(node.value, node.fetched, None)):
+                    if( pendingKey == key ):
+                        first = node.childCount()
+                        fetch(node, offset + 1)
+                        child = node.children[first + offset]
+                        break
+            if( child is None ):
+                return None
+            node = child
+        return node
+
+    def isAttached(self, node : Node) -> bool:
+        while( node.parent is not None ):
+            node = node.parent
+        return ( node is self.root )
+
+    def setChecked(self, node : Node, checked : bool) -> None:
+        node.checked = checked
+        if( checked ):
+            self.checkedNodes[node] = None
+        else:
+            self.checkedNodes.pop(node, None)
+
+    def setAllChecked(self, checked : bool) -> None:
+        '''
+        Check every node, fetching the whole document, or uncheck the checked
+        ones. Meant to be wrapped in one view update by the caller.
+        '''
+        if( checked ):
+            self.fetchAll()
+            for node in self.iterNodes():
+                node.checked = True
+            self.checkedNodes = dict.fromkeys(self.iterNodes())
+        else:
+            for node in self.checkedNodes:
+                node.checked = False
+            self.checkedNodes = {}
+
+    def setCheckedNodes(self, nodes : list) -> None:
+        '''
+        Check exactly the given nodes, unchecking the others.
+        '''
+        for node in self.checkedNodes:
+            node.checked = False
+        for node in nodes:
+            node.checked = True
+        self.checkedNodes = dict.fromkeys(nodes)
+
+    def setAllExpanded(self, expanded : bool) -> None:
+        for node in self.iterNodes():
+            if( node.children ):
+                node.expanded = expanded
+
+    def selectedNodes(self) -> list:
+        '''
+        Checked nodes in check order. Nodes under a deleted node are dropped
+        here rather than on delete, so both cost O(selected).
+        '''
+        detached = [ node for node in self.checkedNodes if not self.isAttached(node) ]
+        for node in detached:
+            del self.checkedNodes[node]
+        return list(self.checkedNodes)
+
+    def topmostNodes(self, nodes : list) -> list:
+        '''
+        Nodes of the list that have no ancestor in the list.
+        '''
+        nodeSet = set(nodes)
+        topmost = []
+        for node in nodes:
+            parent = node.parent
+            while( parent is not None and parent not in nodeSet ):
+                parent = parent.parent
+            if( parent is None ):
+                topmost.append(node)
+        return topmost
+
+    def addListener(self, listener) -> None:
+        self.listeners.append(listener)
+
+    def removeListener(self, listener) -> None:
+        self.listeners.remove(listener)
+
+    def _notify(self, kind : str, path : list, node : Node, value=None, oldValue=None, parent : Node = None, row : int = 0) -> None:
+        if( not self.listeners ):
+            return
+        edit = Edit(kind, path, node, value, oldValue, parent, row)
+        for listener in self.listeners:
+            listener(edit)
+
+    def removeNode(self, node : Node, renumber : bool = True) -> None:
+        '''
+        Remove node from its parent. See renumber for renumber=False.
+        '''
+        self.checkedNodes.pop(node, None)
+        path = node.path()
+        parent = node.parent
+        row = node.row
+        self._beforeChange(parent)
+        parent.children.pop(row)
+        if( renumber ):
+            self.renumber(parent, row)
+        # node and the nodes fetched under it, see memoryEstimate
+        self.nodeCount -= 1 + sum( 1 for child in self.iterNodes(node) )
+        node.parent = None
+        self._notify("remove", path, node, parent=parent, row=row)
+
+    def renumber(self, parent : Node, first : int) -> None:
+        '''
+        Give the children of parent from row first on their row, and their
+        index as key in an array. Removing children from the last row up or
+        inserting them from the first row down only leaves the rows after the
+        edit wrong, so a batch of them may pass renumber=False and renumber
+        once at the end instead of after every row.
+        '''
+        children = parent.children
+        if( parent.isArray ):
+            for i in range(first, len(children)):
+                child = children[i]
+                child.row = i
+                child.key = i
+        else:
+            for i in range(first, len(children)):
+                children[i].row = i
+
+    def insertPairs(self, parent : Node, pairs : list) -> list:
+        '''
+        Append (key,value) pairs as children of parent, a leaf parent becomes
+        a branch and loses its value. Returns the new nodes. Raises
+        ValueError for a key parent already has, see checkKeys.
+        '''
+        # keep document order, pending entries come before the new ones
+        self.fetch(parent)
+        self._beforeChange(parent)
+        if( parent.children is None ):
+            oldValue = parent.value
+            parent.children = []
+            parent.value = None
+            if( type(oldValue) not in ( dict, list ) ):
+                # a leaf became a branch, reported so it can be undone
+                self._notify("value", parent.path(), parent, {}, oldValue)
+
+        self.checkKeys(parent, newKeys=[ key for key,val in pairs ])
+        nodes = []
+        parentPath = parent.path()
+        for key,val in pairs:
+            if( parent.isArray ):
+                # appended, the index is the only key an item has
+                key = len(parent.children)
+            node = Node(key, val, parent)
+            node.row = len(parent.children)
+            parent.children.append(node)
+            nodes.append(node)
+            self.nodeCount += 1
+            self._notify("insert", parentPath + [key], node, val, parent=parent, row=node.row)
+        return nodes
+
+    def insertNode(self, parent : Node, row : int, key : str, value, renumber : bool = True) -> Node:
+        '''
+        Insert one (key,value) pair as the child of parent at row, fetching
+        the children before it first. Used to undo a remove. See renumber
+        for renumber=False.
+        '''
+        missing = row - parent.childCount()
+        if( missing > 0 ):
+            self.fetch(parent, missing)
+        if( parent.children is None ):
+            # starts the pending iterator of an unfetched branch
+            self.fetch(parent, 0)
+        self._beforeChange(parent)
+        if( parent.children is None ):
+            parent.children = []
+            parent.value = None
+
+        if( parent.isArray ):
+            key = row
+        node = Node(key, value, parent)
+        node.row = row
+        parent.children.insert(row, node)
+        if( renumber ):
+            self.renumber(parent, row)
+        self.nodeCount += 1
+        self._notify("insert", parent.path() + [key], node, value, parent=parent, row=row)
+        return node
+
+    def setKey(self, node : Node, key : str, check : bool = True) -> None:
+        '''
+        Give node a new key. Raises ValueError for a key one of its siblings
+        has, see checkKeys, unless check is False for keys already checked.
+        '''
+        if( check and node.parent is not None and key != node.key ):
+            self.checkKeys(node.parent, { node : key })
+        self._beforeChange(node)
+        oldKey = node.key
+        node.key = key
+        if( node.parent is not None ):
+            path = node.path()
+            path[-1] = oldKey
+            self._notify("key", path, node, key, oldKey)
+
+    def checkRenames(self, renames : dict) -> None:
+        '''
+        checkKeys for renames, node to new key, in any number of parents.
+        '''
+        byParent = {}
+        for node,key in renames.items():
+            if( node.parent is not None and key != node.key ):
+                byParent.setdefault(node.parent, {})[node] = key
+        for parent,parentRenames in byParent.items():
+            self.checkKeys(parent, parentRenames)
+
+    def checkKeys(self, parent : Node, renames : dict = None, newKeys : list = ()) -> None:
+        '''
+        Raise ValueError if parent would have two children with the same key
+        once the child nodes in renames got their new key and newKeys were
+        inserted. Entries not fetched count too. The search index, the undo
+        stack, the journal and the schema checker tell nodes apart by their
+        key path, which a duplicate key makes ambiguous, and json keeps only
+        the last of them.
+        '''
+        if( parent.isArray ):
+            return
+        renames = renames or {}
+        keys = set()
+        allKeys = [ renames.get(child, child.key) for child in parent.children or [] ]
+        if( type(parent.value) is dict ):
+            start = parent.fetched if parent.children is not None else 0
+            allKeys.extend(islice(parent.value, start, None))
+        allKeys.extend(newKeys)
+        for key in allKeys:
+            if( key in keys ):
+                path = ".".join(map(str, parent.path())) or "the top level"
+                raise ValueError(f"key {key} already exists at {path}")
+            keys.add(key)
+
+    def setValue(self, node : Node, value) -> None:
+        '''
+        Give node a new value. A dict or list value makes it a branch whose
+        children are fetched from it, a branch given a leaf value loses its
+        children, e.g. when an insert into a leaf is undone.
+        '''
+        self._beforeChange(node)
+        oldValue = node.value
+        if( node.children is not None ):
+            oldValue = self.nodeData(node)
+            for child in node.children:
+                child.parent = None
+            node.children = None
+            node.pending = None
+            node.fetched = 0
+        node.value = value
+        node.isArray = ( type(value) is list )
+        self._notify("value", node.path(), node, value, oldValue)
+
+    def toDict(self) -> dict:
+        '''
+        Build the json data of the document. Entries that were never fetched
+        are shared with the parsed data, which the document never mutates.
+        '''
+        if( self.frozen is not None ):
+            return pickle.loads(self.frozen)
+
+        return self.nodeData(self.root)
+
+    def dumpSource(self):
+        '''
+        What CODEC.iterDumps takes to write the document without building
+        its data: the root node, read in place, or the data of a hibernated
+        document. Only valid until the next edit, see openView otherwise.
+        '''
+        if( self.frozen is not None ):
+            return pickle.loads(self.frozen)
+        return self.root
+
+    def openView(self):
+        '''
+        A DocumentView of the content as it is now, for CODEC.iterDumps in
+        another thread while the document is edited, to be passed to
+        closeView once written. The data itself while hibernated.
+        '''
+        if( self.frozen is not None ):
+            return pickle.loads(self.frozen)
+        view = DocumentView(self.root)
+        self.views.append(view)
+        return view
+
+    def closeView(self, view) -> None:
+        self.views = [ other for other in self.views if other is not view ]
+
+    def _beforeChange(self, node : Node) -> None:
+        for view in self.views:
+            view.record(node)
+
+    @staticmethod
+    def nodeData(node : Node, recorded : dict = None):
+        '''
+        Json data of the subtree of node, a branch or a leaf value. recorded
+        is that of a DocumentView to look the nodes below node up in, node
+        being looked up already.
+        '''
+        if( node.children is None ):
+            return node.value
+        children = node.children
+        if( recorded is not None ):
+            children = map(recorded.get, children, children)
+        if( node.isArray ):
+            items = [ Document.nodeData(child, recorded) for child in children ]
+            if( node.pending is not None ):
+                items.extend(islice(node.value, node.fetched, None))
+            return items
+        resDict = {}
+        for child in children:
+            resDict[child.key] = Document.nodeData(child, recorded)
+        if( node.pending is not None ):
+            for key,val in islice(node.value.items(), node.fetched, None):
+                resDict[key] = val
+        return resDict
+
+    def isHibernated(self) -> bool:
+        return ( self.frozen is not None )
+
+    def hibernate(self) -> None:
+        '''
+        Drop every node and keep only the pickled data, which includes the
+        edits, and the key paths of the checked nodes. Listeners stay
+        registered, wake() gives the document a fresh root.
+        '''
+        if( self.frozen is not None ):
+            return
+        self.frozenChecked = [ node.path() for node in self.selectedNodes() ]
+        self.frozen = pickle.dumps(self.toDict(), pickle.HIGHEST_PROTOCOL)
+        self.root = None
+        self.checkedNodes = {}
+        self.nodeCount = 0
+
+    def wake(self) -> None:
+        if( self.frozen is None ):
+            return
+        self.root = Node("", pickle.loads(self.frozen))
+        self.frozen = None
+        for path in self.frozenChecked:
+            node = self.nodeAtPath(path)
+            if( node is not None ):
+                self.setChecked(node, True)
+        self.frozenChecked = None
+
+    def memoryEstimate(self) -> int:
+        '''
+        Rough bytes held by the document, the parsed data and the fetched
+        nodes, or the pickle while hibernated.
+        '''
+        if( self.frozen is not None ):
+            return len(self.frozen)
+        return self.dataBytes * PARSED_BYTES_PER_FILE_BYTE + self.nodeCount * NODE_BYTES
+
+
+class DocumentView:
+    '''
+    The content of a document when Document.openView was called, while the
+    document goes on being edited, e.g. by the GUI thread while a worker
+    writes the view. Before the document first changes a node it records a
+    copy of the node as it was, copy on write.
+
+    A node as it was is recorded.get(node, node), its copy or the node
+    itself, unchanged so far. That only holds while holding lock, which
+    keeps nodes from changing until it is released, and the children of
+    a node are to be looked up in turn.
+    '''
+    def __init__(self, root : Node):
+        self.root = root
+        # node -> copy of it before its first change
+        self.recorded = {}
+        self.lock = threading.Lock()
+
+    def record(self, node : Node) -> None:
+        if( node in self.recorded ):
+            # recorded for good, no need to wait for a piece being read
+            return
+        with self.lock:
+            if( node not in self.recorded ):
+                self.recorded[node] = self._copy(node)
+
+    @staticmethod
+    def _copy(node : Node) -> Node:
+        # the parsed data is never mutated, only the node's own fields
+        copy = Node(node.key, node.value)
+        copy.isArray = node.isArray
+        if( node.children is not None ):
+            copy.children = list(node.children)
+        copy.pending = node.pending
+        copy.fetched = node.fetched
+        return copy
+
+
+class UndoStack:
+    '''
+    Undo and redo of the edits of one document, registered as one of its
+    listeners. Edits reported inside step() are undone together, any other
+    edit (e.g. a cell edited in place) is a step of its own.
+
+    A step only keeps UndoRecords, so it costs memory in proportion to the
+    edit: a removed subtree is the detached node itself, not a copy.
+    Undoing applies the inverse edits through a target, a JsonTreeModel,
+    so only the affected rows change. The edits the target reports back
+    while undoing become the redo step, and the other way round.
+    '''
+    def __init__(self, limit : int = UNDO_LIMIT):
+        self.limit = limit
+        self.undoSteps = []
+        self.redoSteps = []
+        # records of the step being made, None outside of a step
+        self.recording = None
+
+    def applyEdit(self, edit : Edit) -> None:
+        '''
+        Document listener, see Edit.
+        '''
+        node = edit.node
+        if( edit.kind in ( "insert", "remove" ) ):
+            record = UndoRecord(edit.kind, edit.path[:-1], edit.row, edit.path[-1], edit.value, edit.oldValue, node if edit.kind == "remove" else None)
+        else:
+            record = UndoRecord(edit.kind, edit.path[:-1], node.row, edit.path[-1], edit.value, edit.oldValue, None)
+
+        if( self.recording is not None ):
+            self.recording.append(record)
+        else:
+            self._push(self.undoSteps, [ record ])
+            self.redoSteps = []
+
+    @contextmanager
+    def step(self):
+        '''
+        Record the edits made in the enclosed code as one step.
+        '''
+        if( self.recording is not None ):
+            yield
+            return
+        self.recording = []
+        try:
+            yield
+        finally:
+            records = self.recording
+            self.recording = None
+            if( len(records) != 0 ):
+                self._push(self.undoSteps, records)
+                self.redoSteps = []
+
+    def _push(self, steps : list, records : list) -> None:
+        steps.append(records)
+        if( len(steps) > self.limit ):
+            del steps[0]
+
+    def canUndo(self) -> bool:
+        return ( len(self.undoSteps) != 0 )
+
+    def canRedo(self) -> bool:
+        return ( len(self.redoSteps) != 0 )
+
+    def clear(self) -> None:
+        self.undoSteps = []
+        self.redoSteps = []
+
+    def undo(self, target) -> int:
+        '''
+        Undo the last step through target. Returns the number of edits undone.
+        '''
+        if( not self.undoSteps ):
+            return 0
+        return self._revert(self.undoSteps.pop(), target, self.redoSteps)
+
+    def redo(self, target) -> int:
+        if( not self.redoSteps ):
+            return 0
+        return self._revert(self.redoSteps.pop(), target, self.undoSteps)
+
+    def _revert(self, records : list, target, steps : list) -> int:
+        self.recording = []
+        # (parent, first row) of a run of inserts and removes not renumbered yet
+        stale = None
+        try:
+            for record in reversed(records):
+                stale = self._applyInverse(record, target, stale)
+        finally:
+            if( stale is not None ):
+                target.document.renumber(*stale)
+            inverse = self.recording
+            self.recording = None
+            self._push(steps, inverse)
+        return len(records)
+
+    def _applyInverse(self, record : UndoRecord, target, stale : tuple) -> tuple:
+        '''
+        Apply the inverse of record through target. A run of inserts and
+        removes in one parent is renumbered once at its end, see
+        Document.renumber, the (parent, first row) still to renumber is
+        returned.
+        '''
+        document = target.document
+        if( stale is not None ):
+            staleParent, first = stale
+            # only a remove above the rows already shifted can go on without them
+            sameRun = (
+                record.kind == "remove" or ( record.kind == "insert" and record.row < first )
+            ) and record.parentPath == staleParent.path()
+            if( not sameRun ):
+                document.renumber(staleParent, first)
+                stale = None
+
+        parent = document.nodeAtPath(record.parentPath, target.fetchNode)
+        if( parent is None ):
+            return stale
+        if( record.kind == "remove" ):
+            target.insertNode(parent, record.row, record.key, Document.nodeData(record.node), False)
+            return ( parent, record.row if stale is None else min(stale[1], record.row) )
+
+        missing = record.row + 1 - parent.childCount()
+        if( missing > 0 ):
+            target.fetchNode(parent, missing)
+        if( record.row >= parent.childCount() ):
+            return stale
+        node = parent.children[record.row]
+        if( record.kind == "insert" ):
+            target.removeNode(node, False)
+            return ( parent, record.row )
+        elif( record.kind == "key" ):
+            # the old key was unique when the edit was made
+            target.setNodeKey(node, record.oldValue, False)
+        elif( record.kind == "value" ):
+            target.setNodeValue(node, record.oldValue)
+        return None
 
 
 class TabData:
-    def __init__(self, filePath=""):
+    def __init__(self, filePath="", document : Document = None):
         self.filePath = filePath
+        self.document = document or Document({})
         self.areChangesSaved = True
+        # bumped on every unsaved change, lets a background save tell whether
+        # the tab was edited after its snapshot was taken
+        self.editCount = 0
+        self.isSaving = False
+        self.saveRequested = False
+        # time.monotonic() of the last switch to the tab, the least recently
+        # active tabs are hibernated first
+        self.lastActive = time.monotonic()
+        # kept up to date through the document listeners, built by the caller
+        self.searchIndex = SearchIndex()
+        self.document.addListener(self.searchIndex.applyEdit)
+        self.undoStack = UndoStack()
+        self.document.addListener(self.undoStack.applyEdit)
+        # journal.EditJournal of the tab, attached by the caller
+        self.journal = None
+        # schema.SchemaChecker of the tab, a listener of its document once
+        # attached by the caller
+        self.schemaChecker = None
+        # Model.diskStat of the file as last read or written by the tab, and
+        # whether another program changed the file since
+        self.diskStat = None
+        self.diskChanged = False
 
 
 class Model:
     def __init__(self):
         self.tabDataList = []
+        # indent of saved files, see JsonCodec
+        self.saveIndent = DEFAULT_INDENT
+        # bytes, see tabsToHibernate
+        self.memoryBudget = DEFAULT_MEMORY_BUDGET
+        # number of tabs of each open file, keyed by pathKey
+        self.openPaths = {}
+
+    def newFile(self) -> Document:
+        tabData = TabData("")
+        tabData.searchIndex.finishBuild()
+        self.tabDataList.append(tabData)
+        return tabData.document
+
+    @staticmethod
+    def readFile(filePath : str, progress=None) -> dict:
+        '''
+        Read and parse a json file. progress(bytesRead, totalBytes) is called
+        after every chunk. Touches no Model state, so it is safe to run in a worker.
+        '''
+        return CODEC.loads(Model.readBytes(filePath, progress))
 
-    def newFile(self) -> None:
-        self.tabDataList.append(TabData(""))
+    @staticmethod
+    def readBytes(filePath : str, progress=None) -> bytearray:
+        '''
+        Content of a file, see readFile.
+        '''
+        totalBytes = os.path.getsize(filePath)
+        bytesRead = 0
+        # read straight into one buffer instead of joining chunks
+        data = bytearray(totalBytes)
+        with open(filePath, "rb", buffering=0) as f:
+            with memoryview(data) as view:
+                while( bytesRead < totalBytes ):
+                    count = f.readinto(view[bytesRead:bytesRead + READ_CHUNK_SIZE])
+                    if( not count ):
+                        break
+                    bytesRead += count
+                    if( progress is not None ):
+                        progress(bytesRead, totalBytes)
+            if( bytesRead < totalBytes ):
+                # the file shrank while reading
+                del data[bytesRead:]
+            else:
+                data += f.read()
+        return data
 
-    def openFile(self, filePath : str) -> dict:
-        with open(filePath) as f:
-            text = f.read()
-        fileDataDict = json.loads(text)
-        self.tabDataList.append(TabData(filePath))
-        return fileDataDict
+    @staticmethod
+    def diskStat(filePath : str):
+        '''
+        (modification time in ns, size) of a file, None if it is missing.
+        Tells a change made by another program from the tab's own save.
+        '''
+        try:
+            fileStat = os.stat(filePath)
+        except OSError:
+            return None
+        return ( fileStat.st_mtime_ns, fileStat.st_size )
 
-    def saveFile(self, index : int, dataDict : dict) -> None:
-        with open(self.tabDataList[index].filePath, "w") as f:
-            f.write(json.dumps(dataDict, indent=4))
+    def openFile(self, filePath : str, fileDataDict : dict = None) -> Document:
+        '''
+        Register a tab for filePath. The file is read here unless it was
+        already parsed, e.g. by a FileLoader.
+        '''
+        if( fileDataDict is None ):
+            fileDataDict = self.readFile(filePath)
+        try:
+            dataBytes = os.path.getsize(filePath)
+        except OSError:
+            dataBytes = 0
+        tabData = TabData(filePath, Document(fileDataDict, dataBytes))
+        self.tabDataList.append(tabData)
+        self._addPath(filePath)
+        return tabData.document
+
+    @staticmethod
+    def writeFile(filePath : str, dataDict : dict, timings : dict = None, indent : int = DEFAULT_INDENT) -> None:
+        '''
+        Write dataDict, json data, a Document.dumpSource or a DocumentView,
+        as json to a temp file next to filePath, streamed chunk by chunk,
+        fsync it and rename it over filePath, so a crash never leaves a
+        truncated file. Touches no Model state, so it is safe to run in a
+        worker. If given,
+        timings gets the seconds spent in the serialize, write and sync phases.
+        '''
+        start = time.perf_counter()
+        writeSeconds = 0.0
+        filePath = os.path.realpath(filePath)
+        dirName = os.path.dirname(filePath)
+        try:
+            mode = stat.S_IMODE(os.stat(filePath).st_mode)
+        except FileNotFoundError:
+            mode = NEW_FILE_MODE
+
+        fd, tempPath = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=dirName)
+        try:
+            with open(fd, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+                for chunk in CODEC.iterDumps(dataDict, indent):
+                    writeStart = time.perf_counter()
+                    f.write(chunk)
+                    writeSeconds += time.perf_counter() - writeStart
+                writeStart = time.perf_counter()
+                f.flush()
+                writeSeconds += time.perf_counter() - writeStart
+                syncStart = time.perf_counter()
+                os.fsync(f.fileno())
+            os.chmod(tempPath, mode)
+            os.replace(tempPath, filePath)
+        except BaseException:
+            try:
+                os.unlink(tempPath)
+            except OSError:
+                pass
+            raise
+
+        # make the rename itself durable
+        if( hasattr(os, "O_DIRECTORY") ):
+            dirFd = os.open(dirName, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dirFd)
+            finally:
+                os.close(dirFd)
+
+        if( timings is not None ):
+            end = time.perf_counter()
+            timings["serialize"] = syncStart - start - writeSeconds
+            timings["write"] = writeSeconds
+            timings["sync"] = end - syncStart
+
+    def saveFile(self, index : int) -> None:
+        self.writeFile(self.tabDataList[index].filePath, self.document(index).dumpSource(), indent=self.saveIndent)
         self.setChangesSaved(True, index)
 
-    def saveAsFile(self, index : int, dataDict : dict, filePath : str) -> None:
-        with open(filePath, "w") as f:
-            f.write(json.dumps(dataDict, indent=4))
+    def saveAsFile(self, index : int, filePath : str) -> None:
+        self.writeFile(filePath, self.document(index).dumpSource(), indent=self.saveIndent)
         if( self.isUntitledFile(index) ):
             self.tabDataList[index].filePath = filePath
+            self._addPath(filePath)
             self.setChangesSaved(True, index)
 
+    def tabData(self, index : int) -> TabData:
+        return self.tabDataList[index]
+
+    def document(self, index : int) -> Document:
+        return self.tabDataList[index].document
+
+    def searchIndex(self, index : int) -> SearchIndex:
+        return self.tabDataList[index].searchIndex
+
+    def undoStack(self, index : int) -> UndoStack:
+        return self.tabDataList[index].undoStack
+
+    def snapshot(self, index : int) -> dict:
+        '''
+        Json data of the tab, independent of later edits to its document.
+        '''
+        return self.tabDataList[index].document.toDict()
+
+    def setActive(self, index : int) -> None:
+        self.tabDataList[index].lastActive = time.monotonic()
+
+    def tabsToHibernate(self, currentIndex : int) -> list:
+        '''
+        Indexes of the tabs to hibernate, least recently active first, so the
+        estimated memory of all tabs fits in memoryBudget. The current tab
+        and tabs being saved are never picked.
+        '''
+        total = sum( tabData.document.memoryEstimate() for tabData in self.tabDataList )
+        candidates = [
+            index
+            for index,tabData in enumerate(self.tabDataList)
+            if index != currentIndex and not tabData.isSaving and not tabData.document.isHibernated()
+        ]
+        candidates.sort(key=lambda index: self.tabDataList[index].lastActive)
+        picked = []
+        for index in candidates:
+            if( total <= self.memoryBudget ):
+                break
+            total -= self.tabDataList[index].document.memoryEstimate()
+            picked.append(index)
+        return picked
+
+    def finishSave(self, tabData : TabData, filePath : str, editCount : int, isSaveAs : bool) -> None:
+        '''
+        Record a background save of a snapshot taken at editCount. The tab
+        only becomes clean if it was not edited while the save was running.
+        '''
+        tabData.isSaving = False
+        if( isSaveAs ):
+            if( tabData.filePath != "" ):
+                return
+            tabData.filePath = filePath
+            self._addPath(filePath)
+        if( tabData.editCount == editCount ):
+            tabData.areChangesSaved = True
+
     def isUntitledFile(self, index : int) -> bool:
         return ( self.tabDataList[index].filePath == "" )
 
     def setChangesSaved(self, changesSaved : bool, index : int) -> None:
-        self.tabDataList[index].areChangesSaved = changesSaved
+        tabData = self.tabDataList[index]
+        tabData.areChangesSaved = changesSaved
+        if( not changesSaved ):
+            tabData.editCount += 1
 
     def areChangesSaved(self, index : int) -> bool:
         return self.tabDataList[index].areChangesSaved
@@ -46,11 +1394,27 @@ class Model:
     def filePath(self, index : int) -> str:
         return self.tabDataList[index].filePath
 
+    @staticmethod
+    def pathKey(filePath : str) -> str:
+        '''
+        Normalized real path of a file, the same for every path naming it
+        through symlinks, "..", or a relative path.
+        '''
+        return os.path.normcase(os.path.realpath(filePath))
+
+    def _addPath(self, filePath : str) -> None:
+        key = self.pathKey(filePath)
+        self.openPaths[key] = self.openPaths.get(key, 0) + 1
+
     def isFileOpen(self, filePath : str) -> bool:
-        for tabData in self.tabDataList:
-            if( tabData.filePath == filePath ):
-                return True
-        return False
+        return ( self.pathKey(filePath) in self.openPaths )
 
     def closeFile(self, index : int) -> None:
-        self.tabDataList.pop(index)
\ No newline at end of file
+        filePath = self.tabDataList.pop(index).filePath
+        if( filePath != "" ):
+            key = self.pathKey(filePath)
+            count = self.openPaths[key] - 1
+            if( count == 0 ):
+                del self.openPaths[key]
+            else:
+                self.openPaths[key] = count
\ No newline at end of file
@@ -1,29 +1,107 @@
+import json
+import re
+
+# type names offered by the typed value editors
+TYPE_STRING = "string"
+TYPE_INTEGER = "integer"
+TYPE_FLOAT = "float"
+TYPE_BOOLEAN = "boolean"
+TYPE_NULL = "null"
+TYPE_ARRAY = "array"
+TYPE_NAMES = [ TYPE_STRING, TYPE_INTEGER, TYPE_FLOAT, TYPE_BOOLEAN, TYPE_NULL, TYPE_ARRAY ]
+
+# a json number, so that "1_000", "nan" or " 1" are not taken for numbers
+NUMBER_RE = re.compile(r"-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?")
 
 
 def toText(val):
 	if( type(val) is str ):
 		return val
 
+	if( val is None ):
+		return "null"
+
 	if( type(val) is list ):
-		return ",".join(val)
+		return json.dumps(val)
 
 	return str(val)
 
 
+def typeName(val):
+	if( type(val) is bool ):
+		return TYPE_BOOLEAN
+
+	if( type(val) is int ):
+		return TYPE_INTEGER
+
+	if( type(val) is float ):
+		return TYPE_FLOAT
+
+	if( val is None ):
+		return TYPE_NULL
+
+	if( type(val) is list ):
+		return TYPE_ARRAY
+
+	return TYPE_STRING
+
+
+def fromText(text, valType):
+	'''
+	Convert text typed in an editor to a value of type valType.
+	Raises ValueError when text is not a valid valType.
+	'''
+	if( valType == TYPE_STRING ):
+		return text
+
+	if( valType == TYPE_INTEGER ):
+		return int(text.strip())
+
+	if( valType == TYPE_FLOAT ):
+		return float(text.strip())
+
+	if( valType == TYPE_BOOLEAN ):
+		lowered = text.strip().lower()
+		if( lowered not in ("true", "false") ):
+			raise ValueError(f"not a boolean: {text}")
+		return ( lowered == "true" )
+
+	if( valType == TYPE_NULL ):
+		return None
+
+	if( valType == TYPE_ARRAY ):
+		val = json.loads(text)
+		if( type(val) is not list ):
+			raise ValueError(f"not an array: {text}")
+		return val
+
+	raise ValueError(f"unknown type: {valType}")
+
+
 def toJSONValue(val):
-	if( val == 'True' ):
+	'''
+	Guess the json value of free text.
+	'''
+	if( val == 'True' or val == 'true' ):
 		return True
 
-	if( val == 'False' ):
+	if( val == 'False' or val == 'false' ):
 		return False
 
-	if( val.isnumeric() ):
-		return int(val)
+	if( val == 'null' ):
+		return None
 
-	if( val.count('.') == 1 ):
-		temp = val.replace('.','')
-		if( temp.isnumeric() ):
-			return float(val)
+	match = NUMBER_RE.fullmatch(val)
+	if( match is not None ):
+		if( match.group(2) is None and match.group(3) is None ):
+			return int(val)
+		return float(val)
+
+	if( val.startswith('[') ):
+		try:
+			return fromText(val, TYPE_ARRAY)
+		except ValueError:
+			pass
 
 	if( val.count(',') > 0 ):
 		valList = val.split(',')
@@ -32,7 +110,3 @@ def toJSONValue(val):
 		return valList
 
 	return val
-	
-	
-	
-
@@ -0,0 +1,176 @@
+'''
+Bring the tree of an open document in line with new data, e.g. its file as
+rewritten by another program, with as few row edits as possible. Rows that
+did not change keep their expand and check state, and the edits reach the
+undo stack, the journal and the search index like any other.
+'''
+import difflib
+from itertools import islice
+
+from model import (
+    CODEC,
+    Document,
+    Node
+)
+
+# GLOBALS
+# longest run of changed array items matched item by item, longer ones are
+# patched row by row
+MATCH_LIMIT = 2000
+
+
+def sameData(old, new) -> bool:
+    '''
+    Json equality of two values, key order included. == alone takes 1, 1.0
+    and true for the same, equal containers are told apart by their json.
+    '''
+    if( type(old) is not type(new) or old != new ):
+        return False
+    if( type(old) in ( dict, list ) ):
+        return ( CODEC.dumps(old, None) == CODEC.dumps(new, None) )
+    return True
+
+
+def patchNode(model, node : Node, data) -> int:
+    '''
+    Edit the subtree of node through model, a JsonTreeModel, until it holds
+    data. A subtree that was never fetched has no view state and is
+    compared raw and replaced whole, fetched branches are patched child by
+    child. Returns the number of edits.
+    '''
+    if( node.children is None and node.parent is not None ):
+        if( sameData(node.value, data) ):
+            return 0
+        model.setNodeValue(node, data)
+        return 1
+    if( type(data) is not ( list if node.isArray else dict ) ):
+        if( node.parent is None ):
+            raise ValueError("the top level changed between an object and an array")
+        model.setNodeValue(node, data)
+        return 1
+    if( node.children is None ):
+        # a root never shown, its first row makes it a fetched branch
+        model.fetchNode(node, 1)
+    if( node.isArray ):
+        return _patchArray(model, node, data)
+    return _patchObject(model, node, data)
+
+
+def _pendingItems(node : Node) -> list:
+    # raw entries not fetched yet, they come after every child in order
+    if( node.pending is None ):
+        return []
+    if( node.isArray ):
+        return list(islice(node.value, node.fetched, None))
+    return list(islice(node.value.items(), node.fetched, None))
+
+
+def _patchObject(model, node : Node, data : dict) -> int:
+    pending = _pendingItems(node)
+    if( pending and not all( key in data and sameData(val, data[key]) for key,val in pending ) ):
+        model.fetchNode(node)
+        pending = []
+    children = node.children or []
+    oldKeys = { child.key for child in children }
+    oldKeys.update( key for key,val in pending )
+
+    # the keys kept must keep their order, moving rows is not worth it
+    keptOrder = [ key for key in data if key in oldKeys ]
+    oldOrder = [ child.key for child in children if child.key in data ]
+    oldOrder.extend( key for key,val in pending )
+    if( keptOrder != oldOrder ):
+        if( node.parent is None ):
+            # the root has no value to replace, only its rows
+            model.fetchNode(node)
+            removed = list(node.children)
+            model.removeNodes(removed)
+            model.insertPairs(node, list(data.items()))
+            return len(removed) + len(data)
+        model.setNodeValue(node, data)
+        return 1
+
+    edits = 0
+    removed = [ child for child in children if child.key not in data ]
+    if( removed ):
+        model.removeNodes(removed)
+        edits += len(removed)
+    for child in list(children):
+        edits += patchNode(model, child, data[child.key])
+
+    addedKeys = { key for key in data if key not in oldKeys }
+    if( pending and addedKeys ):
+        # a new key after the first pending entry needs them as rows first
+        firstPending = pending[0][0]
+        pendingSeen = False
+        for key in data:
+            if( key == firstPending ):
+                pendingSeen = True
+            elif( pendingSeen and key in addedKeys ):
+                model.fetchNode(node)
+                break
+    if( addedKeys ):
+        row = 0
+        for key,val in data.items():
+            if( row < node.childCount() and node.children[row].key == key ):
+                row += 1
+            elif( key in addedKeys ):
+                model.insertNode(node, row, key, val)
+                row += 1
+                edits += 1
+            else:
+                # the rest are pending entries, none of them new
+                break
+    return edits
+
+
+def _patchArray(model, node : Node, data : list) -> int:
+    pending = _pendingItems(node)
+    if( pending ):
+        # an unchanged tail of pending items is left raw
+        if( len(data) >= len(pending) and sameData(pending, data[len(data) - len(pending):]) ):
+            data = data[:len(data) - len(pending)]
+        else:
+            model.fetchNode(node)
+    children = node.children or []
+    oldCount = len(children)
+    newCount = len(data)
+
+    # items only inserted or removed in the middle keep the others as they are
+    first = 0
+    while( first < min(oldCount, newCount) and sameData(Document.nodeData(children[first]), data[first]) ):
+        first += 1
+    last = 0
+    while( last < min(oldCount, newCount) - first and sameData(Document.nodeData(children[oldCount - last - 1]), data[newCount - last - 1]) ):
+        last += 1
+
+    oldEnd = oldCount - last
+    newEnd = newCount - last
+    if( max(oldEnd - first, newEnd - first) <= MATCH_LIMIT ):
+        # match the items of the middle by their json, so a row keeps its
+        # item and its state when others are inserted or removed around it
+        oldItems = [ CODEC.dumps(Document.nodeData(child), None) for child in children[first:oldEnd] ]
+        newItems = [ CODEC.dumps(item, None) for item in data[first:newEnd] ]
+        opcodes = difflib.SequenceMatcher(None, oldItems, newItems, autojunk=False).get_opcodes()
+    else:
+        opcodes = [ ( "replace", 0, oldEnd - first, 0, newEnd - first ) ]
+
+    # from the last rows up, so the rows of the opcodes still to apply stay
+    # right, and renumbered once at the end, see Document.renumber
+    edits = 0
+    for tag,i1,i2,j1,j2 in reversed(opcodes):
+        if( tag == "equal" ):
+            continue
+        i1 += first
+        i2 += first
+        j1 += first
+        j2 += first
+        common = min(i2 - i1, j2 - j1)
+        for k in range(i2 - 1, i1 + common - 1, -1):
+            model.removeNode(children[k], False)
+        for k in range(common):
+            edits += patchNode(model, children[i1 + k], data[j1 + k])
+        for k in range(j1 + common, j2):
+            model.insertNode(node, i1 + k - j1, i1 + k - j1, data[k], False)
+        edits += ( i2 - i1 - common ) + ( j2 - j1 - common )
+    model.document.renumber(node, first)
+    return edits
@@ -0,0 +1,176 @@
+'''
+Opt-in timing of user operations. An operation (open, save, delete, ...) is
+split into phases (read, parse, build tree, serialize, write, ...) and counts
+what it touched (nodes, rows, widgets). Every span is kept as a Chrome trace
+event, so a timeline can be saved and opened in chrome://tracing or Perfetto.
+
+Nothing is recorded while the profiler is disabled, the hot paths only pay
+for one attribute check.
+'''
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# GLOBALS
+# set to 1 to profile from startup
+PROFILE_ENV = "JSON_EDITOR_PROFILE"
+# trace events kept in memory, the oldest are dropped first
+MAX_EVENTS = 100000
+
+
+class Operation:
+    '''
+    One profiled operation. Phases and counts of a disabled operation are
+    ignored, so callers never need to check whether profiling is on.
+    '''
+    def __init__(self, profiler, name : str, enabled : bool):
+        self.profiler = profiler
+        self.name = name
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.end = None
+        # phase name -> seconds, in the order phases first ran
+        self.phases = {}
+        self.counts = {}
+
+    @contextmanager
+    def phase(self, name : str):
+        if( not self.enabled ):
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addPhase(name, start, time.perf_counter())
+
+    def addPhase(self, name : str, start : float, end : float, tid : int = None) -> None:
+        '''
+        Record a phase measured elsewhere, e.g. in a worker thread.
+        Times are time.perf_counter() values.
+        '''
+        if( not self.enabled ):
+            return
+        self.phases[name] = self.phases.get(name, 0.0) + ( end - start )
+        self.profiler._addEvent(name, start, end, tid, { "operation" : self.name })
+
+    def count(self, name : str, n : int = 1) -> None:
+        if( self.enabled ):
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def summary(self) -> str:
+        total = ( self.end or time.perf_counter() ) - self.start
+        text = f"{self.name} {total:.3f}s"
+        if( self.phases ):
+            text += " : " + ", ".join( f"{name} {seconds:.3f}s" for name,seconds in self.phases.items() )
+        if( self.counts ):
+            text += " | " + ", ".join( f"{name} {n}" for name,n in self.counts.items() )
+        return text
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = ( os.environ.get(PROFILE_ENV, "") not in ( "", "0" ) )
+        self.events = deque(maxlen=MAX_EVENTS)
+        # innermost operation running on the GUI thread, see operation()
+        self.current = None
+        self.lastOperation = None
+        # callables notified with every finished operation
+        self.listeners = []
+        self._origin = time.perf_counter()
+        self._disabled = Operation(self, "", False)
+
+    def setEnabled(self, enabled : bool) -> None:
+        self.enabled = enabled
+        if( not enabled ):
+            self.current = None
+
+    def begin(self, name : str, start : float = None) -> Operation:
+        '''
+        Start an operation that ends later, e.g. when a worker finishes.
+        start is when it really started if that was before this call.
+        '''
+        if( not self.enabled ):
+            return self._disabled
+        operation = Operation(self, name, True)
+        if( start is not None ):
+            operation.start = start
+        return operation
+
+    def end(self, operation : Operation) -> None:
+        if( not operation.enabled ):
+            return
+        operation.end = time.perf_counter()
+        self._addEvent(operation.name, operation.start, operation.end, None, dict(operation.counts))
+        self.lastOperation = operation
+        for listener in self.listeners:
+            listener(operation)
+
+    @contextmanager
+    def operation(self, name : str, start : float = None):
+        '''
+        Profile the enclosed code as one operation. Nested in another
+        operation it is a phase of that one.
+        '''
+        if( self.current is not None ):
+            with self.current.phase(name):
+                yield self.current
+            return
+        operation = self.begin(name, start)
+        if( not operation.enabled ):
+            yield operation
+            return
+        self.current = operation
+        try:
+            yield operation
+        finally:
+            self.current = None
+            self.end(operation)
+
+    def phase(self, name : str):
+        '''
+        Phase of the current operation, a no-op outside of one.
+        '''
+        return ( self.current or self._disabled ).phase(name)
+
+    def count(self, name : str, n : int = 1) -> None:
+        if( self.current is not None ):
+            self.current.count(name, n)
+
+    def profiled(self, name : str):
+        '''
+        Decorator running a function as one operation.
+        '''
+        def decorator(func):
+            # wraps keeps the signature Qt looks at to pass signal arguments
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.operation(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _addEvent(self, name : str, start : float, end : float, tid : int, args : dict) -> None:
+        self.events.append({
+            "name" : name,
+            "ph" : "X",
+            "ts" : ( start - self._origin ) * 1e6,
+            "dur" : ( end - start ) * 1e6,
+            "pid" : os.getpid(),
+            "tid" : tid if tid is not None else threading.get_ident(),
+            "args" : args
+        })
+
+    def dumpTrace(self, filePath : str) -> None:
+        '''
+        Write the recorded events in the Chrome trace event format.
+        '''
+        with open(filePath, "w", encoding="utf-8") as f:
+            json.dump({ "traceEvents" : list(self.events), "displayTimeUnit" : "ms" }, f)
+
+
+profiler = Profiler()
@@ -0,0 +1,555 @@
+'''
+JSONPath-like queries selecting nodes of a Document:
+
+    $.solver.tolerance          a key path ($ is optional)
+    $.solver.*                  every child
+    $.patches.wall*             keys matching a glob
+    $..tolerance                the key at any depth
+    $.cells[0]  $.cells[-1]     array items, also ['a key'] and [0,2]
+    $.patches[?(@.type == 'wall' && @.nFaces > 10)]
+    $..[?(@ =~ 'abc.*')]        children whose value matches a regex
+
+Predicates test each child of the nodes reached so far (@), with ==, !=,
+<, <=, >, >=, =~ (regex search) and a bare @.path for "has the key",
+combined with &&, || and !.
+
+A query is compiled once (compileQuery() caches the last ones) and evaluated
+over the nodes where they are fetched and over the parsed data elsewhere,
+so nothing is fetched until the matches are checked.
+'''
+import fnmatch
+import functools
+import re
+from itertools import islice
+
+from model import (
+    Document,
+    Node
+)
+
+# GLOBALS
+# compiled queries kept, the query box compiles one per keystroke
+COMPILE_CACHE_SIZE = 64
+
+TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+      | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<op>\.\.|==|!=|<=|>=|=~|&&|\|\||[$@.*\[\](),?!<>])
+      | (?P<name>[^\s.\[\]()'"=!<>&|,]+)
+    )''', re.VERBOSE)
+
+_MISSING = object()
+
+
+class QueryError(ValueError):
+    pass
+
+
+# walking nodes and parsed data alike
+
+def _items(obj):
+    '''
+    (row, key, child) of the children of a node or of parsed data. The row
+    is the one the child has, or will have once fetched, under its node.
+    '''
+    if( type(obj) is not Node ):
+        if( type(obj) is dict ):
+            return ( (row, key, val) for row,(key,val) in enumerate(obj.items()) )
+        if( type(obj) is list ):
+            return ( (row, row, val) for row,val in enumerate(obj) )
+        return ()
+    if( obj.children is None ):
+        return _items(obj.value)
+    return _nodeItems(obj)
+
+
+def _nodeItems(node : Node):
+    for child in node.children:
+        yield child.row, child.key, child
+    if( node.pending is None ):
+        return
+    row = len(node.children)
+    # the pending entries of the raw data are the ones after fetched
+    if( node.isArray ):
+        for val in islice(node.value, node.fetched, None):
+            yield row, row, val
+            row += 1
+    else:
+        for key,val in islice(node.value.items(), node.fetched, None):
+            yield row, key, val
+            row += 1
+
+
+def _isContainer(obj) -> bool:
+    if( type(obj) is Node ):
+        return obj.isBranch()
+    return ( type(obj) in ( dict, list ) )
+
+
+def _isArray(obj) -> bool:
+    return obj.isArray if type(obj) is Node else ( type(obj) is list )
+
+
+def _length(obj) -> int:
+    if( type(obj) is Node ):
+        return obj.childCount() + obj.pendingCount()
+    return len(obj) if type(obj) in ( dict, list ) else 0
+
+
+def _value(obj):
+    '''
+    Json value of a leaf, _MISSING for a branch, predicates only compare leaves.
+    '''
+    if( type(obj) is Node ):
+        return _MISSING if obj.isBranch() else obj.value
+    return _MISSING if type(obj) in ( dict, list ) else obj
+
+
+def _arrayItem(obj, index : int):
+    if( type(obj) is list ):
+        return obj[index]
+    if( index < obj.childCount() ):
+        return obj.children[index]
+    # pending items follow the fetched ones in the raw list
+    return obj.value[obj.fetched + index - obj.childCount()]
+
+
+def _child(obj, key):
+    if( type(obj) is dict ):
+        return obj.get(key, _MISSING)
+    if( type(obj) is list ):
+        return obj[key] if type(key) is int and -len(obj) <= key < len(obj) else _MISSING
+    for row,childKey,child in _items(obj):
+        if( childKey == key ):
+            return child
+    return _MISSING
+
+
+# comparing
+
+def _isNumber(val) -> bool:
+    return ( type(val) in ( int, float ) )
+
+
+def _equal(a, b) -> bool:
+    # json true is not 1
+    if( type(a) is bool or type(b) is bool ):
+        return ( type(a) is type(b) and a == b )
+    return ( a == b )
+
+
+def _ordered(a, b) -> bool:
+    return ( _isNumber(a) and _isNumber(b) ) or ( type(a) is str and type(b) is str )
+
+
+COMPARE = {
+    "==" : _equal,
+    "!=" : lambda a, b: not _equal(a, b),
+    "<" : lambda a, b: _ordered(a, b) and a < b,
+    "<=" : lambda a, b: _ordered(a, b) and a <= b,
+    ">" : lambda a, b: _ordered(a, b) and a > b,
+    ">=" : lambda a, b: _ordered(a, b) and a >= b
+}
+
+
+class Query:
+    '''
+    A compiled query, a list of steps each mapping the (object, rows) pairs
+    reached so far to the next ones. rows is the row path of the object.
+    '''
+    def __init__(self, text : str, steps : list, descents : int):
+        self.text = text
+        self.steps = steps
+        # a recursive descent after another one reaches nodes twice
+        self.mayRepeat = ( descents > 1 )
+
+    def _evaluate(self, document : Document) -> list:
+        level = [ (document.root, None) ]
+        for step in self.steps:
+            level = step(level)
+            if( len(level) == 0 ):
+                break
+        return level
+
+    def rowPaths(self, document : Document) -> list:
+        '''
+        Row paths of the matching nodes, in document order.
+        '''
+        return sorted(set( _rowPath(loc) for obj,loc in self._evaluate(document) if loc is not None ))
+
+    def count(self, document : Document) -> int:
+        '''
+        Number of matches, cheaper than rowPaths, e.g. for every keystroke.
+        '''
+        level = self._evaluate(document)
+        if( self.mayRepeat ):
+            return len(set( _rowPath(loc) for obj,loc in level if loc is not None ))
+        return sum( 1 for obj,loc in level if loc is not None )
+
+    def nodes(self, document : Document, fetch=None) -> list:
+        '''
+        The matching nodes, fetching what they need with fetch(node, count),
+        Document.fetch by default.
+        '''
+        fetch = fetch or document.fetch
+        nodes = []
+        for rows in self.rowPaths(document):
+            node = document.root
+            for row in rows:
+                missing = row + 1 - node.childCount()
+                if( missing > 0 ):
+                    fetch(node, missing)
+                node = node.children[row]
+            nodes.append(node)
+        return nodes
+
+
+# steps
+#
+# A step maps the (object, location) pairs reached so far to the next ones.
+# A location is (parent location, row), None for the root, so a step adds
+# a tuple per object instead of copying a row path.
+
+def _rowPath(loc) -> tuple:
+    rows = []
+    while( loc is not None ):
+        loc, row = loc
+        rows.append(row)
+    rows.reverse()
+    return tuple(rows)
+
+
+def _childStep(matches):
+    def step(level : list) -> list:
+        return [
+            (child, (loc, row))
+            for obj,loc in level
+            for row,key,child in _items(obj)
+            if matches(key)
+        ]
+    return step
+
+
+def _indexStep(indexes : list):
+    def step(level : list) -> list:
+        result = []
+        for obj,loc in level:
+            if( not _isArray(obj) ):
+                continue
+            length = _length(obj)
+            for index in indexes:
+                if( index < 0 ):
+                    index += length
+                if( 0 <= index < length ):
+                    result.append((_arrayItem(obj, index), (loc, index)))
+        return result
+    return step
+
+
+def _filterStep(predicate):
+    def step(level : list) -> list:
+        return [
+            (child, (loc, row))
+            for obj,loc in level
+            for row,key,child in _items(obj)
+            if predicate(child)
+        ]
+    return step
+
+
+def _descendStep(level : list) -> list:
+    '''
+    Every container reached so far and every container below them, for the
+    step after ".." to select from.
+    '''
+    result = []
+    append = result.append
+    stack = [ (obj, loc) for obj,loc in level if _isContainer(obj) ]
+    push = stack.append
+    while( stack ):
+        curr,loc = stack.pop()
+        append((curr, loc))
+        # parsed data is walked without _items, most of a document is
+        if( type(curr) is dict ):
+            curr = curr.values()
+        elif( type(curr) is Node ):
+            stack.extend( (child, (loc, row)) for row,key,child in _items(curr) if _isContainer(child) )
+            continue
+        for row,child in enumerate(curr):
+            if( type(child) is dict or type(child) is list ):
+                push((child, (loc, row)))
+    return result
+
+
+def _descendKeyStep(name : str):
+    '''
+    ..name, looking the key up in every container instead of going through
+    their children.
+    '''
+    matches = _nameMatcher(name)
+    childStep = _childStep(matches)
+    def step(level : list) -> list:
+        result = []
+        nodes = []
+        for obj,loc in _descendStep(level):
+            if( type(obj) is dict ):
+                if( name in obj ):
+                    row = 0
+                    for key in obj:
+                        if( key == name ):
+                            break
+                        row += 1
+                    result.append((obj[name], (loc, row)))
+            elif( type(obj) is Node ):
+                nodes.append((obj, loc))
+        result.extend(childStep(nodes))
+        return result
+    return step
+
+
+def _nameMatcher(name : str):
+    if( name == "*" ):
+        return lambda key: True
+    if( any( char in name for char in "*?" ) ):
+        regex = re.compile(fnmatch.translate(name))
+        return lambda key: type(key) is str and regex.match(key) is not None
+    return lambda key: key == name
+
+
+# parsing
+
+class _Parser:
+    def __init__(self, text : str):
+        self.text = text
+        self.tokens = []
+        pos = 0
+        text = text.rstrip()
+        while( pos < len(text) ):
+            match = TOKEN_RE.match(text, pos)
+            if( match is None or match.end() == pos ):
+                raise QueryError(f"unexpected {text[pos:pos + 10]!r}")
+            kind = match.lastgroup
+            self.tokens.append(( kind, match.group(kind), match.start(kind), match.end() ))
+            pos = match.end()
+        self.pos = 0
+        self.descents = 0
+
+    def peek(self, value : str = None):
+        if( self.pos >= len(self.tokens) ):
+            return None
+        token = self.tokens[self.pos]
+        if( value is not None and not ( token[0] == "op" and token[1] == value ) ):
+            return None
+        return token
+
+    def take(self, value : str = None):
+        token = self.peek(value)
+        if( token is None ):
+            expected = f"{value!r}" if value is not None else "more"
+            raise QueryError(f"expected {expected} in {self.text!r}")
+        self.pos += 1
+        return token
+
+    def literal(self, token):
+        kind, text = token[:2]
+        if( kind == "number" ):
+            return float(text) if any( char in text for char in ".eE" ) else int(text)
+        if( kind == "string" ):
+            return re.sub(r"\\(.)", r"\1", text[1:-1])
+        if( kind == "name" and text in ( "true", "false", "null" ) ):
+            return { "true" : True, "false" : False, "null" : None }[text]
+        raise QueryError(f"expected a value, got {text!r}")
+
+    # query := ['$'] step*
+
+    def query(self) -> list:
+        if( self.peek("$") ):
+            self.take()
+        steps = []
+        while( self.peek() is not None ):
+            if( self.peek("..") ):
+                self.take()
+                self.descents += 1
+                if( self.peek("[") ):
+                    steps.append(_descendStep)
+                    steps.append(self.bracket())
+                else:
+                    name = self.name()
+                    if( name == "*" or any( char in name for char in "*?" ) ):
+                        steps.append(_descendStep)
+                        steps.append(_childStep(_nameMatcher(name)))
+                    else:
+                        steps.append(_descendKeyStep(name))
+            elif( self.peek(".") ):
+                self.take()
+                steps.append(_childStep(_nameMatcher(self.name())))
+            elif( self.peek("[") ):
+                steps.append(self.bracket())
+            elif( len(steps) == 0 and ( self.tokens[self.pos][0] in ( "name", "number" ) or self.peek("*") ) ):
+                # "solver.tolerance" without the leading "$."
+                steps.append(_childStep(_nameMatcher(self.name())))
+            else:
+                raise QueryError(f"unexpected {self.tokens[self.pos][1]!r}")
+        return steps
+
+    def name(self) -> str:
+        kind, text, start, end = self.take()
+        if( kind not in ( "name", "number" ) and text not in ( "*", "?" ) ):
+            raise QueryError(f"expected a key, got {text!r}")
+        # keys like 2nd or *wall are split in tokens, join the ones that touch
+        while( True ):
+            token = self.peek()
+            if( token is None or token[2] != end ):
+                break
+            if( token[0] not in ( "name", "number" ) and token[1] not in ( "*", "?" ) ):
+                break
+            text += token[1]
+            end = token[3]
+            self.pos += 1
+        return text
+
+    def bracket(self):
+        self.take("[")
+        if( self.peek("*") ):
+            self.take()
+            self.take("]")
+            return _childStep(_nameMatcher("*"))
+        if( self.peek("?") ):
+            self.take()
+            self.take("(")
+            predicate = self.orExpr()
+            self.take(")")
+            self.take("]")
+            return _filterStep(predicate)
+
+        keys = [ self.literal(self.take()) ]
+        while( self.peek(",") ):
+            self.take()
+            keys.append(self.literal(self.take()))
+        self.take("]")
+        if( all( type(key) is int for key in keys ) ):
+            return _indexStep(keys)
+        if( all( type(key) is str for key in keys ) ):
+            names = set(keys)
+            return _childStep(lambda key: key in names)
+        raise QueryError("mix of keys and indexes in []")
+
+    # predicates
+
+    def orExpr(self):
+        terms = [ self.andExpr() ]
+        while( self.peek("||") ):
+            self.take()
+            terms.append(self.andExpr())
+        if( len(terms) == 1 ):
+            return terms[0]
+        return lambda obj: any( term(obj) for term in terms )
+
+    def andExpr(self):
+        terms = [ self.unary() ]
+        while( self.peek("&&") ):
+            self.take()
+            terms.append(self.unary())
+        if( len(terms) == 1 ):
+            return terms[0]
+        return lambda obj: all( term(obj) for term in terms )
+
+    def unary(self):
+        if( self.peek("!") ):
+            self.take()
+            term = self.unary()
+            return lambda obj: not term(obj)
+        if( self.peek("(") ):
+            self.take()
+            term = self.orExpr()
+            self.take(")")
+            return term
+        return self.comparison()
+
+    def comparison(self):
+        left = self.operand()
+        token = self.peek()
+        if( token is None or token[0] != "op" or token[1] not in ( *COMPARE, "=~" ) ):
+            if( not callable(left) ):
+                raise QueryError("a predicate needs @")
+            # @.key alone: the key exists
+            return lambda obj: left(obj) is not _MISSING
+        op = self.take()[1]
+
+        if( op == "=~" ):
+            pattern = self.literal(self.take())
+            if( type(pattern) is not str or not callable(left) ):
+                raise QueryError("=~ needs @ on the left and a string on the right")
+            try:
+                regex = re.compile(pattern)
+            except re.error as e:
+                raise QueryError(f"bad regex {pattern!r}: {e}")
+            def matches(obj) -> bool:
+                val = _value(left(obj))
+                return type(val) is str and regex.search(val) is not None
+            return matches
+
+        right = self.operand()
+        if( not callable(left) and not callable(right) ):
+            # the same for every child, e.g. 1 == 1, surely a typo
+            raise QueryError("a predicate needs @")
+        compare = COMPARE[op]
+        if( callable(left) and not callable(right) ):
+            # @.key == literal, the common case, with one call less per child
+            def testLiteral(obj) -> bool:
+                a = _value(left(obj))
+                return ( a is not _MISSING and compare(a, right) )
+            return testLiteral
+        leftValue = ( lambda obj: _value(left(obj)) ) if callable(left) else ( lambda obj: left )
+        rightValue = ( lambda obj: _value(right(obj)) ) if callable(right) else ( lambda obj: right )
+        def test(obj) -> bool:
+            a = leftValue(obj)
+            b = rightValue(obj)
+            return ( a is not _MISSING and b is not _MISSING and compare(a, b) )
+        return test
+
+    def operand(self):
+        '''
+        A literal, or a function of @ giving the object at a path under it.
+        '''
+        if( not self.peek("@") ):
+            return self.literal(self.take())
+        self.take()
+        keys = []
+        while( True ):
+            if( self.peek(".") ):
+                self.take()
+                keys.append(self.name())
+            elif( self.peek("[") ):
+                self.take()
+                keys.append(self.literal(self.take()))
+                self.take("]")
+            else:
+                break
+        if( len(keys) == 1 ):
+            key = keys[0]
+            def resolveKey(obj):
+                if( type(obj) is dict ):
+                    return obj.get(key, _MISSING)
+                return _child(obj, key)
+            return resolveKey
+        def resolve(obj):
+            for key in keys:
+                if( obj is _MISSING ):
+                    break
+                obj = _child(obj, key)
+            return obj
+        return resolve
+
+
+@functools.lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compileQuery(text : str) -> Query:
+    '''
+    Compile a query, raises QueryError if it is not valid.
+    '''
+    queryParser = _Parser(text.strip())
+    steps = queryParser.query()
+    if( len(steps) == 0 ):
+        raise QueryError("empty query")
+    return Query(text, steps, queryParser.descents)
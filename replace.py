@@ -0,0 +1,263 @@
+r'''
+Find and replace over the keys and values of many nodes at once, the bulk
+counterpart of the row by row Replace dialog.
+
+A literal pattern is matched as typed. A regex pattern may refer to its
+groups in the replacement, e.g. find "wall(\d+)" and replace with
+"patch_\1" or "\g<0>_old". A string value stays a string, any other value
+is converted from its new text like the text typed in the editor
+(parser.toJSONValue).
+'''
+import re
+from collections import namedtuple
+
+from PySide6.QtWidgets import (
+    QDialog,
+    QDialogButtonBox,
+    QVBoxLayout,
+    QHBoxLayout,
+    QGridLayout,
+    QCheckBox,
+    QLineEdit,
+    QLabel,
+    QTableView,
+    QHeaderView
+)
+
+from PySide6.QtCore import (
+    Qt,
+    QAbstractTableModel,
+    QModelIndex,
+    QTimer
+)
+
+import parser
+from profiler import profiler
+
+# GLOBALS
+# ms of typing pause before the preview is built again
+PREVIEW_DELAY = 200
+# rows of the preview added each time the view scrolls to its end
+PREVIEW_PAGE_SIZE = 500
+PREVIEW_COLUMNS = [ "Path", "Field", "Before", "After" ]
+
+# field is "key" or "value", new is the new key or json value
+ReplaceChange = namedtuple("ReplaceChange", "node field old new")
+
+
+class Replacement:
+    '''
+    A find pattern and what to replace its matches with. Raises ValueError
+    for an empty or bad pattern.
+    '''
+    def __init__(self, find : str, replaceWith : str, isRegex : bool = False, matchCase : bool = True, inKeys : bool = True, inValues : bool = True):
+        if( find == "" ):
+            raise ValueError("nothing to find")
+        try:
+            self.pattern = re.compile(find if isRegex else re.escape(find), 0 if matchCase else re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"bad regex : {e}")
+        # a literal replacement has no group references to expand
+        self.template = replaceWith if isRegex else ( lambda match: replaceWith )
+        self.inKeys = inKeys
+        self.inValues = inValues
+
+    def apply(self, text : str):
+        '''
+        text with every match replaced, None if nothing matched. Raises
+        ValueError for a bad group reference in the replacement.
+        '''
+        # most texts do not match, and subn costs more than search
+        if( self.pattern.search(text) is None ):
+            return None
+        try:
+            newText, count = self.pattern.subn(self.template, text)
+        except ( re.error, IndexError ) as e:
+            raise ValueError(f"bad replacement : {e}")
+        return newText if count > 0 else None
+
+    def changes(self, nodes : list) -> list:
+        '''
+        The ReplaceChanges of nodes, in their order. Only leaves have their
+        value replaced and array items have no key.
+        '''
+        changes = []
+        for node in nodes:
+            if( self.inKeys and not node.parent.isArray ):
+                newKey = self.apply(node.key)
+                if( newKey is not None and newKey != node.key ):
+                    changes.append(ReplaceChange(node, "key", node.key, newKey))
+            if( self.inValues and not node.isBranch() ):
+                oldText = parser.toText(node.value)
+                newText = self.apply(oldText)
+                if( newText is not None and newText != oldText ):
+                    newValue = newText if type(node.value) is str else parser.toJSONValue(newText)
+                    changes.append(ReplaceChange(node, "value", node.value, newValue))
+        return changes
+
+
+def changeCounts(changes : list) -> tuple:
+    '''
+    (items, keys, values) changed by changes.
+    '''
+    keys = sum( 1 for change in changes if change.field == "key" )
+    items = len({ id(change.node) for change in changes })
+    return ( items, keys, len(changes) - keys )
+
+
+class ReplacePreviewModel(QAbstractTableModel):
+    '''
+    One row per ReplaceChange. Rows are added a page at a time as the view
+    scrolls down, and the path of a row is only built when it is shown.
+    '''
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.changes = []
+        self.shown = 0
+
+    def setChanges(self, changes : list) -> None:
+        self.beginResetModel()
+        self.changes = changes
+        self.shown = min(len(changes), PREVIEW_PAGE_SIZE)
+        self.endResetModel()
+
+    def rowCount(self, parent : QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else self.shown
+
+    def columnCount(self, parent : QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(PREVIEW_COLUMNS)
+
+    def canFetchMore(self, parent : QModelIndex = QModelIndex()) -> bool:
+        return ( not parent.isValid() and self.shown < len(self.changes) )
+
+    def fetchMore(self, parent : QModelIndex = QModelIndex()) -> None:
+        count = min(len(self.changes) - self.shown, PREVIEW_PAGE_SIZE)
+        if( count <= 0 ):
+            return
+        self.beginInsertRows(QModelIndex(), self.shown, self.shown + count - 1)
+        self.shown += count
+        self.endInsertRows()
+
+    def data(self, index : QModelIndex, role : int = Qt.DisplayRole):
+        if( not index.isValid() or role != Qt.DisplayRole ):
+            return None
+        change = self.changes[index.row()]
+        col = index.column()
+        if( col == 0 ):
+            return ".".join( str(key) for key in change.node.path() )
+        if( col == 1 ):
+            return change.field
+        return parser.toText(change.old if col == 2 else change.new)
+
+    def headerData(self, section : int, orientation, role : int = Qt.DisplayRole):
+        if( role != Qt.DisplayRole or orientation != Qt.Horizontal ):
+            return None
+        return PREVIEW_COLUMNS[section]
+
+
+class ReplaceDialog(QDialog):
+    '''
+    Find and replace over the given nodes with a preview of every change.
+    After exec() the accepted changes are in self.changes, applied by the
+    caller.
+    '''
+    def __init__(self, nodes : list, parent=None):
+        super().__init__(parent)
+        self.nodes = nodes
+        self.changes = []
+        self.setWindowTitle(f"Find and Replace in {len(nodes)} Items")
+        self.resize(800, 500)
+
+        self.findEdit = QLineEdit()
+        self.replaceEdit = QLineEdit()
+        self.regexBox = QCheckBox("Regex")
+        self.matchCaseBox = QCheckBox("Match case")
+        self.matchCaseBox.setChecked(True)
+        self.keysBox = QCheckBox("Keys")
+        self.keysBox.setChecked(True)
+        self.valuesBox = QCheckBox("Values")
+        self.valuesBox.setChecked(True)
+        self.countLabel = QLabel()
+
+        self.previewModel = ReplacePreviewModel(self)
+        self.previewView = QTableView()
+        self.previewView.setModel(self.previewModel)
+        self.previewView.setSelectionBehavior(QTableView.SelectRows)
+        # a fixed row height keeps the view from measuring every row
+        verticalHeader = self.previewView.verticalHeader()
+        verticalHeader.setSectionResizeMode(QHeaderView.Fixed)
+        verticalHeader.setDefaultSectionSize(self.fontMetrics().height() + 6)
+        self.previewView.horizontalHeader().setStretchLastSection(True)
+
+        grid = QGridLayout()
+        grid.addWidget(QLabel("Find"), 0, 0)
+        grid.addWidget(self.findEdit, 0, 1)
+        grid.addWidget(QLabel("Replace with"), 1, 0)
+        grid.addWidget(self.replaceEdit, 1, 1)
+        optionsLayout = QHBoxLayout()
+        for box in ( self.regexBox, self.matchCaseBox, self.keysBox, self.valuesBox ):
+            optionsLayout.addWidget(box)
+        optionsLayout.addStretch(1)
+        optionsLayout.addWidget(self.countLabel)
+
+        self.buttons = QDialogButtonBox()
+        self.buttons.setStandardButtons(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.buttons.button(QDialogButtonBox.Ok).setText("Replace All")
+        self.buttons.accepted.connect(self._acceptHandler)
+        self.buttons.rejected.connect(self.reject)
+
+        dlgLayout = QVBoxLayout(self)
+        dlgLayout.addLayout(grid)
+        dlgLayout.addLayout(optionsLayout)
+        dlgLayout.addWidget(self.previewView)
+        dlgLayout.addWidget(self.buttons)
+
+        self.previewTimer = QTimer(self)
+        self.previewTimer.setSingleShot(True)
+        self.previewTimer.setInterval(PREVIEW_DELAY)
+        self.previewTimer.timeout.connect(self.updatePreview)
+        for edit in ( self.findEdit, self.replaceEdit ):
+            edit.textChanged.connect(lambda: self.previewTimer.start())
+        for box in ( self.regexBox, self.matchCaseBox, self.keysBox, self.valuesBox ):
+            box.toggled.connect(lambda: self.previewTimer.start())
+        self.updatePreview()
+
+    def replacement(self) -> Replacement:
+        return Replacement(
+            self.findEdit.text(),
+            self.replaceEdit.text(),
+            self.regexBox.isChecked(),
+            self.matchCaseBox.isChecked(),
+            self.keysBox.isChecked(),
+            self.valuesBox.isChecked()
+        )
+
+    def updatePreview(self) -> None:
+        '''
+        Find the changes of the current pattern and show them, or why there
+        are none.
+        '''
+        self.previewTimer.stop()
+        changes = []
+        message = None
+        if( self.findEdit.text() != "" ):
+            try:
+                with profiler.operation("replace preview") as operation:
+                    changes = self.replacement().changes(self.nodes)
+                    operation.count("changes", len(changes))
+            except ValueError as e:
+                message = str(e)
+        if( message is None ):
+            items, keys, values = changeCounts(changes)
+            message = f"{keys} keys and {values} values in {items} items"
+        self.changes = changes
+        self.previewModel.setChanges(changes)
+        self.countLabel.setText(message)
+        self.buttons.button(QDialogButtonBox.Ok).setEnabled(len(changes) > 0)
+
+    def _acceptHandler(self) -> None:
+        if( self.previewTimer.isActive() ):
+            # the preview may lag behind the last keystroke
+            self.updatePreview()
+        if( len(self.changes) > 0 ):
+            self.accept()
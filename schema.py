@@ -0,0 +1,744 @@
+'''
+Json Schema validation of a document, kept up to date edit by edit.
+
+A schema is compiled once into a tree of SchemaNodes. The keywords checked
+are type, enum, const, the number, string, array and object bounds,
+pattern, required, dependentRequired, properties, patternProperties,
+additionalProperties, propertyNames, items, prefixItems, additionalItems,
+contains, allOf, anyOf, oneOf, not, if/then/else and $ref to a "#/..."
+pointer in the same schema. Annotations, e.g. format or default, are
+ignored.
+'''
+import json
+import re
+from itertools import islice
+from urllib.parse import unquote
+
+from model import Document
+
+# GLOBALS
+# nodes validated between two checks of the cancel flag
+CANCEL_CHECK_INTERVAL = 4096
+# characters of a value quoted in a message
+MAX_QUOTE = 60
+# object keys whose schemas are remembered per schema
+CHILD_CACHE_SIZE = 10000
+
+_TYPE_CHECKS = {
+    "null" : lambda value: value is None,
+    "boolean" : lambda value: type(value) is bool,
+    "integer" : lambda value: type(value) is int or ( type(value) is float and value.is_integer() ),
+    "number" : lambda value: type(value) in ( int, float ),
+    "string" : lambda value: type(value) is str,
+    "array" : lambda value: type(value) is list,
+    "object" : lambda value: type(value) is dict
+}
+_PYTHON_TYPES = {
+    "null" : { type(None) },
+    "boolean" : { bool },
+    "integer" : { int },
+    "number" : { int, float },
+    "string" : { str },
+    "array" : { list },
+    "object" : { dict }
+}
+
+
+class SchemaError(ValueError):
+    '''
+    A schema that cannot be compiled.
+    '''
+
+
+def _quote(value) -> str:
+    text = json.dumps(value, ensure_ascii=False)
+    return text if len(text) <= MAX_QUOTE else text[:MAX_QUOTE] + "…"
+
+
+def _isNumber(value) -> bool:
+    return type(value) in ( int, float )
+
+
+def _sameJson(a, b) -> bool:
+    # json equality for enum and const: 1 equals 1.0 but not true, and key
+    # order does not matter
+    if( type(a) in ( dict, list ) or type(b) in ( dict, list ) ):
+        return ( type(a) is type(b) and json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True) )
+    if( ( type(a) is bool ) != ( type(b) is bool ) ):
+        return False
+    return ( a == b )
+
+
+class SchemaNode:
+    '''
+    One compiled schema. checks are functions of a value alone returning an
+    error message or None, the keywords about the children of an object or
+    array are kept apart, so an edit only has the children it touched
+    validated again. A schema with isDeep() keywords, e.g. anyOf, depends on
+    its whole subtree and is validated again whole on any edit below it.
+    '''
+    __slots__ = (
+        "checks",
+        "deepChecks",
+        "properties",
+        "patternProperties",
+        "additionalProperties",
+        "prefixItems",
+        "items",
+        "allOf",
+        "conditional",
+        "_applied",
+        "_isDeep",
+        "_childCache",
+        "_leafChecks"
+    )
+
+    def __init__(self):
+        self.checks = []
+        # like checks but the value is the whole subtree
+        self.deepChecks = []
+        self.properties = {}
+        # (compiled regex, SchemaNode)
+        self.patternProperties = []
+        # SchemaNode of the keys matched by neither, None for no schema
+        self.additionalProperties = None
+        self.prefixItems = []
+        self.items = None
+        # SchemaNodes applied to the same value, $ref included
+        self.allOf = []
+        # (if, then, else) SchemaNodes, then and else may be None
+        self.conditional = None
+        self._applied = None
+        self._isDeep = None
+        # object key -> childSchemas, most documents repeat their keys
+        self._childCache = {}
+        self._leafChecks = False
+
+    def applied(self) -> list:
+        '''
+        This schema and every allOf or $ref one applied to the same value,
+        each once.
+        '''
+        if( self._applied is None ):
+            applied = []
+            seen = set()
+            stack = [ self ]
+            while( stack ):
+                node = stack.pop()
+                if( id(node) in seen ):
+                    continue
+                seen.add(id(node))
+                applied.append(node)
+                stack.extend(reversed(node.allOf))
+            self._applied = applied
+        return self._applied
+
+    def isDeep(self) -> bool:
+        if( self._isDeep is None ):
+            self._isDeep = any( node.deepChecks or node.conditional is not None for node in self.applied() )
+        return self._isDeep
+
+    def leafChecks(self) -> list:
+        '''
+        Every check of applied(), enough to validate a value that is not a
+        container, None if an if keyword needs more.
+        '''
+        if( self._leafChecks is False ):
+            applied = self.applied()
+            if( any( node.conditional is not None for node in applied ) ):
+                self._leafChecks = None
+            else:
+                self._leafChecks = [ check for node in applied for check in node.checks + node.deepChecks ]
+        return self._leafChecks
+
+    def childSchemas(self, key) -> list:
+        '''
+        SchemaNodes of the child at key, an object key or an array index.
+        '''
+        if( type(key) is int ):
+            if( key < len(self.prefixItems) ):
+                return [ self.prefixItems[key] ]
+            return [] if self.items is None else [ self.items ]
+        schemas = self._childCache.get(key)
+        if( schemas is not None ):
+            return schemas
+        schemas = []
+        if( key in self.properties ):
+            schemas.append(self.properties[key])
+        for regex,schema in self.patternProperties:
+            if( regex.search(key) ):
+                schemas.append(schema)
+        if( len(schemas) == 0 and self.additionalProperties is not None ):
+            schemas.append(self.additionalProperties)
+        if( len(self._childCache) < CHILD_CACHE_SIZE ):
+            self._childCache[key] = schemas
+        return schemas
+
+
+def compileSchema(schema) -> SchemaNode:
+    '''
+    Compile schema, json data, into its root SchemaNode. Raises SchemaError.
+    '''
+    return _Compiler(schema).compile(schema)
+
+
+class _Compiler:
+    def __init__(self, root):
+        self.root = root
+        # id of a schema dict -> its SchemaNode, so $ref cycles end
+        self.compiled = {}
+
+    def resolve(self, ref : str):
+        if( not ref.startswith("#") ):
+            raise SchemaError(f"only $ref to the same schema are supported, not {ref}")
+        target = self.root
+        pointer = unquote(ref[1:])
+        if( pointer == "" ):
+            return target
+        if( not pointer.startswith("/") ):
+            raise SchemaError(f"$ref {ref} is not a json pointer")
+        for part in pointer[1:].split("/"):
+            part = part.replace("~1", "/").replace("~0", "~")
+            try:
+                target = target[int(part)] if type(target) is list else target[part]
+            except ( KeyError, IndexError, ValueError, TypeError ):
+                raise SchemaError(f"$ref {ref} points to nothing")
+        return target
+
+    def compile(self, schema) -> SchemaNode:
+        if( type(schema) is bool ):
+            node = SchemaNode()
+            if( not schema ):
+                node.checks.append(lambda value: "no value is allowed here")
+            return node
+        if( type(schema) is not dict ):
+            raise SchemaError(f"a schema is an object or a boolean, not {_quote(schema)}")
+        node = self.compiled.get(id(schema))
+        if( node is not None ):
+            return node
+        node = self.compiled[id(schema)] = SchemaNode()
+        try:
+            self._compileKeywords(node, schema)
+        except ( TypeError, ValueError, AttributeError, re.error ) as e:
+            if( isinstance(e, SchemaError) ):
+                raise
+            raise SchemaError(f"bad schema : {e}")
+        return node
+
+    def _compileKeywords(self, node : SchemaNode, schema : dict) -> None:
+        checks = node.checks
+        if( "$ref" in schema ):
+            node.allOf.append(self.compile(self.resolve(schema["$ref"])))
+        for sub in schema.get("allOf", []):
+            node.allOf.append(self.compile(sub))
+
+        if( "type" in schema ):
+            types = schema["type"] if type(schema["type"]) is list else [ schema["type"] ]
+            for name in types:
+                if( name not in _TYPE_CHECKS ):
+                    raise SchemaError(f"unknown type {_quote(name)}")
+            typeChecks = [ _TYPE_CHECKS[name] for name in types ]
+            message = "should be " + " or ".join(types)
+            # the exact python types, a float may still be an integer
+            pythonTypes = set().union(*( _PYTHON_TYPES[name] for name in types ))
+            checks.append(lambda value: None if type(value) in pythonTypes or any( check(value) for check in typeChecks ) else message)
+
+        if( "enum" in schema ):
+            allowed = list(schema["enum"])
+            message = "should be one of " + _quote(allowed)
+            check = lambda value: None if any( _sameJson(value, other) for other in allowed ) else message
+            # a container only matches a container, whose items can change
+            ( node.deepChecks if any( type(other) in ( dict, list ) for other in allowed ) else checks ).append(check)
+        if( "const" in schema ):
+            const = schema["const"]
+            message = "should be " + _quote(const)
+            check = lambda value: None if _sameJson(value, const) else message
+            ( node.deepChecks if type(const) in ( dict, list ) else checks ).append(check)
+
+        self._compileNumber(checks, schema)
+        self._compileString(checks, schema)
+        self._compileArray(node, schema)
+        self._compileObject(node, schema)
+
+        for keyword in ( "anyOf", "oneOf" ):
+            if( keyword in schema ):
+                subs = [ self.compile(sub) for sub in schema[keyword] ]
+                node.deepChecks.append(_combinationCheck(keyword, subs))
+        if( "not" in schema ):
+            notSchema = self.compile(schema["not"])
+            node.deepChecks.append(lambda value: "matches a schema it should not" if isValid(notSchema, value) else None)
+        if( "if" in schema ):
+            node.conditional = (
+                self.compile(schema["if"]),
+                self.compile(schema["then"]) if "then" in schema else None,
+                self.compile(schema["else"]) if "else" in schema else None
+            )
+
+    def _compileNumber(self, checks : list, schema : dict) -> None:
+        def bound(limit, test, message):
+            checks.append(lambda value: message if _isNumber(value) and type(value) is not bool and not test(value, limit) else None)
+
+        exclusiveMin = schema.get("exclusiveMinimum")
+        exclusiveMax = schema.get("exclusiveMaximum")
+        if( "minimum" in schema ):
+            # draft 4 makes exclusiveMinimum a flag of minimum
+            if( exclusiveMin is True ):
+                bound(schema["minimum"], lambda value, limit: value > limit, f"should be more than {schema['minimum']}")
+            else:
+                bound(schema["minimum"], lambda value, limit: value >= limit, f"should be at least {schema['minimum']}")
+        if( "maximum" in schema ):
+            if( exclusiveMax is True ):
+                bound(schema["maximum"], lambda value, limit: value < limit, f"should be less than {schema['maximum']}")
+            else:
+                bound(schema["maximum"], lambda value, limit: value <= limit, f"should be at most {schema['maximum']}")
+        if( _isNumber(exclusiveMin) and type(exclusiveMin) is not bool ):
+            bound(exclusiveMin, lambda value, limit: value > limit, f"should be more than {exclusiveMin}")
+        if( _isNumber(exclusiveMax) and type(exclusiveMax) is not bool ):
+            bound(exclusiveMax, lambda value, limit: value < limit, f"should be less than {exclusiveMax}")
+        if( "multipleOf" in schema ):
+            divisor = schema["multipleOf"]
+            if( not _isNumber(divisor) or divisor <= 0 ):
+                raise SchemaError("multipleOf should be a positive number")
+            bound(divisor, lambda value, limit: ( value / limit ).is_integer() if type(value) is float or type(limit) is float else value % limit == 0, f"should be a multiple of {divisor}")
+
+    def _compileString(self, checks : list, schema : dict) -> None:
+        if( "minLength" in schema ):
+            minLength = schema["minLength"]
+            checks.append(lambda value: f"should have at least {minLength} characters" if type(value) is str and len(value) < minLength else None)
+        if( "maxLength" in schema ):
+            maxLength = schema["maxLength"]
+            checks.append(lambda value: f"should have at most {maxLength} characters" if type(value) is str and len(value) > maxLength else None)
+        if( "pattern" in schema ):
+            regex = re.compile(schema["pattern"])
+            message = f"should match {schema['pattern']}"
+            checks.append(lambda value: message if type(value) is str and regex.search(value) is None else None)
+
+    def _compileArray(self, node : SchemaNode, schema : dict) -> None:
+        checks = node.checks
+        if( "minItems" in schema ):
+            minItems = schema["minItems"]
+            checks.append(lambda value: f"should have at least {minItems} items" if type(value) is list and len(value) < minItems else None)
+        if( "maxItems" in schema ):
+            maxItems = schema["maxItems"]
+            checks.append(lambda value: f"should have at most {maxItems} items" if type(value) is list and len(value) > maxItems else None)
+        if( schema.get("uniqueItems") is True ):
+            node.deepChecks.append(_uniqueCheck)
+        if( "contains" in schema ):
+            contains = self.compile(schema["contains"])
+            node.deepChecks.append(lambda value: "should contain a matching item" if type(value) is list and not any( isValid(contains, item) for item in value ) else None)
+
+        items = schema.get("items")
+        if( type(items) is list ):
+            # draft 7 tuples
+            node.prefixItems = [ self.compile(sub) for sub in items ]
+            if( "additionalItems" in schema ):
+                node.items = self.compile(schema["additionalItems"])
+        else:
+            node.prefixItems = [ self.compile(sub) for sub in schema.get("prefixItems", []) ]
+            if( items is not None ):
+                node.items = self.compile(items)
+
+    def _compileObject(self, node : SchemaNode, schema : dict) -> None:
+        checks = node.checks
+        for key in schema.get("required", []):
+            checks.append(lambda value, key=key: f"is missing the key {_quote(key)}" if type(value) is dict and key not in value else None)
+        dependent = dict(schema.get("dependentRequired", {}))
+        # draft 7 dependencies, the schema form is not supported
+        dependent.update( ( key, val ) for key,val in schema.get("dependencies", {}).items() if type(val) is list )
+        for key,others in dependent.items():
+            for other in others:
+                checks.append(lambda value, key=key, other=other: f"has {_quote(key)} but is missing {_quote(other)}" if type(value) is dict and key in value and other not in value else None)
+        if( "minProperties" in schema ):
+            minProperties = schema["minProperties"]
+            checks.append(lambda value: f"should have at least {minProperties} keys" if type(value) is dict and len(value) < minProperties else None)
+        if( "maxProperties" in schema ):
+            maxProperties = schema["maxProperties"]
+            checks.append(lambda value: f"should have at most {maxProperties} keys" if type(value) is dict and len(value) > maxProperties else None)
+
+        node.properties = { key : self.compile(sub) for key,sub in schema.get("properties", {}).items() }
+        node.patternProperties = [ ( re.compile(pattern), self.compile(sub) ) for pattern,sub in schema.get("patternProperties", {}).items() ]
+        additional = schema.get("additionalProperties")
+        if( additional is False ):
+            checks.append(_additionalCheck(node))
+        elif( additional is not None ):
+            node.additionalProperties = self.compile(additional)
+        if( "propertyNames" in schema ):
+            names = self.compile(schema["propertyNames"])
+            def namesCheck(value):
+                if( type(value) is not dict ):
+                    return None
+                bad = [ key for key in value if not isValid(names, key) ]
+                return None if len(bad) == 0 else f"has bad key names {_quote(bad)}"
+            checks.append(namesCheck)
+
+
+def _additionalCheck(node : SchemaNode):
+    def check(value):
+        if( type(value) is not dict ):
+            return None
+        extra = [ key for key in value if key not in node.properties and not any( regex.search(key) for regex,schema in node.patternProperties ) ]
+        return None if len(extra) == 0 else f"should not have the keys {_quote(extra)}"
+    return check
+
+
+def _uniqueCheck(value):
+    if( type(value) is not list ):
+        return None
+    seen = set()
+    for item in value:
+        text = json.dumps(item, sort_keys=True)
+        if( text in seen ):
+            return "items should be unique"
+        seen.add(text)
+    return None
+
+
+def _combinationCheck(keyword : str, subs : list):
+    if( keyword == "anyOf" ):
+        return lambda value: None if any( isValid(sub, value) for sub in subs ) else "matches none of the allowed schemas"
+    def check(value):
+        matches = sum( 1 for sub in subs if isValid(sub, value) )
+        if( matches == 1 ):
+            return None
+        return "matches none of the allowed schemas" if matches == 0 else "matches more than one of the allowed schemas"
+    return check
+
+
+def validate(schemas : list, value, path : list, shouldStop=None):
+    '''
+    Yield the (path, message) errors of value, at key path path, against
+    every SchemaNode of schemas, its subtree included. shouldStop() is
+    called now and then, a true result stops the walk.
+    '''
+    # the path of a value is kept as a (parent link, key) pair and only
+    # made a list for an error
+    stack = [ ( schemas, value, None ) ]
+    visited = 0
+    while( stack ):
+        visited += 1
+        if( shouldStop is not None and visited % CANCEL_CHECK_INTERVAL == 0 and shouldStop() ):
+            return
+        schemas, value, link = stack.pop()
+        if( len(schemas) == 1 ):
+            applied = schemas[0].applied()
+        else:
+            applied = [ node for schema in schemas for node in schema.applied() ]
+        for schema in applied:
+            for check in schema.checks:
+                message = check(value)
+                if( message is not None ):
+                    yield _linkPath(path, link), message
+            for check in schema.deepChecks:
+                message = check(value)
+                if( message is not None ):
+                    yield _linkPath(path, link), message
+            if( schema.conditional is not None ):
+                ifSchema, thenSchema, elseSchema = schema.conditional
+                branch = thenSchema if isValid(ifSchema, value) else elseSchema
+                if( branch is not None ):
+                    stack.append(( [ branch ], value, link ))
+
+        valueType = type(value)
+        if( valueType is dict ):
+            if( len(applied) == 1 ):
+                pairs = [ ( key, child, applied[0].childSchemas(key) ) for key,child in value.items() ]
+            else:
+                pairs = [ ( key, child, [ node for schema in applied for node in schema.childSchemas(key) ] ) for key,child in value.items() ]
+        elif( valueType is list ):
+            if( all( len(schema.prefixItems) == 0 for schema in applied ) ):
+                # every item has the same schemas
+                itemSchemas = [ node for schema in applied for node in schema.childSchemas(0) ]
+                if( len(itemSchemas) == 0 ):
+                    continue
+                pairs = [ ( i, child, itemSchemas ) for i,child in enumerate(value) ]
+            else:
+                pairs = [ ( i, child, [ node for schema in applied for node in schema.childSchemas(i) ] ) for i,child in enumerate(value) ]
+        else:
+            continue
+
+        children = []
+        for key,child,childSchemas in pairs:
+            if( len(childSchemas) == 0 ):
+                continue
+            leafChecks = childSchemas[0].leafChecks() if len(childSchemas) == 1 else None
+            if( leafChecks is None or type(child) in ( dict, list ) ):
+                children.append(( childSchemas, child, ( link, key ) ))
+                continue
+            # a plain value is checked right away instead of through the stack
+            for check in leafChecks:
+                message = check(child)
+                if( message is not None ):
+                    yield _linkPath(path, ( link, key )), message
+        # popped in document order
+        stack.extend(reversed(children))
+
+
+def _linkPath(path : list, link) -> list:
+    keys = []
+    while( link is not None ):
+        link, key = link
+        keys.append(key)
+    keys.reverse()
+    return path + keys
+
+
+def isValid(schema : SchemaNode, value) -> bool:
+    for error in validate([ schema ], value, []):
+        return False
+    return True
+
+
+class ErrorNode:
+    '''
+    Errors at one key path, and below it in children by key. count is the
+    number of messages of the whole subtree.
+    '''
+    __slots__ = ( "messages", "children", "count" )
+
+    def __init__(self):
+        self.messages = []
+        self.children = {}
+        self.count = 0
+
+
+class SchemaChecker:
+    '''
+    Schema errors of one document, one of its listeners like
+    search.SearchIndex. build() validates the whole data and may run in a
+    worker thread, edits reported before it is done are queued and applied
+    by finishBuild() on the GUI thread.
+
+    After that an edit only has what it touched validated again: the
+    edited subtree, and the keywords of its parent that look at the keys
+    alone, e.g. required. Below a schema with isDeep() keywords the
+    subtree of that schema is validated again instead.
+    '''
+    def __init__(self, schema : SchemaNode, schemaPath : str = ""):
+        self.schema = schema
+        self.schemaPath = schemaPath
+        self.root = ErrorNode()
+        self.isReady = False
+        self.pendingEdits = []
+        self._cancelRequested = False
+        # called after the errors changed once the build is done, set by the owner
+        self.onChange = None
+
+    # building
+
+    def build(self, data) -> None:
+        for path,message in validate([ self.schema ], data, [], lambda: self._cancelRequested):
+            self._addMessage(path, message)
+
+    def cancel(self) -> None:
+        '''
+        Make a running build() return early, e.g. when the tab is closed.
+        '''
+        self._cancelRequested = True
+
+    def finishBuild(self) -> None:
+        self.isReady = True
+        for edit in self.pendingEdits:
+            self.applyEdit(edit)
+        self.pendingEdits = []
+        self._changed()
+
+    # errors
+
+    def errorCount(self) -> int:
+        return self.root.count
+
+    def _errorNode(self, path : list) -> ErrorNode:
+        errorNode = self.root
+        for key in path:
+            errorNode = errorNode.children.get(key)
+            if( errorNode is None ):
+                return None
+        return errorNode
+
+    def messages(self, path : list) -> list:
+        '''
+        Error messages of the value at key path path itself.
+        '''
+        errorNode = self._errorNode(path)
+        return [] if errorNode is None else errorNode.messages
+
+    def countBelow(self, path : list) -> int:
+        '''
+        Error messages of the subtree at key path path, its own excluded.
+        '''
+        errorNode = self._errorNode(path)
+        return 0 if errorNode is None else errorNode.count - len(errorNode.messages)
+
+    def firstError(self) -> tuple:
+        '''
+        (path, message) of one of the errors, None without errors.
+        '''
+        path = []
+        errorNode = self.root
+        while( errorNode.count > 0 ):
+            if( errorNode.messages ):
+                return path, errorNode.messages[0]
+            key, errorNode = next( ( key, child ) for key,child in errorNode.children.items() if child.count > 0 )
+            path.append(key)
+        return None
+
+    def _addMessage(self, path : list, message : str) -> None:
+        errorNode = self.root
+        errorNode.count += 1
+        for key in path:
+            child = errorNode.children.get(key)
+            if( child is None ):
+                child = errorNode.children[key] = ErrorNode()
+            child.count += 1
+            errorNode = child
+        errorNode.messages.append(message)
+
+    def _removeCount(self, path : list, count : int) -> None:
+        # take count messages off every node from the root to path, and drop
+        # the nodes left empty
+        if( count == 0 ):
+            return
+        errorNode = self.root
+        errorNode.count -= count
+        for key in path:
+            child = errorNode.children.get(key)
+            if( child is None ):
+                return
+            child.count -= count
+            if( child.count == 0 ):
+                del errorNode.children[key]
+                return
+            errorNode = child
+
+    def _clearSubtree(self, path : list) -> None:
+        errorNode = self._errorNode(path)
+        if( errorNode is None ):
+            return
+        if( len(path) == 0 ):
+            self.root = ErrorNode()
+            return
+        # the node counts down to nothing and is dropped with its subtree
+        self._removeCount(path, errorNode.count)
+
+    def _clearMessages(self, path : list) -> None:
+        errorNode = self._errorNode(path)
+        if( errorNode is None or len(errorNode.messages) == 0 ):
+            return
+        count = len(errorNode.messages)
+        errorNode.messages = []
+        self._removeCount(path, count)
+
+    def _shiftItems(self, arrayPath : list, first : int, delta : int) -> None:
+        # the errors of array items from index first on move by delta
+        errorNode = self._errorNode(arrayPath)
+        if( errorNode is None or not any( type(key) is int and key >= first for key in errorNode.children ) ):
+            return
+        errorNode.children = {
+            ( key + delta if type(key) is int and key >= first else key ) : child
+            for key,child in errorNode.children.items()
+        }
+
+    # keeping up to date
+
+    def applyEdit(self, edit) -> None:
+        '''
+        Document listener, see model.Edit.
+        '''
+        if( not self.isReady ):
+            self.pendingEdits.append(edit)
+            return
+
+        path = edit.path
+        node = edit.node if edit.kind in ( "key", "value" ) else edit.parent
+        if( _depth(node) != ( len(path) if edit.kind in ( "key", "value" ) else len(path) - 1 ) ):
+            # a queued edit of a node removed since, its removal follows
+            return
+        if( edit.kind == "insert" ):
+            if( type(path[-1]) is int ):
+                self._shiftItems(path[:-1], path[-1], 1)
+            self._revalidate(edit.parent, path[:-1], path[-1], edit.value)
+        elif( edit.kind == "remove" ):
+            self._clearSubtree(path)
+            if( type(path[-1]) is int ):
+                # the removed item's entry is gone, the ones after it move up
+                self._shiftItems(path[:-1], path[-1] + 1, -1)
+            self._revalidate(edit.parent, path[:-1])
+        elif( edit.kind == "key" ):
+            self._clearSubtree(path)
+            self._revalidate(edit.node.parent, path[:-1], edit.value, Document.nodeData(edit.node))
+        elif( edit.kind == "value" ):
+            if( len(path) == 0 ):
+                self._revalidateAt([], [ self.schema ], edit.value)
+            else:
+                self._revalidate(edit.node.parent, path[:-1], path[-1], edit.value, parentKeysChanged=False)
+        self._changed()
+
+    def _revalidate(self, parent, parentPath : list, key=None, value=None, parentKeysChanged : bool = True) -> None:
+        '''
+        Validate again the child at key of parent, a model.Node at key path
+        parentPath, whose value is value, and the keys of parent.
+        '''
+        # the schemas down to the parent, the first deep one is validated
+        # again whole
+        schemas = [ self.schema ]
+        depth = 0
+        while( True ):
+            if( any( schema.isDeep() for schema in schemas ) ):
+                anchor = parent
+                for i in range(len(parentPath) - depth):
+                    anchor = anchor.parent
+                self._revalidateAt(parentPath[:depth], schemas, Document.nodeData(anchor))
+                return
+            if( depth == len(parentPath) ):
+                break
+            schemas = [ child for schema in schemas for applied in schema.applied() for child in applied.childSchemas(parentPath[depth]) ]
+            depth += 1
+            if( len(schemas) == 0 ):
+                # nothing below is constrained
+                return
+
+        checks = [ check for schema in schemas for applied in schema.applied() for check in applied.checks ]
+        if( parentKeysChanged and checks ):
+            # the keys of a container stand in for it, the checks of its own
+            # keywords never look at the values
+            self._clearMessages(parentPath)
+            shallow = _shallowData(parent)
+            for check in checks:
+                message = check(shallow)
+                if( message is not None ):
+                    self._addMessage(parentPath, message)
+        if( key is not None ):
+            childSchemas = [ child for schema in schemas for applied in schema.applied() for child in applied.childSchemas(key) ]
+            self._clearSubtree(parentPath + [ key ])
+            for path,message in validate(childSchemas, value, parentPath + [ key ]):
+                self._addMessage(path, message)
+
+    def _revalidateAt(self, path : list, schemas : list, value) -> None:
+        self._clearSubtree(path)
+        for errorPath,message in validate(schemas, value, path):
+            self._addMessage(errorPath, message)
+
+    def _changed(self) -> None:
+        if( self.onChange is not None ):
+            self.onChange()
+
+
+def _shallowData(node):
+    # a container with the keys of a model.Node and no values, or its value
+    if( node.children is None ):
+        return node.value
+    count = node.childCount() + node.pendingCount()
+    if( node.isArray ):
+        return [ None ] * count
+    keys = dict.fromkeys( child.key for child in node.children )
+    if( node.pendingCount() ):
+        keys.update(dict.fromkeys(islice(node.value, node.fetched, None)))
+    return keys
+
+
+def _depth(node) -> int:
+    depth = 0
+    while( node.parent is not None ):
+        node = node.parent
+        depth += 1
+    return depth
@@ -0,0 +1,317 @@
+import re
+from array import array
+from bisect import (
+    bisect_left,
+    insort
+)
+
+import parser
+
+TOKEN_RE = re.compile(r"\w+")
+MAX_RESULTS = 1000
+# entry id of the document root
+ROOT_ID = -1
+
+
+def tokenize(text : str) -> list:
+    return TOKEN_RE.findall(text.lower())
+
+
+def _items(data):
+    return enumerate(data) if type(data) is list else iter(data.items())
+
+
+def _emptyBranch(data):
+    return [] if type(data) is list else {}
+
+
+def _childItems(siblings):
+    return enumerate(siblings) if type(siblings) is list else siblings.items()
+
+
+class SearchIndex:
+    '''
+    Inverted index over key names, value text and key paths of a document.
+
+    Entries are numbered in build order and only store their parent entry and
+    key, so renaming a branch renames every path below it for free. A removed
+    entry is only marked dead, entries below it are filtered out at query time
+    by looking at their ancestors. An array item also stores its position,
+    renumbered when a path needs it after items before it were inserted or
+    removed.
+
+    build() may run in a worker thread. Edits reported before the build is
+    done are queued and applied by finishBuild() on the GUI thread.
+    '''
+    def __init__(self):
+        self.parents = array("q")
+        self.keys = []
+        # position of an array item in its array, see _position
+        self.positions = array("q")
+        # array entry id -> first position whose items may store a wrong one
+        self.staleFrom = {}
+        self.alive = bytearray()
+        # entry id -> { key : entry id } for every branch entry, a list of
+        # entry ids for an array, so removing an item shifts the others for free
+        self.children = { ROOT_ID : {} }
+        # token -> set of entry ids whose key or value contains it
+        self.postings = {}
+        self.sortedTokens = []
+        self.isReady = False
+        self.pendingEdits = []
+        self._cancelRequested = False
+
+    # building
+
+    def build(self, data : dict) -> None:
+        self.children[ROOT_ID] = _emptyBranch(data)
+        self._addSubtree(ROOT_ID, data)
+        self.sortedTokens = sorted(self.postings)
+
+    def cancel(self) -> None:
+        '''
+        Make a running build() return early, e.g. when the tab is closed.
+        '''
+        self._cancelRequested = True
+
+    def finishBuild(self) -> None:
+        self.isReady = True
+        for edit in self.pendingEdits:
+            self.applyEdit(edit)
+        self.pendingEdits = []
+
+    def _addEntry(self, parentId : int, key, value) -> int:
+        entryId = len(self.keys)
+        self.parents.append(parentId)
+        self.keys.append(key)
+        self.alive.append(1)
+        siblings = self.children[parentId]
+        if( type(siblings) is list ):
+            self.positions.append(key)
+            siblings.insert(key, entryId)
+            if( key < len(siblings) - 1 ):
+                self._markStale(parentId, key + 1)
+        else:
+            self.positions.append(0)
+            siblings[key] = entryId
+        for token in self._entryTokens(key, value):
+            posting = self.postings.get(token)
+            if( posting is None ):
+                posting = self.postings[token] = set()
+                if( self.isReady ):
+                    insort(self.sortedTokens, token)
+            posting.add(entryId)
+        return entryId
+
+    def _addSubtree(self, parentId : int, data) -> None:
+        # entries are numbered in pre-order, so sorted ids are in document order
+        self.children.setdefault(parentId, _emptyBranch(data))
+        stack = [ (parentId, _items(data)) ]
+        while( stack and not self._cancelRequested ):
+            currId, items = stack[-1]
+            for key,val in items:
+                entryId = self._addEntry(currId, key, val)
+                if( type(val) in ( dict, list ) ):
+                    self.children[entryId] = _emptyBranch(val)
+                    stack.append((entryId, _items(val)))
+                    break
+            else:
+                stack.pop()
+
+    def _entryTokens(self, key, value) -> set:
+        # array indexes are not words, they would only bloat the postings
+        tokens = set() if type(key) is int else set(tokenize(key))
+        if( type(value) not in ( dict, list ) ):
+            tokens.update(tokenize(parser.toText(value)))
+        return tokens
+
+    # keeping up to date
+
+    def applyEdit(self, edit) -> None:
+        '''
+        Document listener, see model.Edit.
+        '''
+        if( not self.isReady ):
+            self.pendingEdits.append(edit)
+            return
+
+        if( edit.kind == "insert" ):
+            parentId = self._resolve(edit.path[:-1])
+            if( parentId is None ):
+                return
+            self.children.setdefault(parentId, [] if edit.parent.isArray else {})
+            entryId = self._addEntry(parentId, edit.path[-1], edit.value)
+            if( type(edit.value) in ( dict, list ) ):
+                self._addSubtree(entryId, edit.value)
+            return
+
+        entryId = self._resolve(edit.path)
+        if( entryId is None ):
+            return
+
+        if( edit.kind == "remove" ):
+            self.alive[entryId] = 0
+            parentId = self.parents[entryId]
+            siblings = self.children[parentId]
+            if( type(siblings) is list ):
+                siblings.pop(edit.path[-1])
+                self._markStale(parentId, edit.path[-1])
+            else:
+                del siblings[edit.path[-1]]
+        elif( edit.kind == "key" ):
+            siblings = self.children[self.parents[entryId]]
+            del siblings[edit.oldValue]
+            siblings[edit.value] = entryId
+            self.keys[entryId] = edit.value
+            value = edit.node.value if not edit.node.isBranch() else {}
+            self._retoken(entryId, self._entryTokens(edit.oldValue, value), self._entryTokens(edit.value, value))
+        elif( edit.kind == "value" ):
+            key = edit.path[-1]
+            self._retoken(entryId, self._entryTokens(key, edit.oldValue), self._entryTokens(key, edit.value))
+            # a branch replaced by a value loses its subtree, and the other way round
+            if( type(edit.oldValue) in ( dict, list ) and entryId in self.children ):
+                self.staleFrom.pop(entryId, None)
+                for key,childId in _childItems(self.children.pop(entryId)):
+                    self.alive[childId] = 0
+            if( type(edit.value) in ( dict, list ) ):
+                self._addSubtree(entryId, edit.value)
+
+    def _markStale(self, arrayId : int, first : int) -> None:
+        self.staleFrom[arrayId] = min(first, self.staleFrom.get(arrayId, first))
+
+    def _retoken(self, entryId : int, oldTokens : set, newTokens : set) -> None:
+        for token in oldTokens - newTokens:
+            self.postings[token].discard(entryId)
+        for token in newTokens - oldTokens:
+            posting = self.postings.get(token)
+            if( posting is None ):
+                posting = self.postings[token] = set()
+                insort(self.sortedTokens, token)
+            posting.add(entryId)
+
+    def _resolve(self, path : list):
+        entryId = ROOT_ID
+        for key in path:
+            siblings = self.children.get(entryId)
+            if( siblings is None ):
+                return None
+            if( type(siblings) is list ):
+                if( type(key) is not int or not 0 <= key < len(siblings) ):
+                    return None
+            elif( key not in siblings ):
+                return None
+            entryId = siblings[key]
+        return entryId
+
+    # querying
+
+    def _isAlive(self, entryId : int) -> bool:
+        while( entryId != ROOT_ID ):
+            if( not self.alive[entryId] ):
+                return False
+            entryId = self.parents[entryId]
+        return True
+
+    def path(self, entryId : int) -> list:
+        keys = []
+        while( entryId != ROOT_ID ):
+            parentId = self.parents[entryId]
+            siblings = self.children[parentId]
+            # the index of an array item is its position, not the key it was added with
+            keys.append(self._position(parentId, entryId) if type(siblings) is list else self.keys[entryId])
+            entryId = parentId
+        keys.reverse()
+        return keys
+
+    def _position(self, arrayId : int, entryId : int) -> int:
+        '''
+        Position of entryId in array arrayId, renumbering the items from the
+        first one an insert or remove moved, once for all the edits since.
+        '''
+        first = self.staleFrom.pop(arrayId, None)
+        if( first is not None ):
+            siblings = self.children[arrayId]
+            positions = self.positions
+            for i in range(first, len(siblings)):
+                positions[siblings[i]] = i
+        return self.positions[entryId]
+
+    def _prefixTokens(self, prefix : str):
+        start = bisect_left(self.sortedTokens, prefix)
+        for i in range(start, len(self.sortedTokens)):
+            token = self.sortedTokens[i]
+            if( not token.startswith(prefix) ):
+                break
+            yield token
+
+    def _prefixMatches(self, prefix : str, limit : int = None) -> set:
+        matches = set()
+        for token in self._prefixTokens(prefix):
+            matches |= self.postings[token]
+            if( limit is not None and len(matches) >= limit ):
+                break
+        return matches
+
+    def _searchPath(self, segments : list) -> list:
+        '''
+        Entries at the end of a key path. The last segment is a prefix of the
+        key, the others are whole keys. The first segment is looked up in the
+        postings and the rest walks down the children from there.
+        '''
+        first = segments[0]
+        tokens = tokenize(first)
+        if( len(tokens) == 0 ):
+            return []
+        candidates = set.intersection(*( self.postings.get(token, set()) for token in tokens ))
+        level = [ i for i in candidates if str(self.keys[i]).lower() == first ]
+        if( len(segments) == 1 ):
+            return level
+        for segment in segments[1:-1]:
+            level = [
+                childId
+                for i in level
+                for key,childId in _childItems(self.children.get(i, {}))
+                if str(key).lower() == segment
+            ]
+        last = segments[-1]
+        return [
+            childId
+            for i in level
+            for key,childId in _childItems(self.children.get(i, {}))
+            if str(key).lower().startswith(last)
+        ]
+
+    def search(self, text : str, limit : int = MAX_RESULTS) -> list:
+        '''
+        Paths of entries matching text, in document build order. Every word of
+        text must start a word of the key or value. Text with dots and no
+        spaces is a key path, e.g. "solver.tolerance", matched at any depth.
+        '''
+        text = text.strip().lower()
+        if( not self.isReady or text == "" ):
+            return []
+
+        if( "." in text and " " not in text ):
+            segments = [ segment for segment in text.split(".") if segment != "" ]
+            if( len(segments) == 0 ):
+                return []
+            ids = self._searchPath(segments)
+        else:
+            tokens = tokenize(text)
+            if( len(tokens) == 0 ):
+                return []
+            # a single word can stop collecting once there are enough hits
+            ids = self._searchTokens(tokens, limit * 2 if len(tokens) == 1 else None)
+
+        ids = sorted( i for i in ids if self._isAlive(i) )
+        return [ self.path(i) for i in ids[:limit] ]
+
+    def _searchTokens(self, tokens : list, limit : int) -> set:
+        if( len(tokens) == 0 ):
+            return set()
+        sets = [ self._prefixMatches(token, limit) for token in tokens ]
+        sets.sort(key=len)
+        result = sets[0]
+        for other in sets[1:]:
+            result = result & other
+        return result
@@ -0,0 +1,317 @@
+import json
+from itertools import islice
+
+from PySide6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QComboBox,
+    QLineEdit,
+    QLabel,
+    QTableView,
+    QHeaderView
+)
+
+from PySide6.QtCore import (
+    Qt,
+    QAbstractTableModel,
+    QModelIndex,
+    QTimer,
+    Signal
+)
+
+import parser
+from model import (
+    Document,
+    Node
+)
+from profiler import profiler
+
+# GLOBALS
+# ms between an edit of the array and the rebuild of its table
+REBUILD_DELAY = 300
+ANY_COLUMN = "Any column"
+
+
+def isTable(node : Node) -> bool:
+    '''
+    True if node is an array whose items are all objects.
+    '''
+    if( not node.isArray ):
+        return False
+    if( node.children is None ):
+        return all( type(item) is dict for item in node.value )
+    # pending items are raw data, fetched ones are nodes
+    if( not all( child.isBranch() and not child.isArray for child in node.children ) ):
+        return False
+    return node.pending is None or all( type(item) is dict for item in islice(node.value, node.fetched, None) )
+
+
+def _sortKey(value):
+    # missing and null first, then booleans, numbers, strings and containers
+    if( value is None ):
+        return ( 0, 0 )
+    if( type(value) is bool ):
+        return ( 1, value )
+    if( type(value) in ( int, float ) ):
+        return ( 2, value )
+    if( type(value) is str ):
+        return ( 3, value )
+    return ( 4, cellText(value) )
+
+
+def cellText(value) -> str:
+    if( type(value) in ( dict, list ) ):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return parser.toText(value)
+
+
+class ColumnStore:
+    '''
+    The items of an array of objects split into one list per key, so a sort
+    or a filter walks one flat list instead of every dict. Columns are the
+    keys in the order they are first seen, an item without a key holds None
+    in that column and is shown empty.
+    '''
+    def __init__(self, items : list):
+        self.names = []
+        self.columns = []
+        # lowercased cell texts of a column, built the first time it is filtered
+        self.texts = {}
+        self.rowCount = len(items)
+        positions = {}
+        for row,item in enumerate(items):
+            for key,val in item.items():
+                col = positions.get(key)
+                if( col is None ):
+                    col = positions[key] = len(self.names)
+                    self.names.append(key)
+                    self.columns.append([ None ] * self.rowCount)
+                self.columns[col][row] = val
+        self.items = items
+
+    def hasValue(self, row : int, col : int) -> bool:
+        # tells a missing key from a null
+        return ( self.names[col] in self.items[row] )
+
+    def columnTexts(self, col : int) -> list:
+        texts = self.texts.get(col)
+        if( texts is None ):
+            name = self.names[col]
+            texts = self.texts[col] = [
+                cellText(val).lower() if name in item else ""
+                for val,item in zip(self.columns[col], self.items)
+            ]
+        return texts
+
+    def sortedRows(self, rows : list, col : int, descending : bool) -> list:
+        column = self.columns[col]
+        return sorted(rows, key=lambda row: _sortKey(column[row]), reverse=descending)
+
+    def matchingRows(self, text : str, col : int = None) -> list:
+        '''
+        Rows with a cell containing text, in column col or in any column if
+        col is None.
+        '''
+        text = text.lower()
+        cols = range(len(self.names)) if col is None else [ col ]
+        matched = bytearray(self.rowCount)
+        for currCol in cols:
+            for row,cell in enumerate(self.columnTexts(currCol)):
+                if( text in cell ):
+                    matched[row] = 1
+        return [ row for row in range(self.rowCount) if matched[row] ]
+
+
+class ArrayTableModel(QAbstractTableModel):
+    '''
+    Table over a ColumnStore. order lists the shown rows as item indexes,
+    sorting and filtering only rebuild it, the view asks for the visible
+    cells alone.
+    '''
+    def __init__(self, store : ColumnStore, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.order = list(range(store.rowCount))
+        self.sortColumn = -1
+        self.sortOrder = Qt.AscendingOrder
+        self.filterText = ""
+        self.filterColumn = None
+
+    def setStore(self, store : ColumnStore) -> None:
+        self.beginResetModel()
+        self.store = store
+        self._updateOrder()
+        self.endResetModel()
+
+    def rowCount(self, parent : QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.order)
+
+    def columnCount(self, parent : QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.store.names)
+
+    def data(self, index : QModelIndex, role : int = Qt.DisplayRole):
+        if( not index.isValid() or role != Qt.DisplayRole ):
+            return None
+        row = self.order[index.row()]
+        col = index.column()
+        if( not self.store.hasValue(row, col) ):
+            return ""
+        return cellText(self.store.columns[col][row])
+
+    def headerData(self, section : int, orientation, role : int = Qt.DisplayRole):
+        if( role != Qt.DisplayRole ):
+            return None
+        if( orientation == Qt.Horizontal ):
+            return self.store.names[section]
+        return str(self.order[section])
+
+    def sort(self, column : int, order=Qt.AscendingOrder) -> None:
+        self.sortColumn = column
+        self.sortOrder = order
+        self.layoutAboutToBeChanged.emit()
+        self._updateOrder()
+        self.layoutChanged.emit()
+
+    def setFilter(self, text : str, column : int = None) -> None:
+        '''
+        Show only rows with a cell containing text, in column or any column.
+        '''
+        self.filterText = text
+        self.filterColumn = column
+        self.beginResetModel()
+        self._updateOrder()
+        self.endResetModel()
+
+    def itemIndex(self, row : int) -> int:
+        return self.order[row]
+
+    def _updateOrder(self) -> None:
+        store = self.store
+        if( self.filterColumn is not None and self.filterColumn >= len(store.names) ):
+            self.filterColumn = None
+        if( self.filterText != "" ):
+            order = store.matchingRows(self.filterText, self.filterColumn)
+        else:
+            order = list(range(store.rowCount))
+        if( 0 <= self.sortColumn < len(store.names) ):
+            order = store.sortedRows(order, self.sortColumn, self.sortOrder == Qt.DescendingOrder)
+        self.order = order
+
+
+class ArrayTableDialog(QDialog):
+    '''
+    Read-only table of an array of objects, one row per item and one column
+    per key. It follows the edits made to the array in the tree.
+    '''
+    # emitted with the key path of the item of an activated row
+    pathActivated = Signal(object)
+
+    def __init__(self, document : Document, node : Node, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.node = node
+        self.setWindowTitle("Table : " + ".".join( str(key) for key in node.path() ))
+        self.resize(800, 500)
+
+        with profiler.phase("columns"):
+            store = ColumnStore(Document.nodeData(node))
+        self.tableModel = ArrayTableModel(store, self)
+
+        self.filterEdit = QLineEdit()
+        self.filterEdit.setPlaceholderText("Filter rows")
+        self.filterEdit.setClearButtonEnabled(True)
+        self.columnBox = QComboBox()
+        self.countLabel = QLabel()
+        self._fillColumnBox()
+
+        self.tableView = QTableView()
+        self.tableView.setModel(self.tableModel)
+        self.tableView.setSortingEnabled(True)
+        self.tableView.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.tableView.setSelectionBehavior(QTableView.SelectRows)
+        # a fixed row height keeps the view from measuring every row
+        verticalHeader = self.tableView.verticalHeader()
+        verticalHeader.setSectionResizeMode(QHeaderView.Fixed)
+        verticalHeader.setDefaultSectionSize(self.fontMetrics().height() + 6)
+        self.tableView.doubleClicked.connect(self._rowActivated)
+
+        filterLayout = QHBoxLayout()
+        filterLayout.addWidget(self.filterEdit, 1)
+        filterLayout.addWidget(self.columnBox)
+        filterLayout.addWidget(self.countLabel)
+        dlgLayout = QVBoxLayout(self)
+        dlgLayout.addLayout(filterLayout)
+        dlgLayout.addWidget(self.tableView)
+
+        self.filterTimer = QTimer(self)
+        self.filterTimer.setSingleShot(True)
+        self.filterTimer.setInterval(REBUILD_DELAY)
+        self.filterTimer.timeout.connect(self._applyFilter)
+        self.filterEdit.textChanged.connect(lambda: self.filterTimer.start())
+        self.columnBox.currentIndexChanged.connect(lambda: self.filterTimer.start())
+
+        self.rebuildTimer = QTimer(self)
+        self.rebuildTimer.setSingleShot(True)
+        self.rebuildTimer.setInterval(REBUILD_DELAY)
+        self.rebuildTimer.timeout.connect(self.rebuild)
+
+        # the listener must not outlive the dialog, which dies with its tab
+        listener = self._documentEdited
+        def detach():
+            if( listener in document.listeners ):
+                document.removeListener(listener)
+        document.addListener(listener)
+        self.finished.connect(detach)
+        self.destroyed.connect(detach)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self._updateCount()
+
+    def _fillColumnBox(self) -> None:
+        current = self.columnBox.currentText()
+        self.columnBox.blockSignals(True)
+        self.columnBox.clear()
+        self.columnBox.addItem(ANY_COLUMN)
+        self.columnBox.addItems([ str(name) for name in self.tableModel.store.names ])
+        index = self.columnBox.findText(current)
+        self.columnBox.setCurrentIndex(max(index, 0))
+        self.columnBox.blockSignals(False)
+
+    def _updateCount(self) -> None:
+        self.countLabel.setText(f"{self.tableModel.rowCount()} of {self.tableModel.store.rowCount} rows")
+
+    def _applyFilter(self) -> None:
+        column = self.columnBox.currentIndex() - 1
+        with profiler.operation("table filter"):
+            self.tableModel.setFilter(self.filterEdit.text(), None if column < 0 else column)
+        self._updateCount()
+
+    def _documentEdited(self, edit) -> None:
+        node = edit.parent if edit.kind in ( "insert", "remove" ) else edit.node
+        while( node is not None ):
+            if( node is self.node ):
+                self.rebuildTimer.start()
+                return
+            node = node.parent
+
+    def rebuild(self) -> None:
+        '''
+        Build the columns again from the array, closing the table if the
+        array is gone or no longer holds only objects.
+        '''
+        if( not self._isAttached() or not isTable(self.node) ):
+            self.close()
+            return
+        with profiler.operation("table rebuild"):
+            self.tableModel.setStore(ColumnStore(Document.nodeData(self.node)))
+        self._fillColumnBox()
+        self._updateCount()
+
+    def _isAttached(self) -> bool:
+        node = self.node
+        while( node.parent is not None ):
+            node = node.parent
+        return ( node is self.document.root )
+
+    def _rowActivated(self, index : QModelIndex) -> None:
+        self.pathActivated.emit(self.node.path() + [ self.tableModel.itemIndex(index.row()) ])
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import batch
+from batch import (
+    editFile,
+    parseOperations
+)
+
+DATA = { "a" : { "b" : 1, "c" : [ 1, 2, 3 ] }, "s" : "x" }
+
+
+@pytest.fixture
+def casePath(tmp_path):
+    path = tmp_path / "case.json"
+    path.write_text(json.dumps(DATA))
+    return path
+
+
+def runOperations(path, operations : list) -> dict:
+    return editFile(str(path), parseOperations(operations), 4, False, False)
+
+
+def test_renameOntoExistingKeyFails(casePath):
+    result = runOperations(casePath, [ { "op" : "replace", "path" : "s", "key" : "a" } ])
+    assert result["error"] == "key a already exists at the top level"
+    assert json.loads(casePath.read_text()) == DATA
+
+
+def test_insertOfExistingKeyFails(casePath):
+    result = runOperations(casePath, [ { "op" : "insert", "path" : "a", "key" : "b", "text" : "7" } ])
+    assert result["error"] == "key b already exists at a"
+    assert json.loads(casePath.read_text()) == DATA
+
+
+def test_renameAndInsertOfNewKeys(casePath):
+    result = runOperations(casePath, [
+        { "op" : "replace", "path" : "s", "key" : "t" },
+        { "op" : "insert", "path" : "a", "key" : "d", "text" : "7" }
+    ])
+    assert result["error"] is None
+    assert json.loads(casePath.read_text()) == { "a" : { "b" : 1, "c" : [ 1, 2, 3 ], "d" : 7 }, "t" : "x" }
+
+
+def test_unexpectedErrorsFailOnlyTheFile(casePath, monkeypatch):
+    def applyOperations(document, operations, skipMissing):
+        raise RecursionError("maximum recursion depth exceeded")
+    monkeypatch.setattr(batch, "applyOperations", applyOperations)
+    result = runOperations(casePath, [ { "op" : "delete", "path" : "s" } ])
+    assert result["error"] == "RecursionError: maximum recursion depth exceeded"
+    assert json.loads(casePath.read_text()) == DATA
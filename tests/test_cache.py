@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+from cache import (
+    META_SUFFIX,
+    DocumentCache,
+    contentHash
+)
+
+pytest.importorskip("PySide6")
+from workers import (
+    _loadPayload,
+    unpackPayload
+)
+
+DATA = { "a" : [ 1, 2.5, None ], "b" : { "c" : "text" } }
+
+
+@pytest.fixture
+def casePath(tmp_path):
+    path = tmp_path / "case.json"
+    path.write_text(json.dumps(DATA))
+    return str(path)
+
+
+def load(casePath : str, cacheDir : str) -> tuple:
+    '''
+    (data, whether it was parsed rather than taken from the cache)
+    '''
+    parsed = []
+    diskStat, payload = _loadPayload(casePath, cacheDir, parsing=lambda: parsed.append(True))
+    return unpackPayload(payload), bool(parsed)
+
+
+def test_loadUsesTheCacheUntilTheFileChanges(casePath, tmp_path):
+    cacheDir = str(tmp_path / "cache")
+    assert load(casePath, cacheDir) == ( DATA, True )
+    assert load(casePath, cacheDir) == ( DATA, False )
+
+    changed = dict(DATA, a=[ 1, 2.5, "changed" ])
+    with open(casePath, "w") as f:
+        json.dump(changed, f)
+    assert load(casePath, cacheDir) == ( changed, True )
+    assert load(casePath, cacheDir) == ( changed, False )
+
+
+def test_entriesMatchSizeMtimeAndContent(casePath, tmp_path):
+    cache = DocumentCache(str(tmp_path / "cache"))
+    with open(casePath, "rb") as f:
+        digest = contentHash(f.read())
+    fileStat = os.stat(casePath)
+    cache.store(casePath, fileStat, digest, b"payload")
+    assert cache.load(casePath, fileStat, digest) == b"payload"
+
+    # the same size, only touched
+    os.utime(casePath, ns=( fileStat.st_atime_ns, fileStat.st_mtime_ns + 10 ** 9 ))
+    assert cache.load(casePath, os.stat(casePath), digest) is None
+    # the same size and mtime, another content
+    assert cache.load(casePath, fileStat, contentHash(b"other")) is None
+    assert cache.load(str(tmp_path / "other.json"), fileStat, digest) is None
+    assert cache.load(casePath, fileStat, digest) == b"payload"
+
+
+def test_viewStateOutlivesTheContent(casePath, tmp_path):
+    cache = DocumentCache(str(tmp_path / "cache"))
+    cache.setViewState(casePath, { "expanded" : [ [ "b" ] ] })
+    cache.setSchemaPath(casePath, "schema.json")
+    fileStat = os.stat(casePath)
+    cache.store(casePath, fileStat, "digest", b"payload")
+    cache.store(casePath, fileStat, "changed", b"changed payload")
+    assert cache.load(casePath, fileStat, "digest") is None
+    assert cache.viewState(casePath) == { "expanded" : [ [ "b" ] ] }
+    assert cache.schemaPath(casePath) == "schema.json"
+
+
+def test_leastRecentlyUsedEntriesAreEvicted(tmp_path):
+    cache = DocumentCache(str(tmp_path / "cache"), maxBytes=25)
+    paths = [ str(tmp_path / f"{i}.json") for i in range(3) ]
+    for i,path in enumerate(paths):
+        with open(path, "w") as f:
+            f.write("{}")
+        fileStat = os.stat(path)
+        cache.store(path, fileStat, "digest", b"0123456789")
+        # a second apart, as last used
+        os.utime(cache._entryPath(path) + META_SUFFIX, ( i, i ))
+    cache.store(paths[0], os.stat(paths[0]), "digest", b"0123456789")
+    assert cache.load(paths[0], os.stat(paths[0]), "digest") == b"0123456789"
+    assert cache.load(paths[1], os.stat(paths[1]), "digest") is None
+    assert cache.load(paths[2], os.stat(paths[2]), "digest") == b"0123456789"
@@ -0,0 +1,55 @@
+import json
+import math
+
+import pytest
+
+from model import JsonCodec
+
+pytest.importorskip("orjson")
+
+FLOATS = [ 1e-07, 1e20, 1e16, 1e-05, 1.5e-05, 0.0001, 0.1, 100.0, -0.0, 5e-324, 1.7976931348623157e308, 1.2345678901234568e+17 ]
+DATA = {
+    "floats" : FLOATS + [ m * 10.0 ** e for m in ( 1.0, 1.5, 3.14159265358979 ) for e in range(-25, 25) ],
+    "text" : [ "café", "日本", "\U0001f600", "del\x7f", "tab\t\"q\" 1e5 0.00001", "" ],
+    "été" : { "z" : 1, "a" : [ True, False ], "m" : {} },
+    "ints" : [ 0, -1, 2 ** 63 - 1 ]
+}
+# data orjson writes as json.dumps does
+PLAIN = { "ints" : [ 0, -1, 2 ** 63 - 1 ], "floats" : [ 0.1, 100.0, 12345.678, 1e15, -2.5 ], "s" : "plain \"text\"\n", "b" : [ True, False, {} ] }
+# data orjson rejects or writes differently, left to the standard library
+FALLBACK = { "n" : None, "special" : [ math.nan, math.inf, -math.inf ], "big" : [ 2 ** 64, -2 ** 70 ], "x" : 1e-07 }
+
+
+@pytest.mark.parametrize("data", [ PLAIN, DATA, FALLBACK ])
+@pytest.mark.parametrize("indent", [ None, 2, 4 ])
+@pytest.mark.parametrize("sortKeys", [ False, True ])
+def test_orjsonAndJsonWriteTheSameBytes(data, indent, sortKeys):
+    expected = json.dumps(data, indent=indent, separators=( ",", ":" ) if indent is None else None, sort_keys=sortKeys).encode("ascii")
+    assert JsonCodec(True).dumps(data, indent, sortKeys) == expected
+    assert JsonCodec(False).dumps(data, indent, sortKeys) == expected
+
+
+def test_chunkedWritesMatch():
+    # enough entries to be written in several chunks
+    data = [ { "x" : i * 1e-07, "s" : f"é{i}" } for i in range(5000) ]
+    withOrjson = b"".join(JsonCodec(True).iterDumps(data, 4))
+    assert withOrjson == b"".join(JsonCodec(False).iterDumps(data, 4))
+    assert withOrjson == json.dumps(data, indent=4).encode("ascii")
+
+
+@pytest.mark.parametrize("indent", [ None, 4 ])
+def test_nullInStringsKeepsTheOrjsonPath(monkeypatch, indent):
+    data = { "nullable" : [ "null", "not null", { "a_null" : 1.5 } ], "null" : "x" }
+    expected = json.dumps(data, indent=indent, separators=( ",", ":" ) if indent is None else None).encode("ascii")
+    def dumps(*args, **kwargs):
+        raise AssertionError("written by json.dumps")
+    monkeypatch.setattr(json, "dumps", dumps)
+    assert JsonCodec(True).dumps(data, indent) == expected
+    assert b"".join(JsonCodec(True).iterDumps(data, indent)) == expected
+
+
+def test_nullValuesAreFoundInIndentedOutput():
+    # NaN and infinities are written as null by orjson, at any indent
+    for data in ( math.nan, [ 1, math.inf ], { "a" : [ { "b" : -math.inf } ] } ):
+        for indent in ( None, 2, 4 ):
+            assert JsonCodec(True).dumps(data, indent) == json.dumps(data, indent=indent, separators=( ",", ":" ) if indent is None else None).encode("ascii")
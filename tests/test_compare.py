@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+pytest.importorskip("PySide6")
+import compare
+from compare import (
+    Difference,
+    arrayOpcodes,
+    diffData
+)
+
+
+def applyOpcodes(opcodes : list, oldList : list, newList : list) -> list:
+    result = []
+    for tag,i1,i2,j1,j2 in opcodes:
+        if( tag == "equal" ):
+            assert oldList[i1:i2] == newList[j1:j2]
+            result.extend(oldList[i1:i2])
+        else:
+            result.extend(newList[j1:j2])
+    return result
+
+
+def test_equalDocumentsHaveNoDifferences():
+    data = { "a" : [ 1, { "b" : None } ], "c" : "text" }
+    assert diffData(data, { "a" : [ 1, { "b" : None } ], "c" : "text" }) == ( [], False )
+
+
+def test_differencesOfObjects():
+    old = { "a" : 1, "b" : { "c" : "x", "d" : [ 1, 2 ] }, "e" : True }
+    new = { "b" : { "c" : "y", "d" : [ 1, 2 ] }, "e" : True, "f" : None }
+    assert diffData(old, new) == ( [
+        Difference("removed", [ "a" ], 1, None),
+        Difference("changed", [ "b", "c" ], "x", "y"),
+        Difference("added", [ "f" ], None, None)
+    ], False )
+
+
+def test_typeChangesAreDifferences():
+    # 1, 1.0 and true are equal in python, not in json
+    old = { "a" : 1, "b" : [ 1, { "c" : True } ] }
+    new = { "a" : 1.0, "b" : [ 1, { "c" : 1 } ] }
+    assert diffData(old, new)[0] == [
+        Difference("changed", [ "a" ], 1, 1.0),
+        Difference("changed", [ "b", 1, "c" ], True, 1)
+    ]
+    assert diffData({ "a" : 1 }, { "a" : [ 1 ] })[0] == [ Difference("changed", [ "a" ], 1, [ 1 ]) ]
+
+
+def test_itemsInsertedInAnArray():
+    old = [ { "id" : i } for i in range(10) ]
+    new = old[:3] + [ { "id" : "new" } ] + old[3:7] + old[8:]
+    # paths of added items are on the right, of removed ones on the left
+    assert diffData({ "items" : old }, { "items" : new })[0] == [
+        Difference("added", [ "items", 3 ], None, { "id" : "new" }),
+        Difference("removed", [ "items", 7 ], { "id" : 7 }, None)
+    ]
+    old = [ 1, 2, 3 ]
+    assert diffData(old, [ 1, 5, 3, 4 ])[0] == [
+        Difference("changed", [ 1 ], 2, 5),
+        Difference("added", [ 3 ], None, 4)
+    ]
+
+
+def test_differencesStopAtTheLimit():
+    differences, truncated = diffData({ str(i) : i for i in range(20) }, {}, 5)
+    assert truncated
+    assert [ difference.path for difference in differences ] == [ [ str(i) ] for i in range(5) ]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_arrayOpcodesTurnOneArrayIntoTheOther(monkeypatch, seed):
+    # small windows, so long arrays go through every way of matching them
+    monkeypatch.setattr(compare, "MATCH_LIMIT", 50)
+    rng = random.Random(seed)
+    oldList = [ rng.randrange(300) for i in range(1000) ]
+    newList = list(oldList)
+    for i in range(60):
+        pos = rng.randrange(len(newList))
+        action = rng.randrange(3)
+        if( action == 0 ):
+            newList.insert(pos, rng.randrange(300))
+        elif( action == 1 ):
+            del newList[pos]
+        else:
+            newList[pos] = rng.randrange(300)
+    opcodes = arrayOpcodes(oldList, newList)
+    assert applyOpcodes(opcodes, oldList, newList) == newList
+    # the opcodes cover both arrays, in order
+    assert opcodes[0][1] == 0 and opcodes[0][3] == 0
+    assert opcodes[-1][2] == len(oldList) and opcodes[-1][4] == len(newList)
+    for prev,curr in zip(opcodes, opcodes[1:]):
+        assert prev[2] == curr[1] and prev[4] == curr[3]
+    # most of the array is left equal
+    assert sum( i2 - i1 for tag,i1,i2,j1,j2 in opcodes if tag == "equal" ) > 800
@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+import journal
+from journal import EditJournal
+from model import (
+    Document,
+    Model
+)
+
+DATA = { "a" : { "b" : [ 1, 2, 3 ], "c" : "text" }, "d" : [ { "e" : 1 } ], "f" : None }
+
+
+def journaled(tmp_path, data : dict = DATA) -> tuple:
+    '''
+    Document of a file written with data, and the journal of its edits.
+    '''
+    filePath = str(tmp_path / "data.json")
+    Model.writeFile(filePath, data)
+    document = Document(Model.readFile(filePath))
+    editJournal = EditJournal(str(tmp_path / "journal"), filePath)
+    document.addListener(editJournal.applyEdit)
+    return document, editJournal
+
+
+def edit(document : Document) -> None:
+    document.fetchAll()
+    a, d, f = document.root.children
+    document.insertPairs(a.children[0], [ ( None, 4 ) ])
+    document.removeNode(a.children[0].children[0])
+    document.setKey(a.children[1], "renamed")
+    document.setValue(f, { "g" : [ True ] })
+    document.insertNode(d, 0, 0, "first")
+    document.setValue(d.children[1], 2.5)
+
+
+def recover(editJournal : EditJournal) -> dict:
+    editJournal.close()
+    with open(editJournal._metaPath(), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return journal.recoverData(editJournal.journalDir, meta)
+
+
+def test_recoverReplaysTheEditsOnTheFile(tmp_path):
+    document, editJournal = journaled(tmp_path)
+    edit(document)
+    assert recover(editJournal) == document.toDict()
+
+
+def test_recoverReplaysTheEditsOnASnapshot(tmp_path):
+    document, editJournal = journaled(tmp_path)
+    document.fetchAll()
+    document.setValue(document.nodeAtPath([ "a", "c" ]), "before the snapshot")
+    gen = editJournal.rotate()
+    Model.writeFile(editJournal.snapshotPath(gen), document.toDict())
+    edit(document)
+    editJournal.commitCheckpoint(gen, "snapshot")
+    assert journal.journalGens(editJournal.journalDir, editJournal.id) == [ gen ]
+    # the file is no longer needed
+    os.unlink(editJournal.filePath)
+    assert recover(editJournal) == document.toDict()
+
+
+def test_recoverStopsAtATornLastLine(tmp_path):
+    document, editJournal = journaled(tmp_path)
+    edit(document)
+    expected = document.toDict()
+    document.setValue(document.nodeAtPath([ "a", "renamed" ]), "lost in the crash")
+    editJournal.close()
+    journalPath = editJournal._path(editJournal.gen, journal.JOURNAL_SUFFIX)
+    with open(journalPath, "rb") as f:
+        lines = f.read().splitlines(True)
+    with open(journalPath, "wb") as f:
+        f.writelines(lines[:-1])
+        f.write(lines[-1][:len(lines[-1]) // 2])
+    assert recover(editJournal) == expected
+
+
+@pytest.mark.parametrize("change", [ "content", "mtime" ])
+def test_recoverRejectsAFileChangedOnDisk(tmp_path, change):
+    document, editJournal = journaled(tmp_path)
+    edit(document)
+    fileStat = os.stat(editJournal.filePath)
+    if( change == "content" ):
+        Model.writeFile(editJournal.filePath, { "other" : "data" })
+    else:
+        # same size, only touched
+        os.utime(editJournal.filePath, ns=( fileStat.st_atime_ns, fileStat.st_mtime_ns + 10 ** 9 ))
+    with pytest.raises(ValueError, match="changed on disk"):
+        recover(editJournal)
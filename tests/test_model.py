@@ -0,0 +1,44 @@
+import json
+
+import model
+from model import Document
+
+
+def test_removeNodeForgetsItsFetchedNodes():
+    document = Document({ "a" : { "b" : [ 1, 2, 3 ], "c" : 1 }, "d" : 2 })
+    document.fetchAll()
+    assert document.nodeCount == 7
+    a = document.root.children[0]
+    document.removeNode(a)
+    assert document.nodeCount == 1
+    document.insertPairs(document.root, [ ( "e", [ 4, 5 ] ) ])
+    assert document.nodeCount == 2
+    document.removeNode(document.root.children[-1])
+    assert document.nodeCount == 1
+
+
+def test_viewWritesTheDocumentAsItWasWhenOpened(monkeypatch):
+    # small pieces so the edits land between them
+    monkeypatch.setattr(model, "DUMP_BATCH_SIZE", 2)
+    monkeypatch.setattr(model, "DUMP_NODE_BUDGET", 4)
+    document = Document({ "a" : { "b" : [ 1, 2, 3 ], "c" : 1 }, "d" : [ { "e" : i } for i in range(6) ], "f" : 2 })
+    document.fetch(document.root)
+    document.fetch(document.root.children[1], 3)
+    expected = json.dumps(document.toDict(), indent=4).encode("ascii")
+
+    view = document.openView()
+    chunks = model.CODEC.iterDumps(view, 4)
+    written = [ next(chunks) ]
+    a, d, f = document.root.children
+    document.setKey(a, "renamed")
+    document.removeNode(d.children[0])
+    document.fetch(d)
+    document.setValue(d.children[-1], "changed")
+    document.insertPairs(document.root, [ ( "g", 3 ) ])
+    document.setValue(f, [ 4 ])
+    written.extend(chunks)
+    document.closeView(view)
+
+    assert b"".join(written) == expected
+    assert document.views == []
+    assert document.toDict()["renamed"] == { "b" : [ 1, 2, 3 ], "c" : 1 }
@@ -0,0 +1,122 @@
+import json
+import random
+
+import pytest
+
+from model import (
+    Document,
+    Model
+)
+
+pytest.importorskip("PySide6")
+from patch import patchNode
+from treemodel import JsonTreeModel
+
+DATA = {
+    "solver" : { "tolerance" : 1e-06, "method" : "cg" },
+    "patches" : [ { "name" : "inlet" }, { "name" : "wall" }, { "name" : "outlet" } ],
+    "flags" : [ 1, 1.0, True ],
+    "name" : "case"
+}
+
+
+def assertFreshLoad(document : Document, data) -> None:
+    # the same json, key order and 1, 1.0 and true told apart included
+    assert json.dumps(document.toDict()) == json.dumps(data)
+    stack = [ document.root ]
+    while( stack ):
+        node = stack.pop()
+        for row,child in enumerate(node.children or []):
+            assert child.row == row and child.parent is node
+            if( node.isArray ):
+                assert child.key == row
+            stack.append(child)
+
+
+def test_patchingAChangedFileGivesAFreshLoad(tmp_path):
+    filePath = str(tmp_path / "case.json")
+    Model.writeFile(filePath, DATA)
+    treeModel = JsonTreeModel(Document(Model.readFile(filePath)))
+    treeModel.fetchAll()
+    wall = treeModel.nodeAtPath([ "patches", 1 ])
+    treeModel.setChecked(wall, True)
+
+    changed = json.loads(json.dumps(DATA))
+    changed["patches"].insert(0, { "name" : "new" })
+    changed["flags"] = [ 1.0, 1, True ]
+    changed["solver"]["tolerance"] = 1e-08
+    del changed["name"]
+    changed["version"] = 2
+    Model.writeFile(filePath, changed)
+    assert patchNode(treeModel, treeModel.rootNode, Model.readFile(filePath)) > 0
+    assertFreshLoad(treeModel.document, Model.readFile(filePath))
+    # a row that did not change keeps its node and state
+    assert treeModel.nodeAtPath([ "patches", 2 ]) is wall
+    assert wall.checked
+    assert patchNode(treeModel, treeModel.rootNode, Model.readFile(filePath)) == 0
+
+
+def test_patchTheTopLevel():
+    treeModel = JsonTreeModel(Document(DATA))
+    patchNode(treeModel, treeModel.rootNode, { "name" : "case", "solver" : {} })
+    assertFreshLoad(treeModel.document, { "name" : "case", "solver" : {} })
+    with pytest.raises(ValueError):
+        patchNode(treeModel, treeModel.rootNode, [ 1, 2 ])
+
+
+def randomData(rng : random.Random, depth : int = 0):
+    kind = rng.randrange(4 if depth < 4 else 2)
+    if( kind == 0 ):
+        return rng.choice([ 0, 1, 1.0, True, False, None, "a", "b", 2.5 ])
+    if( kind == 1 ):
+        return rng.choice([ "x", 3, 1, 1.0, True ])
+    if( kind == 2 ):
+        return [ randomData(rng, depth + 1) for i in range(rng.randrange(6)) ]
+    return { rng.choice("abcdefg") : randomData(rng, depth + 1) for i in range(rng.randrange(6)) }
+
+
+def mutate(rng : random.Random, data):
+    if( type(data) is dict and data and rng.random() < 0.7 ):
+        data = dict(data)
+        key = rng.choice(list(data))
+        action = rng.randrange(4)
+        if( action == 0 ):
+            del data[key]
+        elif( action == 1 ):
+            data[rng.choice("abcdefgh")] = randomData(rng, 3)
+        else:
+            data[key] = mutate(rng, data[key])
+        return data
+    if( type(data) is list and data and rng.random() < 0.7 ):
+        data = list(data)
+        pos = rng.randrange(len(data))
+        action = rng.randrange(4)
+        if( action == 0 ):
+            del data[pos]
+        elif( action == 1 ):
+            data.insert(pos, randomData(rng, 3))
+        else:
+            data[pos] = mutate(rng, data[pos])
+        return data
+    return randomData(rng, 3)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_patchRandomChanges(seed):
+    rng = random.Random(seed)
+    old = { "root" : randomData(rng), "other" : randomData(rng) }
+    new = old
+    for i in range(rng.randrange(1, 5)):
+        new = mutate(rng, new)
+    if( type(new) is not dict ):
+        new = { "root" : new }
+    treeModel = JsonTreeModel(Document(old))
+    # some rows fetched, the rest left raw
+    stack = [ treeModel.rootNode ]
+    while( stack ):
+        node = stack.pop()
+        if( node.isBranch() and rng.random() < 0.7 ):
+            treeModel.fetchNode(node, rng.randrange(node.pendingCount() + 1))
+            stack.extend(node.children or [])
+    patchNode(treeModel, treeModel.rootNode, new)
+    assertFreshLoad(treeModel.document, new)
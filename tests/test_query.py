@@ -0,0 +1,94 @@
+import pytest
+
+from model import Document
+from query import (
+    QueryError,
+    compileQuery
+)
+
+DATA = {
+    "solver" : { "tolerance" : 1e-06, "method" : "cg", "maxIter" : 100 },
+    "patches" : [
+        { "name" : "inlet", "type" : "patch", "nFaces" : 20 },
+        { "name" : "wall1", "type" : "wall", "nFaces" : 5 },
+        { "name" : "wall2", "type" : "wall", "nFaces" : 50, "tolerance" : 0.1 },
+        { "name" : "outlet", "type" : "patch", "nFaces" : 20, "frozen" : True }
+    ],
+    "wallFunctions" : { "wallA" : 1, "wallB" : 2, "other" : 3 },
+    "2nd order" : True
+}
+
+
+def keyPaths(text : str, document : Document) -> list:
+    query = compileQuery(text)
+    nodes = query.nodes(document)
+    assert query.count(document) == len(nodes)
+    return [ node.path() for node in nodes ]
+
+
+@pytest.fixture(params=[ "unfetched", "partly fetched", "fetched" ])
+def document(request):
+    # queries read nodes where they are fetched and the parsed data elsewhere
+    document = Document(DATA)
+    if( request.param == "partly fetched" ):
+        document.fetch(document.root, 2)
+        document.fetch(document.root.children[1], 2)
+        document.fetch(document.root.children[1].children[1], 1)
+    elif( request.param == "fetched" ):
+        document.fetchAll()
+    return document
+
+
+def test_keyPaths(document):
+    assert keyPaths("$.solver.tolerance", document) == [ [ "solver", "tolerance" ] ]
+    assert keyPaths("solver.tolerance", document) == [ [ "solver", "tolerance" ] ]
+    assert keyPaths("$.patches[1].name", document) == [ [ "patches", 1, "name" ] ]
+    assert keyPaths("$.patches[-1]", document) == [ [ "patches", 3 ] ]
+    assert keyPaths("$.patches[0,2].type", document) == [ [ "patches", 0, "type" ], [ "patches", 2, "type" ] ]
+    assert keyPaths("$['2nd order']", document) == [ [ "2nd order" ] ]
+    assert keyPaths("$.missing.key", document) == []
+    assert keyPaths("$.patches[7]", document) == []
+
+
+def test_wildcards(document):
+    assert keyPaths("$.solver.*", document) == [ [ "solver", "tolerance" ], [ "solver", "method" ], [ "solver", "maxIter" ] ]
+    assert len(keyPaths("$.patches[*]", document)) == 4
+    assert keyPaths("$.wallFunctions.wall*", document) == [ [ "wallFunctions", "wallA" ], [ "wallFunctions", "wallB" ] ]
+    assert keyPaths("$..tolerance", document) == [ [ "solver", "tolerance" ], [ "patches", 2, "tolerance" ] ]
+    assert keyPaths("$..wall?", document) == [ [ "wallFunctions", "wallA" ], [ "wallFunctions", "wallB" ] ]
+
+
+def test_filters(document):
+    assert keyPaths("$.patches[?(@.type == 'wall' && @.nFaces > 10)].name", document) == [ [ "patches", 2, "name" ] ]
+    assert keyPaths("$.patches[?(@.type != 'wall' || @.nFaces < 10)].name", document) == [
+        [ "patches", 0, "name" ], [ "patches", 1, "name" ], [ "patches", 3, "name" ]
+    ]
+    assert keyPaths("$.patches[?(@.frozen)]", document) == [ [ "patches", 3 ] ]
+    assert keyPaths("$.patches[?(!@.frozen && @.nFaces >= 20)]", document) == [ [ "patches", 0 ], [ "patches", 2 ] ]
+    assert keyPaths("$.patches[?(@.frozen == true)]", document) == [ [ "patches", 3 ] ]
+    assert keyPaths("$..[?(@ =~ '^wall[0-9]')]", document) == [ [ "patches", 1, "name" ], [ "patches", 2, "name" ] ]
+    # json true is not 1
+    assert keyPaths("$.patches[?(@.frozen == 1)]", document) == []
+    # a number is neither smaller nor larger than a string
+    assert keyPaths("$.patches[?(@.name < 5)]", document) == []
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "$",
+    "$.",
+    "$.patches[",
+    "$.patches[0",
+    "$.patches[0,'name']",
+    "$.patches[?(@.type == )]",
+    "$.patches[?(@.type == 'wall']",
+    "$.patches[?(@.name =~ '(')]",
+    "$.patches[?(@.name =~ 5)]",
+    "$.patches[?(1 == 1)]",
+    "$.patches[?('wall')]",
+    "$.solver tolerance",
+    "$.a = b"
+])
+def test_malformedQueriesAreRejected(text):
+    with pytest.raises(QueryError):
+        compileQuery(text)
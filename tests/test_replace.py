@@ -0,0 +1,126 @@
+import pytest
+
+from model import Document
+
+pytest.importorskip("PySide6")
+from replace import (
+    ReplaceChange,
+    Replacement,
+    changeCounts
+)
+from treemodel import JsonTreeModel
+
+DATA = {
+    "wall1" : { "type" : "wall", "nFaces" : 10, "ids" : [ "wall1a", "wall1b" ] },
+    "wall2" : { "type" : "wall", "nFaces" : 110, "ids" : [] },
+    "inlet" : { "type" : "patch", "flag" : "true" }
+}
+
+
+def treeModelOf(data : dict = DATA) -> JsonTreeModel:
+    document = Document(data)
+    document.fetchAll()
+    return JsonTreeModel(document)
+
+
+def everyNode(treeModel : JsonTreeModel) -> list:
+    return list(treeModel.document.iterNodes())
+
+
+def test_applyMatchesLiteralsAndRegexes():
+    assert Replacement("a.b", "x").apply("a.b aXb") == "x aXb"
+    assert Replacement("a.b", "x", isRegex=True).apply("a.b aXb") == "x x"
+    assert Replacement(r"wall(\d+)", r"patch_\1", isRegex=True).apply("wall12 wall3") == "patch_12 patch_3"
+    assert Replacement(r"wall\d", r"\g<0>_old", isRegex=True).apply("wall1") == "wall1_old"
+    # a literal replacement is not a template
+    assert Replacement("wall", r"\1").apply("wall") == r"\1"
+    assert Replacement("WALL", "patch", matchCase=False).apply("Wall") == "patch"
+    assert Replacement("WALL", "patch").apply("Wall") is None
+
+
+@pytest.mark.parametrize("find, replaceWith, isRegex", [ ( "", "x", False ), ( "(", "x", True ) ])
+def test_badPatternsAreRejected(find, replaceWith, isRegex):
+    with pytest.raises(ValueError):
+        Replacement(find, replaceWith, isRegex)
+
+
+def test_badGroupReferencesAreRejected():
+    with pytest.raises(ValueError, match="bad replacement"):
+        Replacement("wall", r"\2", isRegex=True).apply("wall")
+
+
+def test_changesOfKeysAndValues():
+    treeModel = treeModelOf()
+    changes = Replacement("wall", "patch").changes(everyNode(treeModel))
+    assert [ ( change.node.path(), change.field, change.old, change.new ) for change in changes ] == [
+        ( [ "wall1" ], "key", "wall1", "patch1" ),
+        ( [ "wall1", "type" ], "value", "wall", "patch" ),
+        # array items have no key to replace
+        ( [ "wall1", "ids", 0 ], "value", "wall1a", "patch1a" ),
+        ( [ "wall1", "ids", 1 ], "value", "wall1b", "patch1b" ),
+        ( [ "wall2" ], "key", "wall2", "patch2" ),
+        ( [ "wall2", "type" ], "value", "wall", "patch" )
+    ]
+    assert changeCounts(changes) == ( 6, 2, 4 )
+    assert Replacement("wall", "patch", inKeys=False).changes(everyNode(treeModel))[0].field == "value"
+    assert all( change.field == "key" for change in Replacement("wall", "patch", inValues=False).changes(everyNode(treeModel)) )
+
+
+def test_changedValuesKeepTheirType():
+    treeModel = treeModelOf()
+    changes = Replacement("1", "2").changes(everyNode(treeModel))
+    values = { tuple(change.node.path()) : change.new for change in changes if change.field == "value" }
+    # a number stays a number, a string stays a string however it reads
+    assert values[( "wall1", "nFaces" )] == 20
+    assert values[( "wall2", "nFaces" )] == 220
+    assert values[( "wall1", "ids", 0 )] == "wall2a"
+    changes = Replacement("true", "false").changes(everyNode(treeModel))
+    assert [ change.new for change in changes ] == [ "false" ]
+
+
+def test_applyReplaceChanges():
+    treeModel = treeModelOf()
+    changes = Replacement("wall", "patch").changes(everyNode(treeModel))
+    treeModel.applyReplaceChanges(changes)
+    assert treeModel.document.toDict() == {
+        "patch1" : { "type" : "patch", "nFaces" : 10, "ids" : [ "patch1a", "patch1b" ] },
+        "patch2" : { "type" : "patch", "nFaces" : 110, "ids" : [] },
+        "inlet" : { "type" : "patch", "flag" : "true" }
+    }
+    # a number replaced by a list becomes a branch, a string stays a string
+    nFaces = treeModel.nodeAtPath([ "patch2", "nFaces" ])
+    treeModel.applyReplaceChanges(Replacement("^.*$", "[1, 2]", isRegex=True, inKeys=False).changes([ nFaces, treeModel.nodeAtPath([ "inlet", "type" ]) ]))
+    assert treeModel.document.toDict()["inlet"]["type"] == "[1, 2]"
+    assert treeModel.document.toDict()["patch2"]["nFaces"] == [ 1, 2 ]
+    assert [ child.key for child in nFaces.children ] == [ 0, 1 ]
+
+
+def test_renameConflictsAreRejected():
+    treeModel = treeModelOf()
+    before = treeModel.document.toDict()
+    nodes = [ treeModel.nodeAtPath([ "wall1" ]), treeModel.nodeAtPath([ "wall1", "type" ]) ]
+    # a key a sibling left alone has
+    with pytest.raises(ValueError, match="already exists"):
+        treeModel.applyReplaceChanges(Replacement("wall1", "wall2").changes(nodes))
+    # two keys given the same new one
+    changes = Replacement(r"wall\d", "patch", isRegex=True).changes(everyNode(treeModel))
+    with pytest.raises(ValueError, match="already exists"):
+        treeModel.applyReplaceChanges(changes)
+    # nothing changed, not even the values before the failing key
+    assert treeModel.document.toDict() == before
+
+    # keys swapped all at once pass, although one at a time they would not
+    wall1, wall2 = treeModel.nodeAtPath([ "wall1" ]), treeModel.nodeAtPath([ "wall2" ])
+    treeModel.applyReplaceChanges([ ReplaceChange(wall1, "key", "wall1", "wall2"), ReplaceChange(wall2, "key", "wall2", "wall1") ])
+    assert list(treeModel.document.toDict()) == [ "wall2", "wall1", "inlet" ]
+    assert treeModel.document.toDict()["wall1"] == before["wall2"]
+
+
+def test_renameConflictsWithUnfetchedKeys():
+    document = Document({ "a" : { "x1" : 1, "x2" : 2 } })
+    treeModel = JsonTreeModel(document)
+    a = treeModel.nodeAtPath([ "a" ])
+    treeModel.fetchNode(a, 1)
+    with pytest.raises(ValueError, match="already exists"):
+        treeModel.applyReplaceChanges(Replacement("1", "2").changes([ a.children[0] ]))
+    assert document.toDict() == { "a" : { "x1" : 1, "x2" : 2 } }
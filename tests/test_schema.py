@@ -0,0 +1,150 @@
+import pytest
+
+from model import Document
+from schema import (
+    SchemaChecker,
+    SchemaError,
+    compileSchema,
+    validate
+)
+
+SCHEMA = {
+    "type" : "object",
+    "required" : [ "name", "patches" ],
+    "additionalProperties" : False,
+    "properties" : {
+        "name" : { "type" : "string", "minLength" : 1 },
+        "version" : { "enum" : [ 1, 2 ] },
+        "patches" : {
+            "type" : "array",
+            "items" : { "$ref" : "#/$defs/patch" },
+            "uniqueItems" : True
+        },
+        "solver" : {
+            "type" : "object",
+            "properties" : { "tolerance" : { "type" : "number", "exclusiveMinimum" : 0, "maximum" : 1 } },
+            "dependentRequired" : { "tolerance" : [ "method" ] }
+        }
+    },
+    "$defs" : {
+        "patch" : {
+            "type" : "object",
+            "required" : [ "type" ],
+            "properties" : {
+                "type" : { "enum" : [ "wall", "patch" ] },
+                "nFaces" : { "type" : "integer", "minimum" : 1 }
+            },
+            "if" : { "properties" : { "type" : { "const" : "wall" } } },
+            "then" : { "required" : [ "nFaces" ] }
+        }
+    }
+}
+VALID = {
+    "name" : "case",
+    "version" : 2,
+    "patches" : [ { "type" : "wall", "nFaces" : 10 }, { "type" : "patch" } ],
+    "solver" : { "tolerance" : 1e-06, "method" : "cg" }
+}
+
+
+def errors(schema, data) -> list:
+    return list(validate([ compileSchema(schema) ], data, []))
+
+
+def test_validInstancesHaveNoErrors():
+    assert errors(SCHEMA, VALID) == []
+    # an integer may be written as a float
+    assert errors(SCHEMA, dict(VALID, patches=[ { "type" : "wall", "nFaces" : 3.0 } ])) == []
+    assert errors(True, VALID) == []
+
+
+def test_invalidInstances():
+    invalid = {
+        "name" : "",
+        "version" : 3,
+        "patches" : [ { "type" : "wall" }, { "type" : "inlet", "nFaces" : 0 }, { "type" : "wall" } ],
+        "solver" : { "tolerance" : 0 },
+        "extra" : 1
+    }
+    assert errors(SCHEMA, invalid) == [
+        ( [], "should not have the keys [\"extra\"]" ),
+        ( [ "name" ], "should have at least 1 characters" ),
+        ( [ "version" ], "should be one of [1, 2]" ),
+        ( [ "patches" ], "items should be unique" ),
+        ( [ "patches", 0 ], "is missing the key \"nFaces\"" ),
+        ( [ "patches", 1, "type" ], "should be one of [\"wall\", \"patch\"]" ),
+        ( [ "patches", 1, "nFaces" ], "should be at least 1" ),
+        ( [ "patches", 2 ], "is missing the key \"nFaces\"" ),
+        ( [ "solver" ], "has \"tolerance\" but is missing \"method\"" ),
+        ( [ "solver", "tolerance" ], "should be more than 0" )
+    ]
+    assert errors(SCHEMA, { "name" : 1 }) == [ ( [], "is missing the key \"patches\"" ), ( [ "name" ], "should be string" ) ]
+    # json true is not 1
+    assert errors(SCHEMA["properties"]["version"], True) == [ ( [], "should be one of [1, 2]" ) ]
+    assert errors(False, 1) == [ ( [], "no value is allowed here" ) ]
+
+
+def test_combinations():
+    schema = { "oneOf" : [ { "type" : "integer" }, { "minimum" : 5 } ], "not" : { "const" : 7 } }
+    assert errors(schema, 3) == []
+    assert errors(schema, 5.5) == []
+    assert errors(schema, 6) == [ ( [], "matches more than one of the allowed schemas" ) ]
+    assert errors(schema, 7) == [ ( [], "matches more than one of the allowed schemas" ), ( [], "matches a schema it should not" ) ]
+    assert errors({ "anyOf" : [ { "type" : "string" }, { "type" : "null" } ] }, 1) == [ ( [], "matches none of the allowed schemas" ) ]
+
+
+@pytest.mark.parametrize("schema", [
+    { "type" : "text" },
+    { "$ref" : "other.json#/a" },
+    { "$ref" : "#/missing" },
+    { "multipleOf" : 0 },
+    { "pattern" : "(" },
+    { "properties" : { "a" : 1 } },
+    [ "type" ]
+])
+def test_badSchemasAreRejected(schema):
+    with pytest.raises(SchemaError):
+        compileSchema(schema)
+
+
+def checked(data : dict) -> tuple:
+    document = Document(data)
+    checker = SchemaChecker(compileSchema(SCHEMA))
+    document.addListener(checker.applyEdit)
+    checker.build(document.toDict())
+    checker.finishBuild()
+    return document, checker
+
+
+def assertSameErrors(document : Document, checker : SchemaChecker) -> None:
+    # the errors kept up to date edit by edit are those of a full validation
+    expected = errors(SCHEMA, document.toDict())
+    assert checker.errorCount() == len(expected)
+    for path,message in expected:
+        assert message in checker.messages(path)
+
+
+def test_checkerFollowsEdits():
+    document, checker = checked(VALID)
+    assert checker.errorCount() == 0
+    assert checker.firstError() is None
+    document.fetchAll()
+    patches = document.nodeAtPath([ "patches" ])
+
+    document.removeNode(patches.children[0].children[1])
+    assert checker.messages([ "patches", 0 ]) == [ "is missing the key \"nFaces\"" ]
+    assert checker.countBelow([ "patches" ]) == 1
+    assert checker.firstError() == ( [ "patches", 0 ], "is missing the key \"nFaces\"" )
+    document.insertNode(patches, 0, 0, { "type" : "inlet" })
+    assert checker.messages([ "patches", 1 ]) == [ "is missing the key \"nFaces\"" ]
+    assertSameErrors(document, checker)
+    document.setValue(document.nodeAtPath([ "patches", 1, "type" ]), "patch")
+    document.setKey(document.nodeAtPath([ "name" ]), "title")
+    document.insertPairs(document.nodeAtPath([ "solver" ]), [ ( "tolerance2", 1 ) ])
+    assertSameErrors(document, checker)
+    document.removeNode(patches.children[0])
+    document.setKey(document.nodeAtPath([ "title" ]), "name")
+    document.setValue(document.nodeAtPath([ "solver", "tolerance" ]), 2)
+    assertSameErrors(document, checker)
+    document.setValue(document.root, VALID)
+    assert checker.errorCount() == 0
@@ -0,0 +1,97 @@
+from model import Document
+from search import SearchIndex
+
+DATA = {
+    "solver" : { "tolerance" : 1e-06, "method" : "conjugate gradient" },
+    "mesh" : { "cells" : [ "hex block", "tet block", "prism block" ], "refine" : 2 },
+    "output" : "results folder"
+}
+
+
+def indexed(data : dict) -> tuple:
+    document = Document(data)
+    index = SearchIndex()
+    index.build(data)
+    index.finishBuild()
+    document.addListener(index.applyEdit)
+    document.fetchAll()
+    return document, index
+
+
+def test_searchFindsKeysValuesAndKeyPaths():
+    document, index = indexed(DATA)
+    assert index.search("tolerance") == [ [ "solver", "tolerance" ] ]
+    # words are prefixes, every one of them has to match
+    assert index.search("conj grad") == [ [ "solver", "method" ] ]
+    assert index.search("block") == [ [ "mesh", "cells", 0 ], [ "mesh", "cells", 1 ], [ "mesh", "cells", 2 ] ]
+    assert index.search("tet hex") == []
+    assert index.search("solver.tol") == [ [ "solver", "tolerance" ] ]
+    assert index.search("cells.1") == [ [ "mesh", "cells", 1 ] ]
+    assert index.search("block", limit=2) == [ [ "mesh", "cells", 0 ], [ "mesh", "cells", 1 ] ]
+    assert index.search("  ") == []
+
+
+def test_searchWaitsForTheBuildAndAppliesQueuedEdits():
+    document = Document(DATA)
+    index = SearchIndex()
+    document.addListener(index.applyEdit)
+    document.fetchAll()
+    index.build(document.toDict())
+    document.setKey(document.nodeAtPath([ "output" ]), "results")
+    assert index.search("results") == []
+    index.finishBuild()
+    assert index.search("results") == [ [ "results" ] ]
+
+
+def test_searchAfterArrayInsertAndRemove():
+    document, index = indexed({ "cells" : [ "hex block", "tet block", "prism block" ] })
+    cells = document.nodeAtPath([ "cells" ])
+    document.insertNode(cells, 0, 0, "wedge block")
+    assert index.search("prism") == [ [ "cells", 3 ] ]
+    assert index.search("wedge") == [ [ "cells", 0 ] ]
+    document.removeNode(cells.children[1])
+    assert index.search("hex") == []
+    # in build order, an item inserted since comes after the others
+    assert index.search("block") == [ [ "cells", 1 ], [ "cells", 2 ], [ "cells", 0 ] ]
+    assert index.search("prism") == [ [ "cells", 2 ] ]
+    document.insertPairs(cells, [ ( None, { "name" : "pyramid" } ) ])
+    assert index.search("pyramid") == [ [ "cells", 3, "name" ] ]
+    document.removeNode(cells.children[0])
+    assert index.search("pyramid") == [ [ "cells", 2, "name" ] ]
+    assert index.search("cells.2.name") == [ [ "cells", 2, "name" ] ]
+
+
+def test_searchAfterRemovingABranch():
+    document, index = indexed(DATA)
+    document.removeNode(document.nodeAtPath([ "mesh" ]))
+    assert index.search("block") == []
+    assert index.search("mesh") == []
+    assert index.search("results") == [ [ "output" ] ]
+
+
+def test_searchAfterValueEdits():
+    document, index = indexed(DATA)
+    document.setValue(document.nodeAtPath([ "output" ]), "archive")
+    assert index.search("results") == []
+    assert index.search("archive") == [ [ "output" ] ]
+    # a branch replaced by a leaf loses its subtree, and the other way round
+    mesh = document.nodeAtPath([ "mesh" ])
+    document.setValue(mesh, "none")
+    assert index.search("block") == []
+    assert index.search("none") == [ [ "mesh" ] ]
+    document.setValue(mesh, [ "hex block", { "refine" : 3 } ])
+    assert index.search("block") == [ [ "mesh", 0 ] ]
+    assert index.search("mesh.1.refine") == [ [ "mesh", 1, "refine" ] ]
+
+
+def test_searchAfterKeyEdits():
+    document, index = indexed(DATA)
+    document.setKey(document.nodeAtPath([ "solver" ]), "linear solver")
+    assert index.search("solver.tolerance") == []
+    assert index.search("linear") == [ [ "linear solver" ] ]
+    # the paths below a renamed branch follow it
+    assert index.search("tolerance") == [ [ "linear solver", "tolerance" ] ]
+    document.setKey(document.nodeAtPath([ "linear solver", "tolerance" ]), "atol")
+    assert index.search("tolerance") == []
+    assert index.search("atol") == [ [ "linear solver", "atol" ] ]
+    assert index.search("1e") == [ [ "linear solver", "atol" ] ]
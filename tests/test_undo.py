@@ -0,0 +1,109 @@
+import pytest
+
+from model import (
+    Document,
+    UndoStack
+)
+
+pytest.importorskip("PySide6")
+from treemodel import JsonTreeModel
+
+DATA = { "a" : { "b" : [ 0, 1, 2, 3, 4 ], "c" : "text" }, "d" : 1.5, "e" : [ { "f" : None } ] }
+
+
+def undoable(data : dict = DATA) -> tuple:
+    document = Document(data)
+    undoStack = UndoStack()
+    document.addListener(undoStack.applyEdit)
+    return JsonTreeModel(document), undoStack
+
+
+def assertRows(node) -> None:
+    # rows, and array indexes, left as a fresh fetch would give them
+    for row,child in enumerate(node.children or []):
+        assert child.row == row and child.parent is node
+        if( node.isArray ):
+            assert child.key == row
+        assertRows(child)
+
+
+def assertUndoRedo(treeModel : JsonTreeModel, undoStack : UndoStack, before : dict, edited : dict) -> None:
+    assert treeModel.document.toDict() == edited
+    assert undoStack.undo(treeModel) > 0
+    assert treeModel.document.toDict() == before
+    assertRows(treeModel.rootNode)
+    assert undoStack.redo(treeModel) > 0
+    assert treeModel.document.toDict() == edited
+    assertRows(treeModel.rootNode)
+
+
+def test_undoRemove():
+    treeModel, undoStack = undoable()
+    before = treeModel.document.toDict()
+    b = treeModel.nodeAtPath([ "a", "b" ])
+    treeModel.fetchNode(b)
+    with undoStack.step():
+        treeModel.removeNodes([ b.children[1], b.children[3], treeModel.nodeAtPath([ "d" ]) ])
+    assert undoStack.canUndo()
+    assertUndoRedo(treeModel, undoStack, before, { "a" : { "b" : [ 0, 2, 4 ], "c" : "text" }, "e" : [ { "f" : None } ] })
+
+
+def test_undoInsert():
+    treeModel, undoStack = undoable()
+    before = treeModel.document.toDict()
+    with undoStack.step():
+        treeModel.insertPairs(treeModel.nodeAtPath([ "e" ]), [ ( None, { "g" : [ 1 ] } ), ( None, 2 ) ])
+        # a leaf becomes a branch, undone back to its value
+        treeModel.insertPairs(treeModel.nodeAtPath([ "d" ]), [ ( "h", True ) ])
+    edited = { "a" : DATA["a"], "d" : { "h" : True }, "e" : [ { "f" : None }, { "g" : [ 1 ] }, 2 ] }
+    assertUndoRedo(treeModel, undoStack, before, edited)
+
+
+def test_undoKeyAndValueEdits():
+    treeModel, undoStack = undoable()
+    before = treeModel.document.toDict()
+    treeModel.setNodeKey(treeModel.nodeAtPath([ "a" ]), "renamed")
+    treeModel.setNodeValue(treeModel.nodeAtPath([ "renamed", "c" ]), 7)
+    # a branch given a leaf value, its children come back with the undo
+    treeModel.setNodeValue(treeModel.nodeAtPath([ "renamed", "b" ]), "none")
+    # edits outside a step are steps of their own
+    assert len(undoStack.undoSteps) == 3
+    edited = { "renamed" : { "b" : "none", "c" : 7 }, "d" : 1.5, "e" : [ { "f" : None } ] }
+    assert treeModel.document.toDict() == edited
+    assert undoStack.undo(treeModel) == 1
+    assert treeModel.document.toDict()["renamed"] == { "b" : [ 0, 1, 2, 3, 4 ], "c" : 7 }
+    assert undoStack.undo(treeModel) == 1
+    assertUndoRedo(treeModel, undoStack, before, { "renamed" : DATA["a"], "d" : 1.5, "e" : DATA["e"] })
+
+
+def test_undoAfterANewEditDropsTheRedo():
+    treeModel, undoStack = undoable()
+    treeModel.setNodeValue(treeModel.nodeAtPath([ "d" ]), 2)
+    undoStack.undo(treeModel)
+    assert undoStack.canRedo()
+    treeModel.setNodeValue(treeModel.nodeAtPath([ "d" ]), 3)
+    assert not undoStack.canRedo()
+    assert undoStack.redo(treeModel) == 0
+
+
+def test_duplicateSiblingKeysAreRejected():
+    treeModel, undoStack = undoable()
+    before = treeModel.document.toDict()
+    with pytest.raises(ValueError, match="already exists"):
+        treeModel.setNodeKey(treeModel.nodeAtPath([ "a" ]), "d")
+    with pytest.raises(ValueError, match="already exists"):
+        with undoStack.step():
+            treeModel.insertPairs(treeModel.rootNode, [ ( "x", 1 ), ( "e", 2 ) ])
+    with pytest.raises(ValueError, match="already exists"):
+        treeModel.insertPairs(treeModel.nodeAtPath([ "a" ]), [ ( "y", 1 ), ( "y", 2 ) ])
+    assert treeModel.document.toDict() == before
+    assert not undoStack.canUndo()
+
+    # swapping two keys one at a time goes through a free key, undone in turn
+    treeModel.setNodeKey(treeModel.nodeAtPath([ "a" ]), "tmp")
+    treeModel.setNodeKey(treeModel.nodeAtPath([ "d" ]), "a")
+    treeModel.setNodeKey(treeModel.nodeAtPath([ "tmp" ]), "d")
+    assert treeModel.document.toDict() == { "d" : DATA["a"], "a" : 1.5, "e" : DATA["e"] }
+    while( undoStack.canUndo() ):
+        undoStack.undo(treeModel)
+    assert treeModel.document.toDict() == before
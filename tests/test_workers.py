@@ -0,0 +1,36 @@
+import json
+import multiprocessing
+
+import pytest
+
+pytest.importorskip("PySide6")
+import workers
+
+
+def loadMessages(filePath : str) -> list:
+    # the loader process's messages, with _loadInProcess run in this one
+    recvConn, sendConn = multiprocessing.Pipe(duplex=False)
+    workers._loadInProcess(filePath, sendConn, None)
+    messages = []
+    while( recvConn.poll() ):
+        try:
+            messages.append(recvConn.recv())
+        except EOFError:
+            break
+    return messages
+
+
+def test_loaderReportsAnyError(tmp_path, monkeypatch):
+    path = tmp_path / "case.json"
+    path.write_text(json.dumps({ "a" : 1 }))
+    def packPayload(data):
+        raise RecursionError("maximum recursion depth exceeded")
+    monkeypatch.setattr(workers, "packPayload", packPayload)
+    messages = loadMessages(str(path))
+    assert messages[-1] == ( "failed", "RecursionError: maximum recursion depth exceeded" )
+
+
+def test_loaderReportsAMissingFile(tmp_path):
+    messages = loadMessages(str(tmp_path / "missing.json"))
+    assert messages[-1][0] == "failed"
+    assert messages[-1][1].startswith("FileNotFoundError: ")
@@ -0,0 +1,501 @@
+from PySide6.QtCore import (
+    Qt,
+    QAbstractItemModel,
+    QModelIndex,
+    Signal
+)
+
+from PySide6.QtGui import QColor
+
+from PySide6.QtWidgets import (
+    QTreeView,
+    QStyledItemDelegate,
+    QWidget,
+    QHBoxLayout,
+    QComboBox,
+    QLineEdit,
+    QToolTip
+)
+
+from model import (
+    Document,
+    Node
+)
+import parser
+
+KEY_COLUMN = 0
+VALUE_COLUMN = 1
+
+# number of children materialized by one fetchMore() call
+FETCH_BATCH_SIZE = 256
+
+# flags() is called for every row during layout, keep it free of enum math
+KEY_FLAGS = Qt.ItemIsEnabled | Qt.ItemIsUserCheckable | Qt.ItemIsEditable
+# the key of an array item is its index
+ARRAY_ITEM_KEY_FLAGS = Qt.ItemIsEnabled | Qt.ItemIsUserCheckable
+LEAF_VALUE_FLAGS = Qt.ItemIsEnabled | Qt.ItemIsEditable
+BRANCH_VALUE_FLAGS = Qt.ItemIsEnabled
+# text of rows failing the schema, and of branches with such rows below
+ERROR_COLOR = QColor(200, 0, 0)
+ERROR_BELOW_COLOR = QColor(200, 110, 0)
+
+
+class JsonTreeModel(QAbstractItemModel):
+    '''
+    Item model over a Document. It holds no data of its own, it only turns
+    document nodes into rows and wraps document edits in the model signals.
+    '''
+    # emitted when a cell is edited in place
+    edited = Signal()
+    # message of an edit of the view rejected by the document, e.g. a key
+    # its siblings already have
+    editFailed = Signal(str)
+
+    def __init__(self, document : Document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.rootNode = document.root
+        # while filtering : shown children of every shown branch and the row
+        # of every shown node, see setFilter
+        self.filterChildren = None
+        self.filterRows = None
+        # schema.SchemaChecker of the tab, None without a schema
+        self.schemaChecker = None
+
+    # QAbstractItemModel interface
+
+    def index(self, row : int, column : int, parent : QModelIndex = QModelIndex()) -> QModelIndex:
+        parentNode = self.nodeFromIndex(parent)
+        if( self.filterChildren is not None ):
+            children = self.filterChildren.get(parentNode, ())
+            if( row < 0 or row >= len(children) ):
+                return QModelIndex()
+            return self.createIndex(row, column, children[row])
+        if( row < 0 or row >= parentNode.childCount() ):
+            return QModelIndex()
+        return self.createIndex(row, column, parentNode.children[row])
+
+    def parent(self, index : QModelIndex) -> QModelIndex:
+        if( not index.isValid() ):
+            return QModelIndex()
+        parentNode = index.internalPointer().parent
+        if( parentNode is None or parentNode is self.rootNode ):
+            return QModelIndex()
+        if( self.filterRows is not None ):
+            return self.createIndex(self.filterRows[parentNode], 0, parentNode)
+        return self.createIndex(parentNode.row, 0, parentNode)
+
+    def rowCount(self, parent : QModelIndex = QModelIndex()) -> int:
+        if( parent.column() > 0 ):
+            return 0
+        if( self.filterChildren is not None ):
+            return len(self.filterChildren.get(self.nodeFromIndex(parent), ()))
+        return self.nodeFromIndex(parent).childCount()
+
+    def columnCount(self, parent : QModelIndex = QModelIndex()) -> int:
+        return 2
+
+    def hasChildren(self, parent : QModelIndex = QModelIndex()) -> bool:
+        if( parent.column() > 0 ):
+            return False
+        if( self.filterChildren is not None ):
+            return ( self.nodeFromIndex(parent) in self.filterChildren )
+        return self.nodeFromIndex(parent).hasChildren()
+
+    def canFetchMore(self, parent : QModelIndex) -> bool:
+        if( parent.column() > 0 or self.filterChildren is not None ):
+            return False
+        return ( self.nodeFromIndex(parent).pendingCount() != 0 )
+
+    def fetchMore(self, parent : QModelIndex) -> None:
+        if( parent.column() > 0 ):
+            return
+        self.fetchNode(self.nodeFromIndex(parent), FETCH_BATCH_SIZE)
+
+    def flags(self, index : QModelIndex):
+        if( not index.isValid() ):
+            return Qt.NoItemFlags
+        node = index.internalPointer()
+        if( index.column() == KEY_COLUMN ):
+            return ARRAY_ITEM_KEY_FLAGS if node.parent.isArray else KEY_FLAGS
+        if( node.isBranch() ):
+            return BRANCH_VALUE_FLAGS
+        return LEAF_VALUE_FLAGS
+
+    def data(self, index : QModelIndex, role : int = Qt.DisplayRole):
+        if( not index.isValid() ):
+            return None
+        node = index.internalPointer()
+        column = index.column()
+
+        if( role == Qt.DisplayRole ):
+            if( column == KEY_COLUMN ):
+                return node.key
+            if( not node.isBranch() ):
+                return parser.toText(node.value)
+            if( node.isArray ):
+                return f"[{node.childCount() + node.pendingCount()}]"
+            return None
+
+        if( role == Qt.EditRole ):
+            if( column == KEY_COLUMN ):
+                return node.key
+            return node.value
+
+        if( role == Qt.CheckStateRole and column == KEY_COLUMN ):
+            return Qt.Checked if node.checked else Qt.Unchecked
+
+        if( role in ( Qt.ForegroundRole, Qt.ToolTipRole ) and self.schemaChecker is not None and self.schemaChecker.errorCount() > 0 ):
+            return self._schemaData(node, role)
+
+        return None
+
+    def _schemaData(self, node : Node, role : int):
+        path = node.path()
+        messages = self.schemaChecker.messages(path)
+        below = self.schemaChecker.countBelow(path) if node.isBranch() else 0
+        if( role == Qt.ForegroundRole ):
+            if( messages ):
+                return ERROR_COLOR
+            return ERROR_BELOW_COLOR if below > 0 else None
+        lines = list(messages)
+        if( below > 0 ):
+            lines.append(f"{below} schema errors below")
+        return "\n".join(lines) if lines else None
+
+    def setData(self, index : QModelIndex, value, role : int = Qt.EditRole) -> bool:
+        if( not index.isValid() ):
+            return False
+        if( role == Qt.CheckStateRole and index.column() == KEY_COLUMN ):
+            self.document.setChecked(index.internalPointer(), Qt.CheckState(value) == Qt.Checked)
+            self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+            return True
+        if( role == Qt.EditRole ):
+            node = index.internalPointer()
+            if( index.column() == KEY_COLUMN ):
+                try:
+                    self.setNodeKey(node, value)
+                except ValueError as e:
+                    self.editFailed.emit(str(e))
+                    return False
+            else:
+                self.setNodeValue(node, value)
+            self.edited.emit()
+            return True
+        return False
+
+    def headerData(self, section : int, orientation, role : int = Qt.DisplayRole):
+        if( orientation == Qt.Horizontal and role == Qt.DisplayRole ):
+            return ""
+        return None
+
+    # helpers used by the UI
+
+    def nodeFromIndex(self, index : QModelIndex) -> Node:
+        if( index.isValid() ):
+            return index.internalPointer()
+        return self.rootNode
+
+    def indexFromNode(self, node : Node, column : int = 0) -> QModelIndex:
+        if( node is self.rootNode ):
+            return QModelIndex()
+        if( self.filterRows is not None ):
+            row = self.filterRows.get(node)
+            if( row is None ):
+                return QModelIndex()
+            return self.createIndex(row, column, node)
+        return self.createIndex(node.row, column, node)
+
+    def fetchNode(self, node : Node, count : int = None) -> None:
+        '''
+        Fetch pending children of node, all of them if count is None.
+        '''
+        remaining = node.pendingCount()
+        if( remaining == 0 ):
+            return
+        if( count is None or count > remaining ):
+            count = remaining
+        if( self.filterChildren is not None ):
+            # new rows are not part of the filter, nothing to show
+            self.document.fetch(node, count)
+            return
+        first = node.childCount()
+        self.beginInsertRows(self.indexFromNode(node), first, first + count - 1)
+        self.document.fetch(node, count)
+        self.endInsertRows()
+
+    def fetchAll(self, node : Node = None) -> None:
+        '''
+        Fetch the whole subtree under node (whole document by default).
+        '''
+        stack = [ node or self.rootNode ]
+        while( stack ):
+            curr = stack.pop()
+            self.fetchNode(curr)
+            if( curr.children is not None ):
+                stack.extend(curr.children)
+
+    def setChecked(self, node : Node, checked : bool) -> None:
+        self.document.setChecked(node, checked)
+        index = self.indexFromNode(node)
+        if( index.isValid() ):
+            self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+
+    def setAllChecked(self, checked : bool) -> None:
+        '''
+        Flip the check state of the whole document as one layout change
+        instead of a signal per row. Rows are only ever appended by the
+        fetch, so existing indexes stay valid.
+        '''
+        self.layoutAboutToBeChanged.emit()
+        self.document.setAllChecked(checked)
+        self.layoutChanged.emit()
+
+    def setCheckedNodes(self, nodes : list) -> None:
+        '''
+        Check exactly the given nodes as one layout change, see setAllChecked.
+        '''
+        self.layoutAboutToBeChanged.emit()
+        self.document.setCheckedNodes(nodes)
+        self.layoutChanged.emit()
+
+    def fetchAllAtOnce(self, node : Node = None) -> None:
+        '''
+        fetchAll as one layout change, for callers about to show every row.
+        '''
+        self.layoutAboutToBeChanged.emit()
+        self.document.fetchAll(node)
+        self.layoutChanged.emit()
+
+    def removeNode(self, node : Node, renumber : bool = True) -> None:
+        row = node.row
+        self.beginRemoveRows(self.indexFromNode(node.parent), row, row)
+        self.document.removeNode(node, renumber)
+        self.endRemoveRows()
+
+    def removeNodes(self, nodes : list) -> None:
+        '''
+        Remove nodes, none of them below another. The siblings are removed
+        from the last row up and their parent renumbered once, see
+        Document.renumber.
+        '''
+        byParent = {}
+        for node in nodes:
+            byParent.setdefault(node.parent, []).append(node)
+        for parent,siblings in byParent.items():
+            siblings.sort(key=lambda node: node.row, reverse=True)
+            for node in siblings:
+                self.removeNode(node, False)
+            self.document.renumber(parent, siblings[-1].row)
+
+    def insertPairs(self, parentNode : Node, pairs : list) -> None:
+        '''
+        Append (key,value) pairs as children of parentNode.
+        '''
+        if( len(pairs) == 0 ):
+            return
+        # pending entries go first, fetch them with their own signals
+        self.fetchNode(parentNode)
+        first = parentNode.childCount()
+        self.beginInsertRows(self.indexFromNode(parentNode), first, first + len(pairs) - 1)
+        self.document.insertPairs(parentNode, pairs)
+        self.endInsertRows()
+        if( parentNode is not self.rootNode ):
+            valueIndex = self.indexFromNode(parentNode, VALUE_COLUMN)
+            self.dataChanged.emit(valueIndex, valueIndex, [Qt.DisplayRole])
+
+    def insertNode(self, parentNode : Node, row : int, key : str, value, renumber : bool = True) -> Node:
+        '''
+        Insert one (key,value) pair as the child of parentNode at row, see
+        Document.insertNode.
+        '''
+        missing = row - parentNode.childCount()
+        if( missing > 0 ):
+            self.fetchNode(parentNode, missing)
+        self.beginInsertRows(self.indexFromNode(parentNode), row, row)
+        node = self.document.insertNode(parentNode, row, key, value, renumber)
+        self.endInsertRows()
+        return node
+
+    def setNodeKey(self, node : Node, key : str, check : bool = True) -> None:
+        self.document.setKey(node, key, check)
+        index = self.indexFromNode(node, KEY_COLUMN)
+        if( index.isValid() ):
+            self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+    def setNodeValue(self, node : Node, value) -> None:
+        count = node.childCount()
+        if( count > 0 ):
+            # the children of a branch go with its old value
+            self.beginRemoveRows(self.indexFromNode(node), 0, count - 1)
+            self.document.setValue(node, value)
+            self.endRemoveRows()
+        else:
+            self.document.setValue(node, value)
+        if( node.isBranch() ):
+            # a value that became a branch, its first rows make the view see it
+            self.fetchNode(node, FETCH_BATCH_SIZE)
+        index = self.indexFromNode(node, VALUE_COLUMN)
+        if( index.isValid() ):
+            self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+    def applyReplaceChanges(self, changes : list) -> None:
+        '''
+        Apply replace.ReplaceChanges as one layout change instead of a
+        dataChanged per row. A value that became a branch adds rows, it goes
+        through setNodeValue after. Raises ValueError, changing nothing, for
+        a new key a sibling has.
+        '''
+        # a key a sibling has fails before anything changed, so renames that
+        # swap keys pass although one at a time they would not
+        self.document.checkRenames({ change.node : change.new for change in changes if change.field == "key" })
+        grown = []
+        self.layoutAboutToBeChanged.emit()
+        for change in changes:
+            if( change.field == "key" ):
+                self.document.setKey(change.node, change.new, False)
+            elif( type(change.new) in ( dict, list ) ):
+                grown.append(change)
+            else:
+                self.document.setValue(change.node, change.new)
+        self.layoutChanged.emit()
+        for change in grown:
+            self.setNodeValue(change.node, change.new)
+
+    def nodeAtPath(self, path : list) -> Node:
+        '''
+        Node at a key path, see Document.nodeAtPath. Fetched rows are
+        inserted with the model signals.
+        '''
+        return self.document.nodeAtPath(path, self.fetchNode)
+
+    def isFiltering(self) -> bool:
+        return ( self.filterChildren is not None )
+
+    def setFilter(self, nodes : list) -> None:
+        '''
+        Show only nodes and their ancestors, in document order, or every node
+        again if nodes is None. Rows may not be inserted or removed while
+        filtering, the caller clears the filter first.
+        '''
+        self.beginResetModel()
+        if( nodes is None ):
+            self.filterChildren = None
+            self.filterRows = None
+        else:
+            shown = set()
+            for node in nodes:
+                while( node.parent is not None and node not in shown ):
+                    shown.add(node)
+                    node = node.parent
+            filterChildren = {}
+            for node in shown:
+                filterChildren.setdefault(node.parent, []).append(node)
+            filterRows = {}
+            for children in filterChildren.values():
+                children.sort(key=lambda child: child.row)
+                for row,child in enumerate(children):
+                    filterRows[child] = row
+            self.filterChildren = filterChildren
+            self.filterRows = filterRows
+        self.endResetModel()
+
+
+class ValueEditor(QWidget):
+    '''
+    Editor of one json value: a type selector next to the value text, so
+    text is converted to the chosen type instead of guessing it.
+    '''
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.typeBox = QComboBox()
+        self.typeBox.addItems(parser.TYPE_NAMES)
+        self.textEdit = QLineEdit()
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0,0,0,0)
+        layout.setSpacing(2)
+        layout.addWidget(self.typeBox)
+        layout.addWidget(self.textEdit, 1)
+        self.setFocusProxy(self.textEdit)
+        self.typeBox.currentTextChanged.connect(self._typeChanged)
+        self.setValue("")
+
+    def _typeChanged(self, valType : str) -> None:
+        self.textEdit.setEnabled(valType != parser.TYPE_NULL)
+
+    def setValue(self, value) -> None:
+        self.typeBox.setCurrentText(parser.typeName(value))
+        self.textEdit.setText(parser.toText(value))
+        self._typeChanged(self.typeBox.currentText())
+
+    def setValueType(self, valType : str) -> None:
+        self.typeBox.setCurrentText(valType)
+
+    def text(self) -> str:
+        return self.textEdit.text()
+
+    def value(self):
+        '''
+        Raises ValueError if the text is not a value of the selected type.
+        '''
+        return parser.fromText(self.textEdit.text(), self.typeBox.currentText())
+
+
+class ValueDelegate(QStyledItemDelegate):
+    '''
+    Paints cells from model data and edits leaf values with a ValueEditor.
+    '''
+    def createEditor(self, parent : QWidget, option, index : QModelIndex) -> QWidget:
+        if( index.column() == VALUE_COLUMN ):
+            editor = ValueEditor(parent)
+            editor.setAutoFillBackground(True)
+            return editor
+        return super().createEditor(parent, option, index)
+
+    def setEditorData(self, editor : QWidget, index : QModelIndex) -> None:
+        node = index.model().nodeFromIndex(index)
+        if( isinstance(editor, ValueEditor) ):
+            # read the node directly, a QVariant round trip may change the type
+            editor.setValue(node.value)
+            return
+        editor.setText(str(node.key))
+
+    def setModelData(self, editor : QWidget, model : JsonTreeModel, index : QModelIndex) -> None:
+        node = model.nodeFromIndex(index)
+        if( isinstance(editor, ValueEditor) ):
+            try:
+                value = editor.value()
+            except ValueError as e:
+                QToolTip.showText(editor.mapToGlobal(editor.rect().bottomLeft()), str(e))
+                return
+            # leave the document alone if nothing changed
+            if( type(value) is not type(node.value) or value != node.value ):
+                model.setData(index, value, Qt.EditRole)
+            return
+        if( editor.text() != node.key ):
+            model.setData(index, editor.text(), Qt.EditRole)
+
+
+class JsonTreeView(QTreeView):
+    def __init__(self, model : JsonTreeModel, parent=None):
+        super().__init__(parent)
+        # the view owns its model so it lives exactly as long as the tab
+        model.setParent(self)
+        self.setModel(model)
+        # check boxes and text are painted by the delegate from model data
+        self.setItemDelegate(ValueDelegate(self))
+        self.setUniformRowHeights(True)
+        # timer driving a chunked job on this tree, see UI.startTreeJob
+        self.treeJob = None
+        # key paths found by the last search and the one shown last
+        self.searchResults = []
+        self.searchPos = -1
+        # keep the expand state in the document so it outlives the view
+        self.expanded.connect(self._nodeExpanded)
+        self.collapsed.connect(self._nodeCollapsed)
+
+    def _nodeExpanded(self, index : QModelIndex) -> None:
+        index.internalPointer().expanded = True
+
+    def _nodeCollapsed(self, index : QModelIndex) -> None:
+        index.internalPointer().expanded = False
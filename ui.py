@@ -1,12 +1,7 @@
-
 from PySide6.QtWidgets import (
     QMainWindow,
     QTabWidget,
     QMenu,
-    QTreeWidget,
-    QTreeWidgetItem,
-    QTreeWidgetItemIterator,
-    QCheckBox,
     QDialog,
     QDialogButtonBox,
     QVBoxLayout,
@@ -15,9 +10,16 @@ from PySide6.QtWidgets import (
     QPushButton,
     QMessageBox,
     QFontDialog,
-    QWidget,
-    QHBoxLayout,
-    QLabel
+    QInputDialog,
+    QProgressBar,
+    QLabel,
+    QFileDialog
+)
+
+from PySide6.QtCore import (
+    Qt,
+    QTimer,
+    Signal
 )
 
 from PySide6.QtGui import (
@@ -26,10 +28,55 @@ from PySide6.QtGui import (
     QKeySequence
 )
 
-import parser
+from model import Document
+from patch import patchNode
+from profiler import profiler
+from table import (
+    ArrayTableDialog,
+    isTable
+)
+from replace import (
+    ReplaceDialog,
+    changeCounts
+)
+from query import (
+    QueryError,
+    compileQuery
+)
+from treemodel import (
+    JsonTreeModel,
+    JsonTreeView,
+    ValueEditor,
+    FETCH_BATCH_SIZE,
+    VALUE_COLUMN
+)
+
+# GLOBALS
+DEFAULT_EXPAND_DEPTH = 1
+EXPAND_ALL_WARN_LIMIT = 100000
+POPULATE_CHUNK_SIZE = 32
+SAVING_SUFFIX = " (saving…)"
+# tab of a file changed on disk while it had unsaved changes
+CONFLICT_SUFFIX = " (changed on disk)"
+# ms of typing pause before the search runs
+SEARCH_DELAY = 150
+# expanded rows remembered per file, see viewState
+MAX_VIEW_STATE_PATHS = 2000
+# more selected items than this are replaced with find and replace, not row by row
+ROW_REPLACE_LIMIT = 50
+# ms after a schema check before the status bar and the tree show it, so a
+# batch of edits repaints once
+SCHEMA_STATUS_DELAY = 100
+# characters of the schema error shown in the status bar
+MAX_STATUS_ERROR = 80
 
 
 class UI(QMainWindow):
+    # emitted with the tree of a tab whose cells were edited in place
+    tabEdited = Signal(object)
+    # emitted with the search text once typing pauses or the tab changes
+    searchRequested = Signal(str)
+
     def __init__(self):
         super().__init__()
         self._createProperties()
@@ -40,11 +87,13 @@ class UI(QMainWindow):
         self.setGeometry(100,100,1000,500)
         self.setCentralWidget(self.tabList)
         self.tabList.setTabsClosable(True)
+        self._setupStatusBar()
         self.show()
 
     def _createProperties(self):
         self.mainFont = self.font()
         self.tabFont = self.font()
+        self.initialExpandDepth = DEFAULT_EXPAND_DEPTH
 
         self.fileMenu = None
         self.editMenu = None
@@ -53,41 +102,74 @@ class UI(QMainWindow):
         self.toolBar = self.addToolBar("")
         self.statusBar = self.statusBar()
         self.tabList = QTabWidget()
+        self.progressBar = QProgressBar()
+        self.cancelButton = QPushButton("Cancel")
+        self.profileLabel = QLabel()
+        self.schemaLabel = QLabel()
+        self.schemaTimer = QTimer(self)
+        self.searchEdit = QLineEdit()
+        self.searchTimer = QTimer(self)
+        self.queryEdit = QLineEdit()
+        self.queryTimer = QTimer(self)
         
         # file menu actions
         self.newAction = QAction("&New", self)
         self.openAction = QAction("&Open", self)
+        self.openFolderAction = QAction("Open &Folder", self)
         self.saveAction = QAction("&Save", self)
         self.saveAsAction = QAction("S&ave As", self)
+        self.saveFormatAction = QAction("Save &Format", self)
+        self.clearCacheAction = QAction("Clear Document &Cache", self)
+        self.reloadAction = QAction("&Reload from Disk", self)
+        self.attachSchemaAction = QAction("Attach &Schema", self)
+        self.detachSchemaAction = QAction("&Detach Schema", self)
         self.closeAction = QAction("&Close", self)
         self.shortcutsAction = QAction("Shortcuts", self)
 
         # edit menu actions
+        self.undoAction = QAction("&Undo", self)
+        self.redoAction = QAction("Re&do", self)
         self.deleteAction = QAction("&Delete", self)
         self.insertAction = QAction("&Insert", self)
         self.replaceAction = QAction("&Replace", self)
+        self.bulkReplaceAction = QAction("Find and Rep&lace", self)
 
         # view menu actions
         self.setMenuBarFontAction = QAction("Set &Menu Font", self)
         self.setBodyFontAction = QAction("Set &Body Font", self)
         self.hideValuesAction = QAction("&Hide Values", self)
         self.showValuesAction = QAction("&Show Values", self)
+        self.setExpandDepthAction = QAction("Set &Expand Depth", self)
+        self.rememberViewAction = QAction("&Remember Expanded Rows", self)
+        self.memoryBudgetAction = QAction("Set Memory &Budget", self)
+        self.arrayTableAction = QAction("Open Array as &Table", self)
+        self.compareTabsAction = QAction("Compare with Ta&b", self)
+        self.compareFilesAction = QAction("&Compare Files", self)
+        self.profileAction = QAction("&Profile Operations", self)
+        self.saveTraceAction = QAction("Save Profile &Trace", self)
 
         # toolbar actions
         self.selectAllAction = QAction("Select All", self)
         self.unselectAllAction = QAction("Unselect All", self)
         self.collapseAllAction = QAction("Collapse All", self)
         self.expandAllAction = QAction("Expand All", self)
+        self.findAction = QAction("Find", self)
+        self.filterAction = QAction("Filter", self)
+        self.queryAction = QAction("Query", self)
 
     def _setShortcuts(self):
         self.newAction.setShortcut(QKeySequence.New) # Ctrl+N
         self.openAction.setShortcut(QKeySequence.Open) # Ctrl+O 
         self.saveAction.setShortcut(QKeySequence.Save) # Ctrl+S
         self.saveAsAction.setShortcut(QKeySequence.SaveAs) # Ctrl+Shift+S
+        self.reloadAction.setShortcut(QKeySequence.Refresh) # F5
 
+        self.undoAction.setShortcut(QKeySequence.Undo) # Ctrl+Z
+        self.redoAction.setShortcut(QKeySequence.Redo) # Ctrl+Shift+Z, Ctrl+Y
         self.deleteAction.setShortcut(QKeySequence.Delete) # del, Ctrl+D
         self.insertAction.setShortcut(QKeySequence("Ctrl+I"))
         self.replaceAction.setShortcut(QKeySequence("Ctrl+R"))
+        self.bulkReplaceAction.setShortcut(QKeySequence("Ctrl+H"))
 
         self.selectAllAction.setShortcut(QKeySequence.SelectAll) # Ctrl+A
         self.unselectAllAction.setShortcut(QKeySequence("Ctrl+Shift+A"))
@@ -96,23 +178,38 @@ class UI(QMainWindow):
 
         self.hideValuesAction.setShortcut(QKeySequence("Ctrl+Shift+V"))
         self.showValuesAction.setShortcut(QKeySequence("Ctrl+Shift+B"))
+        self.arrayTableAction.setShortcut(QKeySequence("Ctrl+T"))
+
+        self.findAction.setShortcut(QKeySequence.Find) # Ctrl+F
+        self.filterAction.setShortcut(QKeySequence("Ctrl+Shift+F"))
+        self.queryAction.setShortcut(QKeySequence("Ctrl+Shift+Q"))
 
     def _setupMenuBar(self):
         # create 'File' menu
         self.fileMenu = self.menuBar.addMenu("&File")
         self.fileMenu.addAction(self.newAction)
         self.fileMenu.addAction(self.openAction)
+        self.fileMenu.addAction(self.openFolderAction)
         self.fileMenu.addAction(self.saveAction)
         self.fileMenu.addAction(self.saveAsAction)
+        self.fileMenu.addAction(self.saveFormatAction)
+        self.fileMenu.addAction(self.reloadAction)
+        self.fileMenu.addAction(self.attachSchemaAction)
+        self.fileMenu.addAction(self.detachSchemaAction)
+        self.fileMenu.addAction(self.clearCacheAction)
         self.fileMenu.addAction(self.shortcutsAction)
         self.fileMenu.addAction(self.closeAction)
         self.shortcutsAction.triggered.connect(self.shortcutsActionHandler)
         
         # create 'Edit' menu
         self.editMenu = self.menuBar.addMenu("&Edit")
+        self.editMenu.addAction(self.undoAction)
+        self.editMenu.addAction(self.redoAction)
+        self.editMenu.addSeparator()
         self.editMenu.addAction(self.deleteAction)
         self.editMenu.addAction(self.insertAction)
         self.editMenu.addAction(self.replaceAction)
+        self.editMenu.addAction(self.bulkReplaceAction)
         
         # create 'View' menu
         self.viewMenu = self.menuBar.addMenu("&View")
@@ -120,10 +217,27 @@ class UI(QMainWindow):
         self.viewMenu.addAction(self.setBodyFontAction)
         self.viewMenu.addAction(self.hideValuesAction)
         self.viewMenu.addAction(self.showValuesAction)
+        self.viewMenu.addAction(self.setExpandDepthAction)
         self.setMenuBarFontAction.triggered.connect(self.setMenuBarFontActionHandler)
         self.setBodyFontAction.triggered.connect(self.setBodyFontActionHandler)
         self.hideValuesAction.triggered.connect(self.hideValuesActionHandler)
         self.showValuesAction.triggered.connect(self.showValuesActionHandler)
+        self.setExpandDepthAction.triggered.connect(self.setExpandDepthActionHandler)
+        self.viewMenu.addAction(self.rememberViewAction)
+        self.rememberViewAction.setCheckable(True)
+        self.rememberViewAction.setChecked(True)
+        self.viewMenu.addAction(self.memoryBudgetAction)
+        self.viewMenu.addAction(self.arrayTableAction)
+        self.arrayTableAction.triggered.connect(self.arrayTableActionHandler)
+        self.viewMenu.addAction(self.compareTabsAction)
+        self.viewMenu.addAction(self.compareFilesAction)
+        self.viewMenu.addSeparator()
+        self.viewMenu.addAction(self.profileAction)
+        self.viewMenu.addAction(self.saveTraceAction)
+        self.profileAction.setCheckable(True)
+        self.profileAction.setChecked(profiler.enabled)
+        self.profileAction.toggled.connect(self.profileActionHandler)
+        self.saveTraceAction.triggered.connect(self.saveTraceActionHandler)
 
     def _setupToolBar(self):
         self.toolBar.setMovable(False)
@@ -143,16 +257,100 @@ class UI(QMainWindow):
 
         self.toolBar.addAction(self.expandAllAction)
         self.expandAllAction.triggered.connect(self.expandAllActionHandler)
+        self.toolBar.addSeparator()
+
+        self.searchEdit.setPlaceholderText("Search keys, values or a.b.c paths")
+        self.searchEdit.setClearButtonEnabled(True)
+        self.searchEdit.setMaximumWidth(300)
+        self.toolBar.addWidget(self.searchEdit)
+        self.searchTimer.setSingleShot(True)
+        self.searchTimer.setInterval(SEARCH_DELAY)
+        self.searchTimer.timeout.connect(lambda: self.searchRequested.emit(self.searchEdit.text()))
+        self.searchEdit.textChanged.connect(lambda: self.searchTimer.start())
+        self.searchEdit.returnPressed.connect(self.gotoNextSearchResult)
+        self.tabList.currentChanged.connect(lambda: self.searchTimer.start())
+        self.findAction.triggered.connect(self.findActionHandler)
+        self.addAction(self.findAction)
+
+        self.filterAction.setCheckable(True)
+        self.toolBar.addAction(self.filterAction)
+        self.filterAction.toggled.connect(self.filterActionHandler)
+        self.toolBar.addSeparator()
+
+        self.queryEdit.setPlaceholderText("Check by query, e.g. $..patches[?(@.type == 'wall')]")
+        self.queryEdit.setClearButtonEnabled(True)
+        self.queryEdit.setMaximumWidth(300)
+        self.toolBar.addWidget(self.queryEdit)
+        self.queryTimer.setSingleShot(True)
+        self.queryTimer.setInterval(SEARCH_DELAY)
+        self.queryTimer.timeout.connect(self.countQueryMatches)
+        self.queryEdit.textChanged.connect(lambda: self.queryTimer.start())
+        self.queryEdit.returnPressed.connect(self.queryReturnHandler)
+        self.tabList.currentChanged.connect(lambda: self.queryTimer.start())
+        self.queryAction.triggered.connect(self.queryActionHandler)
+        self.addAction(self.queryAction)
+
+    def _setupStatusBar(self):
+        self.progressBar.setMaximumWidth(200)
+        self.statusBar.addPermanentWidget(self.schemaLabel)
+        self.statusBar.addPermanentWidget(self.profileLabel)
+        self.statusBar.addPermanentWidget(self.progressBar)
+        self.statusBar.addPermanentWidget(self.cancelButton)
+        self.progressBar.hide()
+        self.cancelButton.hide()
+        self.profileLabel.setVisible(profiler.enabled)
+        profiler.listeners.append(lambda operation: self.profileLabel.setText(operation.summary()))
+        self.schemaLabel.hide()
+        self.schemaTimer.setSingleShot(True)
+        self.schemaTimer.setInterval(SCHEMA_STATUS_DELAY)
+        self.schemaTimer.timeout.connect(self.refreshSchemaStatus)
+        self.tabList.currentChanged.connect(self.schemaChanged)
 
     def shortcutsActionHandler(self) -> None:
         Dialog.showShortcuts(self)
 
+    @profiler.profiled("hide values")
     def hideValuesActionHandler(self) -> None:
         self.setCurrentValuesVisibility(False)
 
+    @profiler.profiled("show values")
     def showValuesActionHandler(self) -> None:
         self.setCurrentValuesVisibility(True)
 
+    def setExpandDepthActionHandler(self) -> None:
+        depth, ok = QInputDialog.getInt(
+            self,
+            "Expand Depth",
+            "Levels expanded when a file is opened:",
+            self.initialExpandDepth,
+            0,
+            100
+        )
+        if( ok ):
+            self.initialExpandDepth = depth
+
+    @profiler.profiled("table")
+    def arrayTableActionHandler(self) -> None:
+        self.openArrayTable()
+
+    def profileActionHandler(self, checked : bool) -> None:
+        profiler.setEnabled(checked)
+        self.profileLabel.setVisible(checked)
+
+    def saveTraceActionHandler(self) -> None:
+        filePath, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save Profile Trace",
+            "trace.json",
+            "Trace Files(*.json)"
+        )
+        if( filePath == "" ):
+            return
+        try:
+            profiler.dumpTrace(filePath)
+        except OSError as e:
+            QMessageBox.warning(self, "Save Failed", f"Could not save {filePath}\n{e}")
+
     def setMenuBarFontActionHandler(self) -> None:
         _, font = QFontDialog.getFont(self.mainFont, self, "Choose Font")
         self.mainFont = font
@@ -167,51 +365,73 @@ class UI(QMainWindow):
         self.tabFont = font
         self.tabList.setFont(self.tabFont)
 
+    @profiler.profiled("select all")
     def selectAllActionHandler(self) -> None:
         self.setCheckedAllCurrentItems(True)
 
+    @profiler.profiled("unselect all")
     def unselectAllActionHandler(self) -> None:
         self.setCheckedAllCurrentItems(False)
 
+    @profiler.profiled("collapse all")
     def collapseAllActionHandler(self) -> None:
         self.setExpandedAllCurrentItems(False)
 
+    @profiler.profiled("expand all")
     def expandAllActionHandler(self) -> None:
         self.setExpandedAllCurrentItems(True)
 
+    def findActionHandler(self) -> None:
+        self.searchEdit.setFocus()
+        self.searchEdit.selectAll()
+
+    def queryActionHandler(self) -> None:
+        self.queryEdit.setFocus()
+        self.queryEdit.selectAll()
+
+    @profiler.profiled("query")
+    def queryReturnHandler(self) -> None:
+        self.queryTimer.stop()
+        self.checkQueryMatches()
+
+    def filterActionHandler(self, checked : bool) -> None:
+        if( self.tabList.count() == 0 ):
+            return
+        self.setSearchFilter(self.tabList.currentWidget(), checked)
+
+    def currentTreeModel(self) -> JsonTreeModel:
+        return self.tabList.currentWidget().model()
+
     def getCurrentSelectedItems(self) -> list:
-        selectedItems = []
-        tree = self.tabList.currentWidget()
-        itr = QTreeWidgetItemIterator(tree)
-        while( itr.value() is not None ):
-            item = itr.value()
-            checkbox = tree.itemWidget(item,0)
-            if( checkbox.isChecked() ):
-                selectedItems.append(item)
-            itr += 1
-        return selectedItems
+        return self.currentTreeModel().document.selectedNodes()
 
     def deleteCurrentSelectedItems(self) -> int:
         '''
         Delete selected items in the current tab.
         Returns the count of deleted items.
         '''
-        tree = self.tabList.currentWidget()
+        model = self.currentTreeModel()
         toDelete = self.getCurrentSelectedItems()
         
         if( len(toDelete) == 0 ):
             return 0
 
         # show confirm checkbox
-        deletionAllowed = Dialog.deleteConfirmDialog(self, len(toDelete))
+        with profiler.phase("dialog"):
+            deletionAllowed = Dialog.deleteConfirmDialog(self, len(toDelete))
 
         if( not deletionAllowed ):
             return 0
 
-        # delete in reverse so that child is deleted before parent
-        root = tree.invisibleRootItem()
-        for item in reversed(toDelete):
-            ( item.parent() or root ).removeChild(item)
+        # a running tree job may hold references to deleted items
+        self.stopTreeJob(self.tabList.currentWidget())
+        self.clearSearchFilter()
+
+        # sub-items go with their parent, only remove the topmost ones
+        with profiler.phase("remove"):
+            topmost = model.document.topmostNodes(toDelete)
+            model.removeNodes(topmost)
+        profiler.count("removed", len(topmost))
 
         return len(toDelete)
 
@@ -223,10 +443,10 @@ class UI(QMainWindow):
         if( self.tabList.count() == 0 ):
             return 0
 
-        tree = self.tabList.currentWidget()
+        model = self.currentTreeModel()
         selectedItems = self.getCurrentSelectedItems()
         if( len(selectedItems) == 0 ):
-            selectedItems.append(tree.invisibleRootItem())
+            selectedItems.append(model.rootNode)
 
         # give multiple place insertion warning
         insertionAllowed = True
@@ -237,171 +457,625 @@ class UI(QMainWindow):
             return 0
 
         # show dialog box for insertion
-        pairs = Dialog.insertDialog(self)
-
-        # insert into tree widget
-        for item in selectedItems:
-            tree.removeItemWidget(item, 1)
-            for pair in pairs:
-                key,val = pair
-                widget = QTreeWidgetItem()
-                item.addChild(widget)
-
-                keyWidget = QCheckBox(key)
-                tree.setItemWidget(widget, 0, keyWidget)
-
-                valWidget = QWidget()
-                label = QLabel(val)
-                layout = QHBoxLayout(valWidget)
-                layout.setContentsMargins(0,0,0,0)
-                layout.addWidget(label)
-                tree.setItemWidget(widget, 1, valWidget)
+        with profiler.phase("dialog"):
+            pairs = Dialog.insertDialog(self)
+
+        # all or nothing, a key one of the items already has inserts nowhere
+        try:
+            for node in selectedItems:
+                model.document.checkKeys(node, newKeys=[ key for key,value in pairs ])
+        except ValueError as e:
+            QMessageBox.warning(self, "Insert Failed", str(e))
+            return 0
+
+        # insert into tree model
+        self.clearSearchFilter()
+        with profiler.phase("insert"):
+            for node in selectedItems:
+                model.insertPairs(node, pairs)
+        profiler.count("inserted", len(selectedItems) * len(pairs))
 
         return len(selectedItems) * len(pairs)
 
-    def replaceCurrentSelectedItems(self) -> int:
+    def replaceCurrentSelectedItems(self, bulk : bool = False) -> int:
         '''
-        Replace the selected items in current tab.
+        Replace the selected items in current tab, row by row or with find
+        and replace if bulk or if there are too many rows.
         Return the count of items replaced.
         '''
         if( self.tabList.count() == 0 ):
             return 0
 
-        tree = self.tabList.currentWidget()
+        model = self.currentTreeModel()
         selected = self.getCurrentSelectedItems()
         if( len(selected) == 0 ):
             return 0
+        if( bulk or len(selected) > ROW_REPLACE_LIMIT ):
+            return self.bulkReplaceItems(model, selected)
 
         # see staticmethod Dialog.replaceDialog for format of 'data'
         data = [0 for i in range(len(selected))]
-        for index,item in enumerate(selected):
-            if( item.childCount() == 0 ):
-                keyText = tree.itemWidget(item,0).text()
-                valText = tree.itemWidget(item,1).layout().itemAt(0).widget().text()
-                data[index] = [keyText,valText,True]
+        for index,node in enumerate(selected):
+            if( not node.isBranch() ):
+                data[index] = [str(node.key),node.value,True]
             else:
-                keyText = tree.itemWidget(item,0).text()
-                data[index] = [keyText,"",False]
-
-        Dialog.replaceDialog(self, data)
-        for index,item in enumerate(selected):
-            tree.itemWidget(item,0).setText(data[index][0])
-            if( item.childCount() == 0 ):
-                tree.itemWidget(item,1).layout().itemAt(0).widget().setText(data[index][1])
+                data[index] = [str(node.key),"",False]
+
+        with profiler.phase("dialog"):
+            Dialog.replaceDialog(self, data)
+        # the key of an array item is its index
+        renames = {
+            node : data[index][0]
+            for index,node in enumerate(selected)
+            if not node.parent.isArray and data[index][0] != node.key
+        }
+        try:
+            model.document.checkRenames(renames)
+        except ValueError as e:
+            QMessageBox.warning(self, "Replace Failed", str(e))
+            return 0
+        with profiler.phase("replace"):
+            for index,node in enumerate(selected):
+                keyText, value, isLeaf = data[index]
+                if( node in renames ):
+                    model.setNodeKey(node, keyText, False)
+                if( isLeaf and ( type(value) is not type(node.value) or value != node.value ) ):
+                    model.setNodeValue(node, value)
+        profiler.count("replaced", len(selected))
 
         return len(selected)
 
+    def bulkReplaceItems(self, model : JsonTreeModel, selected : list) -> int:
+        '''
+        Find and replace in the keys and values of selected, see
+        replace.ReplaceDialog. Return the count of items changed.
+        '''
+        with profiler.phase("dialog"):
+            dlg = ReplaceDialog(selected, self)
+            accepted = ( dlg.exec() == QDialog.Accepted )
+        if( not accepted ):
+            return 0
+        with profiler.phase("replace"):
+            try:
+                model.applyReplaceChanges(dlg.changes)
+            except ValueError as e:
+                QMessageBox.warning(self, "Replace Failed", str(e))
+                return 0
+        items, keys, values = changeCounts(dlg.changes)
+        profiler.count("keys", keys)
+        profiler.count("values", values)
+        return items
+
+    def currentQuery(self):
+        '''
+        The compiled query of the query box, None if it is empty or not
+        valid (the error is shown) or if there is no tab to run it on.
+        '''
+        text = self.queryEdit.text()
+        if( text.strip() == "" or self.tabList.count() == 0 or self.isTabHibernated(self.tabList.currentIndex()) ):
+            return None
+        try:
+            return compileQuery(text)
+        except QueryError as e:
+            self.statusBar.showMessage(f"Query : {e}")
+            return None
+
+    def countQueryMatches(self) -> None:
+        '''
+        Show how many nodes the query matches, without fetching any.
+        '''
+        query = self.currentQuery()
+        if( query is None ):
+            return
+        with profiler.operation("query count") as operation:
+            count = query.count(self.currentTreeModel().document)
+            operation.count("matches", count)
+        self.statusBar.showMessage(f"{count} query matches, Enter checks them.")
+
+    def checkQueryMatches(self) -> int:
+        '''
+        Check the nodes matched by the query, and only them, so the Edit
+        actions apply to them. Returns the count of nodes checked.
+        '''
+        query = self.currentQuery()
+        if( query is None ):
+            return 0
+        tree = self.tabList.currentWidget()
+        model = tree.model()
+        self.stopTreeJob(tree)
+        self.clearSearchFilter()
+        with profiler.phase("evaluate"):
+            nodes = query.nodes(model.document, model.fetchNode)
+        with profiler.phase("check"):
+            model.setCheckedNodes(nodes)
+        profiler.count("matches", len(nodes))
+        self.statusBar.showMessage(f"{len(nodes)} query matches checked.")
+        return len(nodes)
+
+    def undoCurrentTab(self, undoStack, redo : bool = False) -> int:
+        '''
+        Undo or redo the last step of undoStack on the current tab, patching
+        only the rows it touches. Returns the count of edits reverted.
+        '''
+        if( self.tabList.count() == 0 ):
+            return 0
+
+        tree = self.tabList.currentWidget()
+        # a running tree job may hold references to removed items
+        self.stopTreeJob(tree)
+        self.clearSearchFilter()
+        if( redo ):
+            return undoStack.redo(tree.model())
+        return undoStack.undo(tree.model())
+
     def setCheckedAllCurrentItems(self, checked : bool) -> None:
         if( self.tabList.count() == 0 ):
             return
 
         tree = self.tabList.currentWidget()
-        itr = QTreeWidgetItemIterator(tree)
-        while( itr.value() is not None ):
-            checkbox = tree.itemWidget(itr.value(),0)
-            checkbox.setChecked(checked)
-            itr += 1
+        tree.setUpdatesEnabled(False)
+        tree.model().setAllChecked(checked)
+        tree.setUpdatesEnabled(True)
+        profiler.count("checked", len(tree.model().document.checkedNodes))
 
     def setExpandedAllCurrentItems(self, expand : bool) -> None:
+        '''
+        Expanding all materializes every node, so on big documents it asks
+        for confirmation first. Both directions are one native call.
+        '''
         if( self.tabList.count() == 0 ):
             return
 
         tree = self.tabList.currentWidget()
-        itr = QTreeWidgetItemIterator(tree)
-        while( itr.value() is not None ):
-            item = itr.value()
-            item.setExpanded(expand)
-            itr += 1
+        model = tree.model()
+        self.stopTreeJob(tree)
+        self.clearSearchFilter()
+
+        # expandAll and collapseAll do not emit expanded/collapsed per row
+        if( not expand ):
+            tree.collapseAll()
+            model.document.setAllExpanded(False)
+            return
+
+        if( model.document.countNodes(EXPAND_ALL_WARN_LIMIT) >= EXPAND_ALL_WARN_LIMIT ):
+            if( not Dialog.expandAllConfirmDialog(self, EXPAND_ALL_WARN_LIMIT) ):
+                return
+
+        tree.setUpdatesEnabled(False)
+        with profiler.phase("fetch"):
+            model.fetchAllAtOnce()
+        with profiler.phase("expand"):
+            tree.expandAll()
+            model.document.setAllExpanded(True)
+        tree.setUpdatesEnabled(True)
+
+    def startTreeJob(self, tree : JsonTreeView, step) -> None:
+        '''
+        Run step() from the event loop until it returns False. A tree runs
+        one job at a time, starting a job stops the previous one.
+        '''
+        self.stopTreeJob(tree)
+
+        def runStep():
+            if( not step() ):
+                self.stopTreeJob(tree)
+
+        tree.treeJob = QTimer(tree)
+        tree.treeJob.timeout.connect(runStep)
+        tree.treeJob.start(0)
+
+    def stopTreeJob(self, tree : JsonTreeView) -> None:
+        if( tree.treeJob is None ):
+            return
+        tree.treeJob.stop()
+        tree.treeJob.deleteLater()
+        tree.treeJob = None
+
+    def expandNodesToDepth(self, tree : JsonTreeView, nodes : list, depth : int) -> None:
+        '''
+        Expand nodes and their descendants depth levels down, fetching only
+        the first batch of each expanded node.
+        '''
+        model = tree.model()
+        level = [ node for node in nodes if node.hasChildren() ]
+        for _ in range(depth):
+            nextLevel = []
+            for node in level:
+                if( node.childCount() == 0 ):
+                    model.fetchNode(node, FETCH_BATCH_SIZE)
+                tree.setExpanded(model.indexFromNode(node), True)
+                nextLevel.extend( child for child in node.children if child.hasChildren() )
+            level = nextLevel
+
+    def populateTab(self, tree : JsonTreeView) -> None:
+        '''
+        Fill the first batch of top-level rows a few at a time from the event
+        loop, expanding each one to the initial depth. The rest is fetched
+        when scrolled to.
+        '''
+        model = tree.model()
+        root = model.rootNode
+        done = 0
+
+        def populateChunk() -> bool:
+            nonlocal done
+            if( done + POPULATE_CHUNK_SIZE > root.childCount() ):
+                model.fetchNode(root, POPULATE_CHUNK_SIZE)
+            nodes = (root.children or [])[done:done + POPULATE_CHUNK_SIZE]
+            self.expandNodesToDepth(tree, nodes, self.initialExpandDepth)
+            done += len(nodes)
+            return ( len(nodes) != 0 and done < FETCH_BATCH_SIZE )
+
+        self.startTreeJob(tree, populateChunk)
 
     def setCurrentValuesVisibility(self, visible : bool) -> None:
         if( self.tabList.count() == 0 ):
             return
 
         tree = self.tabList.currentWidget()
-        itr = QTreeWidgetItemIterator(tree)
-        while( itr.value() is not None ):
-            item = itr.value()
-            if( item.childCount() != 0 ):
-                itr += 1
-                continue
+        tree.setColumnHidden(VALUE_COLUMN, not visible)
 
-            valLabel = tree.itemWidget(item,1).layout().itemAt(0).widget()
-            if( visible ):
-                valLabel.show()
-            else:
-                valLabel.hide()
-            itr += 1
-
-    def createTab(self, tabName : str, tabData : dict) -> None:
-
-        def recursiveBuild(root : QTreeWidgetItem, data : dict) -> None:
-            for key,val in data.items():
-                item = QTreeWidgetItem()
-                root.addChild(item)
-                if( type(val) is dict ):
-                    recursiveBuild(item, val)
-                else:
-                    text = parser.toText(val)
-                    container = QWidget()
-                    layout = QHBoxLayout(container)
-                    layout.setContentsMargins(0,0,0,0)
-                    valLabel = QLabel(text)
-                    layout.addWidget(valLabel)
-                    tree.setItemWidget(item, 1, container)
-
-                tree.setItemWidget(item, 0, QCheckBox(key))
-                item.setExpanded(True)
-        
-        tree = QTreeWidget()
-        tree.setColumnCount(2)
-        tree.setHeaderLabels(["",""])
-        root = tree.invisibleRootItem()
-        recursiveBuild(root, tabData)
+    def showSearchResults(self, paths : list, limit : int) -> None:
+        '''
+        Keep the key paths found for the search text on the current tree, and
+        filter the tree to them when filtering is on.
+        '''
+        if( self.tabList.count() == 0 ):
+            return
+        tree = self.tabList.currentWidget()
+        tree.searchResults = paths
+        tree.searchPos = -1
+        if( self.searchEdit.text().strip() == "" ):
+            self.statusBar.clearMessage()
+        elif( len(paths) >= limit ):
+            self.statusBar.showMessage(f"More than {limit} matches, showing the first {limit}.")
+        else:
+            self.statusBar.showMessage(f"{len(paths)} matches.")
+        if( self.filterAction.isChecked() or tree.model().isFiltering() ):
+            self.setSearchFilter(tree, self.filterAction.isChecked())
+
+    def refreshSearch(self) -> None:
+        '''
+        Search again after an edit, the results are key paths.
+        '''
+        if( self.searchEdit.text() != "" ):
+            self.searchTimer.start()
+
+    def gotoNextSearchResult(self) -> None:
+        '''
+        Select the next search result of the current tree, fetching and
+        expanding its ancestors as needed.
+        '''
+        if( self.tabList.count() == 0 ):
+            return
+        tree = self.tabList.currentWidget()
+        paths = tree.searchResults
+        if( len(paths) == 0 ):
+            return
+
+        tree.searchPos = ( tree.searchPos + 1 ) % len(paths)
+        if( self.selectPath(tree, paths[tree.searchPos]) ):
+            self.statusBar.showMessage(f"Match {tree.searchPos + 1} of {len(paths)}.")
 
+    def selectPath(self, tree : JsonTreeView, path : list) -> bool:
+        '''
+        Make the node at a key path the current row of tree, fetching and
+        expanding its ancestors as needed. Returns False if there is none.
+        '''
+        model = tree.model()
+        node = model.nodeAtPath(path)
+        if( node is None ):
+            return False
+        ancestors = []
+        parent = node.parent
+        while( parent is not model.rootNode ):
+            ancestors.append(parent)
+            parent = parent.parent
+        for ancestor in reversed(ancestors):
+            tree.setExpanded(model.indexFromNode(ancestor), True)
+        index = model.indexFromNode(node)
+        tree.scrollTo(index)
+        tree.setCurrentIndex(index)
+        return True
+
+    def openArrayTable(self) -> None:
+        '''
+        Show the array of objects at the current row of the current tab, or
+        the one holding it, in a table. The table is owned by the tree, so it
+        closes with the tab.
+        '''
+        if( self.tabList.count() == 0 or self.isTabHibernated(self.tabList.currentIndex()) ):
+            return
+        tree = self.tabList.currentWidget()
+        model = tree.model()
+        node = model.nodeFromIndex(tree.currentIndex())
+        if( not isTable(node) and node.parent is not None and isTable(node.parent) ):
+            node = node.parent
+        if( not isTable(node) ):
+            self.statusBar.showMessage("The current row is not an array of objects.")
+            return
+        dlg = ArrayTableDialog(model.document, node, tree)
+        dlg.pathActivated.connect(lambda path: self.showPathInTab(tree, path))
+        profiler.count("rows", dlg.tableModel.store.rowCount)
+        dlg.show()
+
+    def showPathInTab(self, tree : JsonTreeView, path : list) -> None:
+        self.tabList.setCurrentWidget(tree)
+        self.clearSearchFilter()
+        self.selectPath(tree, path)
+
+    def setSearchFilter(self, tree : JsonTreeView, filtered : bool) -> None:
+        '''
+        Show only the search results of tree and their ancestors, or every
+        row again with the expand state it had before filtering.
+        '''
+        model = tree.model()
+        self.stopTreeJob(tree)
+        tree.setUpdatesEnabled(False)
+        if( filtered ):
+            nodes = [ model.nodeAtPath(path) for path in tree.searchResults ]
+            model.setFilter([ node for node in nodes if node is not None ])
+            # expandAll does not emit expanded, the document keeps the old state
+            tree.expandAll()
+        elif( model.isFiltering() ):
+            model.setFilter(None)
+            for node in model.document.iterNodes():
+                if( node.expanded and node.children ):
+                    tree.setExpanded(model.indexFromNode(node), True)
+        tree.setUpdatesEnabled(True)
+
+    def clearSearchFilter(self) -> None:
+        '''
+        Leave filter mode on the current tree, rows can only be inserted or
+        removed while it is off.
+        '''
+        if( self.filterAction.isChecked() ):
+            self.filterAction.setChecked(False)
+        elif( self.tabList.count() != 0 and self.currentTreeModel().isFiltering() ):
+            self.setSearchFilter(self.tabList.currentWidget(), False)
+
+    def viewState(self, tree : JsonTreeView, limit : int = MAX_VIEW_STATE_PATHS) -> dict:
+        '''
+        Key paths of the expanded rows that are shown, in pre-order, and the
+        scroll position. Rows expanded under a collapsed parent are left out,
+        so are paths past limit unless it is None.
+        '''
+        if( isinstance(tree, HibernatedTab) ):
+            return { "expanded" : tree.viewState["expanded"][:limit], "scroll" : tree.viewState["scroll"] }
+        paths = []
+        stack = list(reversed(tree.model().rootNode.children or []))
+        while( stack and ( limit is None or len(paths) < limit ) ):
+            node = stack.pop()
+            if( node.expanded and node.children ):
+                paths.append(node.path())
+                stack.extend(reversed(node.children))
+        return { "expanded" : paths, "scroll" : tree.verticalScrollBar().value() }
+
+    def restoreViewState(self, tree : JsonTreeView, viewState : dict) -> None:
+        '''
+        Expand the rows of a viewState, fetching only what they need, and
+        scroll back once the rows are laid out. Paths that no longer exist
+        are skipped.
+        '''
+        model = tree.model()
+        model.fetchNode(model.rootNode, FETCH_BATCH_SIZE)
+        for path in viewState.get("expanded", []):
+            node = model.nodeAtPath(path)
+            if( node is None or not node.hasChildren() ):
+                continue
+            if( node.childCount() == 0 ):
+                model.fetchNode(node, FETCH_BATCH_SIZE)
+            tree.setExpanded(model.indexFromNode(node), True)
+        scroll = viewState.get("scroll", 0)
+        # owned by the tree, so it dies with a tab closed before it fires
+        scrollTimer = QTimer(tree)
+        scrollTimer.setSingleShot(True)
+        scrollTimer.timeout.connect(lambda: tree.verticalScrollBar().setValue(scroll))
+        scrollTimer.start(0)
+
+    def _createTree(self, document : Document) -> JsonTreeView:
+        model = JsonTreeModel(document)
+        tree = JsonTreeView(model)
+        model.edited.connect(lambda: self.tabEdited.emit(tree))
+        model.editFailed.connect(lambda error: QMessageBox.warning(self, "Edit Failed", error))
+        profiler.count("widgets")
+        return tree
+
+    def createTab(self, tabName : str, document : Document, viewState : dict = None) -> None:
+        tree = self._createTree(document)
         self.tabList.addTab(tree, tabName)
+        if( viewState ):
+            self.restoreViewState(tree, viewState)
+        else:
+            self.populateTab(tree)
 
-    def tabToDict(self, index : int) -> dict:
+    def closeTab(self, index : int) -> None:
+        tree = self.tabList.widget(index)
+        if( not isinstance(tree, HibernatedTab) ):
+            self.stopTreeJob(tree)
+        self.tabList.removeTab(index)
+        tree.deleteLater()
 
-        def treeToDict(tree : QTreeWidget, currWidgetItem : QTreeWidgetItem) -> dict:
-            resDict = {}
+    def isTabHibernated(self, index : int) -> bool:
+        return isinstance(self.tabList.widget(index), HibernatedTab)
 
-            for i in range(currWidgetItem.childCount()):
-                child = currWidgetItem.child(i)
-                key = tree.itemWidget(child, 0).text()
-                val = None
-                if( child.childCount() == 0 ):
-                    val = tree.itemWidget(child,1).layout().itemAt(0).widget().text()
-                    val = parser.toJSONValue(val)
-                else:
-                    val = treeToDict(tree,child)
-                resDict[key] = val
+    def hibernateTab(self, index : int) -> None:
+        '''
+        Replace the tree of a tab by a HibernatedTab keeping its whole view
+        state. Call it before hibernating the document, the view state is
+        read from the nodes.
+        '''
+        tree = self.tabList.widget(index)
+        self.stopTreeJob(tree)
+        self._replaceTabWidget(index, HibernatedTab(self.viewState(tree, None)))
+        tree.deleteLater()
 
-            return resDict
+    def wakeTab(self, index : int, document : Document) -> None:
+        '''
+        Give a hibernated tab a new tree over its woken document, fetching
+        only the rows its view state shows.
+        '''
+        placeholder = self.tabList.widget(index)
+        tree = self._createTree(document)
+        self._replaceTabWidget(index, tree)
+        self.restoreViewState(tree, placeholder.viewState)
+        placeholder.deleteLater()
+
+    def _replaceTabWidget(self, index : int, widget) -> None:
+        # blocked so listeners never see the tab disappear for a moment
+        isCurrent = ( index == self.tabList.currentIndex() )
+        tabName = self.tabList.tabText(index)
+        self.tabList.blockSignals(True)
+        self.tabList.removeTab(index)
+        self.tabList.insertTab(index, widget, tabName)
+        if( isCurrent ):
+            self.tabList.setCurrentIndex(index)
+        self.tabList.blockSignals(False)
+
+    def startProgress(self, message : str) -> None:
+        self.progressBar.setRange(0, 100)
+        self.progressBar.setValue(0)
+        self.progressBar.show()
+        self.cancelButton.show()
+        self.statusBar.showMessage(message)
+
+    def setProgress(self, percent : int) -> None:
+        self.progressBar.setValue(percent)
+
+    def setProgressBusy(self, message : str) -> None:
+        # a zero range shows an indeterminate busy bar
+        self.progressBar.setRange(0, 0)
+        self.statusBar.showMessage(message)
+
+    def stopProgress(self) -> None:
+        self.progressBar.hide()
+        self.cancelButton.hide()
+        self.statusBar.clearMessage()
 
+    def tabToDict(self, index : int) -> dict:
         tree = self.tabList.widget(index)
-        return treeToDict(tree, tree.invisibleRootItem())
+        return tree.model().document.toDict()
 
     def setTabName(self, index : int, tabName : str) -> None:
         self.tabList.setTabText(index, tabName)
 
+    def setTabSchema(self, index : int, checker) -> None:
+        '''
+        Show the errors of checker, a schema.SchemaChecker or None, in the
+        tree of a tab.
+        '''
+        tree = self.tabList.widget(index)
+        if( not isinstance(tree, HibernatedTab) ):
+            tree.model().schemaChecker = checker
+        self.schemaChanged()
+
+    def schemaChanged(self) -> None:
+        self.schemaTimer.start()
+
+    def refreshSchemaStatus(self) -> None:
+        '''
+        Repaint the current tree and show the schema errors of its tab.
+        '''
+        tree = self.tabList.currentWidget()
+        checker = None
+        if( tree is not None and not isinstance(tree, HibernatedTab) ):
+            checker = tree.model().schemaChecker
+        if( checker is None ):
+            self.schemaLabel.hide()
+            return
+        tree.viewport().update()
+        if( not checker.isReady ):
+            text = "Schema : checking…"
+        elif( checker.errorCount() == 0 ):
+            text = "Schema : valid"
+        else:
+            path, message = checker.firstError()
+            where = ".".join( str(key) for key in path ) or "top level"
+            text = f"Schema : {checker.errorCount()} errors, {where} {message}"
+        self.schemaLabel.setToolTip(text)
+        if( len(text) > MAX_STATUS_ERROR ):
+            text = text[:MAX_STATUS_ERROR] + "…"
+        self.schemaLabel.setText(text)
+        self.schemaLabel.show()
+
+    def tabTitle(self, index : int) -> str:
+        '''
+        Name of a tab without the state shown after it.
+        '''
+        return self.tabList.tabText(index).removesuffix(SAVING_SUFFIX).removesuffix(CONFLICT_SUFFIX)
+
+    def setTabConflict(self, index : int, conflict : bool) -> None:
+        '''
+        Flag a tab whose file changed on disk while it had unsaved changes.
+        '''
+        tabName = self.tabList.tabText(index)
+        saving = tabName.endswith(SAVING_SUFFIX)
+        tabName = tabName.removesuffix(SAVING_SUFFIX).removesuffix(CONFLICT_SUFFIX)
+        if( conflict ):
+            tabName += CONFLICT_SUFFIX
+        if( saving ):
+            tabName += SAVING_SUFFIX
+        self.tabList.setTabText(index, tabName)
+
+    def patchTab(self, index : int, data) -> int:
+        '''
+        Bring the document of a tab in line with data read from its file,
+        editing only the rows that differ, see patch.patchNode. Returns the
+        count of edits. Raises ValueError if the top level changed type.
+        '''
+        tree = self.tabList.widget(index)
+        self.stopTreeJob(tree)
+        if( tree is self.tabList.currentWidget() ):
+            self.clearSearchFilter()
+        elif( tree.model().isFiltering() ):
+            self.setSearchFilter(tree, False)
+        model = tree.model()
+        return patchNode(model, model.rootNode, data)
+
+    def setTabSaving(self, tree : JsonTreeView, saving : bool) -> None:
+        index = self.tabList.indexOf(tree)
+        if( index == -1 ):
+            return
+        tabName = self.tabList.tabText(index).removesuffix(SAVING_SUFFIX)
+        if( saving ):
+            tabName += SAVING_SUFFIX
+        self.tabList.setTabText(index, tabName)
+
+
+class HibernatedTab(QLabel):
+    '''
+    Stand-in for the tree of a tab hibernated to save memory, see
+    UI.hibernateTab. It only keeps the view state to restore.
+    '''
+    def __init__(self, viewState : dict, parent=None):
+        super().__init__("Loading…", parent)
+        self.setAlignment(Qt.AlignCenter)
+        self.viewState = viewState
+
 
 class Dialog():
     @staticmethod
     def insertDialog(parent : UI) -> list:
 
         def acceptHandler():
+            newPairs = []
             for row in range(1,grid.rowCount()):
                 keyText = grid.itemAtPosition(row,0).widget().text()
-                valText = grid.itemAtPosition(row,1).widget().text()
-                if( keyText == "" or valText == ""):
+                valEditor = grid.itemAtPosition(row,1).widget()
+                if( keyText == "" ):
                     continue
-                pairs.append((keyText,valText))
+                try:
+                    newPairs.append((keyText,valEditor.value()))
+                except ValueError as e:
+                    QMessageBox.warning(dlg, "Invalid Value", f"{keyText} : {e}")
+                    return
+            pairs.extend(newPairs)
             dlg.accept()
 
         def addField():
             row = grid.rowCount()
             grid.addWidget(QLineEdit(), row, 0)
-            grid.addWidget(QLineEdit(), row, 1)
+            grid.addWidget(ValueEditor(), row, 1)
 
         pairs = []
         dlg = QDialog(parent)
@@ -413,10 +1087,8 @@ class Dialog():
         addFieldButton = QPushButton("+")
         addFieldButton.clicked.connect(addField)
         grid.addWidget(addFieldButton, 0, 0, 1, 2)
-        grid.addWidget(QLineEdit(), 1, 0)
-        grid.addWidget(QLineEdit(), 1, 1)
-        grid.addWidget(QLineEdit(), 2, 0)
-        grid.addWidget(QLineEdit(), 2, 1)
+        addField()
+        addField()
         dlgLayout.addLayout(grid)
 
         # create buttons
@@ -435,17 +1107,26 @@ class Dialog():
 
         # data = [ [key,val,bool], [key,val,bool], ... ]
         # key = keyText
-        # val = valText
+        # val = json value, edited with a ValueEditor
         # bool = True(show both key-val pair), False(show only key) in dialog
 
         def acceptHandler():
+            values = {}
+            for row in range(grid.rowCount()):
+                valItem = grid.itemAtPosition(row,1)
+                if( valItem is None ):
+                    continue
+                try:
+                    values[row] = valItem.widget().value()
+                except ValueError as e:
+                    QMessageBox.warning(dlg, "Invalid Value", f"{data[row][0]} : {e}")
+                    return
+
             for row in range(grid.rowCount()):
                 keyItem = grid.itemAtPosition(row,0)
                 data[row][0] = keyItem.widget().text()
-                
-                valItem = grid.itemAtPosition(row,1)
-                if( valItem is not None ):
-                    data[row][1] = valItem.widget().text()
+                if( row in values ):
+                    data[row][1] = values[row]
 
             dlg.accept()
 
@@ -458,8 +1139,11 @@ class Dialog():
         for index,itemData in enumerate(data):
             grid.addWidget(QLineEdit(itemData[0]), index, 0)
             if( itemData[2] ):
-                grid.addWidget(QLineEdit(itemData[1]), index, 1)
+                valEditor = ValueEditor()
+                valEditor.setValue(itemData[1])
+                grid.addWidget(valEditor, index, 1)
         dlgLayout.addLayout(grid)
+        profiler.count("widgets", grid.count())
 
         # create buttons
         buttons = QDialogButtonBox()
@@ -495,6 +1179,18 @@ class Dialog():
 
         return (selectedButton == QMessageBox.Ok)
 
+    @staticmethod
+    def expandAllConfirmDialog(parent : UI, count : int) -> bool:
+        selectedButton = QMessageBox.warning(
+            parent,
+            "Expand All",
+            f"The file has more than {count} items, expanding all of them may take a while!",
+            (QMessageBox.Ok | QMessageBox.Cancel),
+            QMessageBox.Cancel
+        )
+
+        return (selectedButton == QMessageBox.Ok)
+
     @staticmethod
     def showShortcuts(parent : UI) -> None:
         dlg = QDialog(parent)
@@ -507,15 +1203,25 @@ class Dialog():
             ("Open", "Ctrl + O"),
             ("Save", "Ctrl + S"),
             ("Save As", "Ctrl + Shift + S"),
+            ("Reload from Disk", "F5"),
+            ("Undo", "Ctrl + Z"),
+            ("Redo", "Ctrl + Shift + Z"),
             ("Delete", "del"),
             ("Insert", "Ctrl + I"),
             ("Replace", "Ctrl + R"),
+            ("Find and Replace", "Ctrl + H"),
             ("Select All", "Ctrl + A"),
             ("Unselect All", "Ctrl + Shift + A"),
             ("Collapse All", "Ctrl + Tab"),
             ("Expand All", "Ctrl + Shift + Tab"),
             ("Hide Values", "Ctrl + Shift + V"),
-            ("Show Values", "Ctrl + Shift + B")
+            ("Show Values", "Ctrl + Shift + B"),
+            ("Array as Table", "Ctrl + T"),
+            ("Find", "Ctrl + F"),
+            ("Next Match", "Enter"),
+            ("Filter", "Ctrl + Shift + F"),
+            ("Query", "Ctrl + Shift + Q"),
+            ("Check Query Matches", "Enter")
         ]
 
         for row,item in enumerate(shortcuts):
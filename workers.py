@@ -0,0 +1,469 @@
+import gc
+import multiprocessing
+import os
+import pickle
+import struct
+import threading
+import time
+
+from PySide6.QtCore import (
+    QThread,
+    Signal
+)
+
+from model import (
+    Model,
+    CODEC,
+    splitData,
+    joinData
+)
+from cache import (
+    DocumentCache,
+    contentHash
+)
+from journal import recoverData
+from compare import (
+    diffData,
+    buildDiffTree
+)
+
+# seconds between two checks of the cancel flag while waiting on the worker
+POLL_INTERVAL = 0.05
+# byte size of each pickled piece of a payload, see packPayload
+PIECE_HEADER = struct.Struct("<Q")
+
+
+# loaders unpacking a payload, the cyclic garbage collector is off while
+# there are any, see unpackPayload
+_unpacking = 0
+_unpackingLock = threading.Lock()
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def packPayload(data) -> bytes:
+    '''
+    Parsed data as it crosses from a loader process to the GUI process and
+    into the cache: the pieces of model.splitData pickled one by one, each
+    after its byte size.
+    '''
+    parts = []
+    for piece in splitData(data):
+        pickled = pickle.dumps(piece, pickle.HIGHEST_PROTOCOL)
+        parts.append(PIECE_HEADER.pack(len(pickled)))
+        parts.append(pickled)
+    return b"".join(parts)
+
+
+def unpackPayload(payload : bytes, isCancelled=None):
+    '''
+    Data of a payload made by packPayload, unpickled one piece at a time.
+    Unpickling holds the GIL for its whole call, one call for the whole
+    document would freeze the GUI thread for as long, between pieces it
+    gets the GIL back. Returns None once isCancelled() is true.
+
+    The cyclic garbage collector would walk every object made so far again
+    and again, holding the GIL for longer and longer, so it is off until the
+    last unpack running finishes.
+    '''
+    global _unpacking
+    def pieces(view):
+        position = 0
+        while( position < len(view) ):
+            if( isCancelled is not None and isCancelled() ):
+                raise _Cancelled()
+            size, = PIECE_HEADER.unpack_from(view, position)
+            position += PIECE_HEADER.size
+            yield pickle.loads(view[position:position + size])
+            position += size
+
+    with _unpackingLock:
+        _unpacking += 1
+        gc.disable()
+    try:
+        with memoryview(payload) as view:
+            try:
+                return joinData(pieces(view))
+            except _Cancelled:
+                return None
+    finally:
+        with _unpackingLock:
+            _unpacking -= 1
+            if( _unpacking == 0 ):
+                gc.enable()
+
+
+def _loadPayload(filePath : str, cacheDir : str, progress=None, parsing=None) -> tuple:
+    '''
+    Read filePath and return (Model.diskStat, packPayload of the document),
+    the payload taken from the cache (cacheDir, None for no cache) if it
+    holds the same content. parsing() is called before a parse, progress as in
+    Model.readBytes.
+    '''
+    fileStat = os.stat(filePath)
+    data = Model.readBytes(filePath, progress)
+    payload = None
+    if( cacheDir is not None ):
+        cache = DocumentCache(cacheDir)
+        digest = contentHash(data)
+        payload = cache.load(filePath, fileStat, digest)
+    if( payload is None ):
+        if( parsing is not None ):
+            parsing()
+        fileDataDict = CODEC.loads(data)
+        del data
+        payload = packPayload(fileDataDict)
+        del fileDataDict
+        if( cacheDir is not None ):
+            cache.store(filePath, fileStat, digest, payload)
+    return ( fileStat.st_mtime_ns, fileStat.st_size ), payload
+
+
+def _loadInProcess(filePath : str, conn, cacheDir : str) -> None:
+    '''
+    Entry point of the loader process. Every message sent back is a tuple
+    whose first element is its kind: progress, parsing, loaded or failed.
+    "loaded" carries the Model.diskStat of the file read and is followed by
+    the packPayload of the document as raw bytes, so a document found in
+    the cache is never unpickled here. Any exception is sent as failed, e.g.
+    the RecursionError of pickling deeply nested data, see _loadInPool.
+    '''
+    def progress(bytesRead : int, totalBytes : int) -> None:
+        percent = 100 if totalBytes == 0 else (100 * bytesRead) // totalBytes
+        conn.send(("progress", percent))
+
+    try:
+        diskStat, payload = _loadPayload(filePath, cacheDir, progress, lambda: conn.send(("parsing",)))
+        conn.send(("loaded", diskStat))
+        conn.send_bytes(payload)
+    except Exception as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def _loadInPool(job : tuple) -> tuple:
+    '''
+    Task of a FileBatchLoader pool: (filePath, cacheDir) to (filePath,
+    diskStat, payload, error), error None unless the file could not be read.
+    Any exception is returned, one raised out of a task would end the whole
+    batch, e.g. the RecursionError of pickling deeply nested data.
+    '''
+    filePath, cacheDir = job
+    try:
+        diskStat, payload = _loadPayload(filePath, cacheDir)
+    except Exception as e:
+        return ( filePath, None, None, f"{type(e).__name__}: {e}" )
+    return ( filePath, diskStat, payload, None )
+
+
+class FileLoader(QThread):
+    '''
+    Reads and parses a json file in a separate process so neither the read
+    nor json.loads (which holds the GIL) blocks the GUI thread. The parsed
+    data comes back in pieces, see unpackPayload, so unpickling it does not
+    block the GUI thread for long either. Killing the process makes cancel
+    immediate even in the middle of parsing.
+    '''
+    progress = Signal(int)
+    parsing = Signal()
+    loaded = Signal(str, object)
+    failed = Signal(str, str)
+    cancelled = Signal(str)
+
+    def __init__(self, filePath : str, cacheDir : str = None, parent=None):
+        super().__init__(parent)
+        self.filePath = filePath
+        self.cacheDir = cacheDir
+        self._cancelRequested = False
+        # (name, start, end) of the read, parse and transfer phases, for the profiler
+        self.phases = []
+        self.threadId = None
+        # Model.diskStat of the file as it was read
+        self.diskStat = None
+
+    def cancel(self) -> None:
+        self._cancelRequested = True
+
+    def run(self) -> None:
+        self.threadId = threading.get_ident()
+        start = parseStart = time.perf_counter()
+        ctx = multiprocessing.get_context("spawn")
+        recvConn, sendConn = ctx.Pipe(duplex=False)
+        process = ctx.Process(target=_loadInProcess, args=(self.filePath, sendConn, self.cacheDir), daemon=True)
+        process.start()
+        sendConn.close()
+
+        try:
+            while( True ):
+                if( self._cancelRequested ):
+                    process.terminate()
+                    self.cancelled.emit(self.filePath)
+                    return
+
+                if( not recvConn.poll(POLL_INTERVAL) ):
+                    continue
+
+                try:
+                    message = recvConn.recv()
+                except EOFError:
+                    self.failed.emit(self.filePath, "Loader process exited unexpectedly.")
+                    return
+
+                kind = message[0]
+                if( kind == "progress" ):
+                    self.progress.emit(message[1])
+                elif( kind == "parsing" ):
+                    parseStart = time.perf_counter()
+                    self.phases.append(("read", start, parseStart))
+                    self.parsing.emit()
+                elif( kind == "loaded" ):
+                    self.diskStat = message[1]
+                    transferStart = time.perf_counter()
+                    if( parseStart == start ):
+                        # found in the cache, nothing was parsed
+                        self.phases.append(("read", start, transferStart))
+                    else:
+                        self.phases.append(("parse", parseStart, transferStart))
+                    try:
+                        payload = recvConn.recv_bytes()
+                    except EOFError:
+                        self.failed.emit(self.filePath, "Loader process exited unexpectedly.")
+                        return
+                    try:
+                        fileDataDict = unpackPayload(payload, lambda: self._cancelRequested)
+                    except Exception as e:
+                        self.failed.emit(self.filePath, f"{type(e).__name__}: {e}")
+                        return
+                    del payload
+                    if( fileDataDict is None ):
+                        self.cancelled.emit(self.filePath)
+                        return
+                    self.phases.append(("transfer", transferStart, time.perf_counter()))
+                    self.loaded.emit(self.filePath, fileDataDict)
+                    return
+                elif( kind == "failed" ):
+                    self.failed.emit(self.filePath, message[1])
+                    return
+        finally:
+            recvConn.close()
+            process.join()
+
+
+class FileBatchLoader(QThread):
+    '''
+    Reads and parses several json files at once in a pool of processes, one
+    per core at most. Each file is reported as soon as it is parsed, in the
+    order they finish, and terminating the pool makes cancel immediate.
+    '''
+    progress = Signal(int)
+    loaded = Signal(str, object)
+    failed = Signal(str, str)
+    cancelled = Signal()
+
+    def __init__(self, filePaths : list, cacheDir : str = None, parent=None):
+        super().__init__(parent)
+        self.filePaths = filePaths
+        self.cacheDir = cacheDir
+        self._cancelRequested = False
+        # filePath to the Model.diskStat of the file as it was read, and to
+        # its (name, start, end) phases for the profiler
+        self.diskStats = {}
+        self.phases = {}
+        self.threadId = None
+        self.startTime = None
+        # whether the pool was terminated before every file was loaded
+        self.wasCancelled = False
+
+    def cancel(self) -> None:
+        self._cancelRequested = True
+
+    def run(self) -> None:
+        self.threadId = threading.get_ident()
+        self.startTime = time.perf_counter()
+        ctx = multiprocessing.get_context("spawn")
+        processCount = max(1, min(os.cpu_count() or 1, len(self.filePaths)))
+        pool = ctx.Pool(processCount)
+        try:
+            jobs = [ ( filePath, self.cacheDir ) for filePath in self.filePaths ]
+            results = pool.imap_unordered(_loadInPool, jobs)
+            done = 0
+            while( done < len(jobs) ):
+                if( self._cancelRequested ):
+                    self.wasCancelled = True
+                    self.cancelled.emit()
+                    return
+                try:
+                    filePath, diskStat, payload, error = results.next(POLL_INTERVAL)
+                except multiprocessing.TimeoutError:
+                    continue
+                done += 1
+                if( error is None ):
+                    transferStart = time.perf_counter()
+                    try:
+                        fileDataDict = unpackPayload(payload, lambda: self._cancelRequested)
+                    except Exception as e:
+                        error = f"{type(e).__name__}: {e}"
+                    del payload
+                    if( error is None and fileDataDict is None ):
+                        # cancelled while unpickling
+                        continue
+                if( error is not None ):
+                    self.failed.emit(filePath, error)
+                else:
+                    self.diskStats[filePath] = diskStat
+                    self.phases[filePath] = [
+                        ( "read and parse", self.startTime, transferStart ),
+                        ( "transfer", transferStart, time.perf_counter() )
+                    ]
+                    self.loaded.emit(filePath, fileDataDict)
+                self.progress.emit((100 * done) // len(jobs))
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+class FileSaver(QThread):
+    '''
+    Serializes a tab and writes it atomically off the GUI thread. dataDict
+    is json data or a model.DocumentView, so the tab stays editable.
+    '''
+    saved = Signal()
+    failed = Signal(str)
+
+    def __init__(self, tabData, filePath : str, dataDict : dict, isSaveAs : bool, indent : int, operation=None, parent=None):
+        super().__init__(parent)
+        self.tabData = tabData
+        self.filePath = filePath
+        self.dataDict = dataDict
+        self.isSaveAs = isSaveAs
+        self.indent = indent
+        self.editCount = tabData.editCount
+        # profiler operation of this save, ended by the owner
+        self.operation = operation
+        self.timings = {}
+        self.startTime = None
+        self.threadId = None
+        # Model.diskStat of the written file
+        self.diskStat = None
+
+    def run(self) -> None:
+        self.threadId = threading.get_ident()
+        self.startTime = time.perf_counter()
+        try:
+            Model.writeFile(self.filePath, self.dataDict, self.timings, self.indent)
+            self.diskStat = Model.diskStat(self.filePath)
+        except (OSError, ValueError, TypeError) as e:
+            self.failed.emit(str(e))
+        else:
+            self.saved.emit()
+        finally:
+            # the snapshot can be large, do not keep it alive with the thread object
+            self.dataDict = None
+
+
+class SnapshotWriter(QThread):
+    '''
+    Writes a compaction snapshot of a tab for its edit journal, dataDict
+    being as for FileSaver. error is None once run() succeeded.
+    '''
+    def __init__(self, filePath : str, dataDict : dict, parent=None):
+        super().__init__(parent)
+        self.filePath = filePath
+        self.dataDict = dataDict
+        self.error = None
+
+    def run(self) -> None:
+        try:
+            Model.writeFile(self.filePath, self.dataDict, indent=None)
+        except (OSError, ValueError, TypeError) as e:
+            self.error = str(e)
+        finally:
+            self.dataDict = None
+
+
+class JournalRecovery(QThread):
+    '''
+    Rebuilds the data of a tab from the edit journal it left behind, see
+    journal.recoverData.
+    '''
+    recovered = Signal(object, object)
+    failed = Signal(object, str)
+
+    def __init__(self, journalDir : str, meta : dict, parent=None):
+        super().__init__(parent)
+        self.journalDir = journalDir
+        self.meta = meta
+
+    def run(self) -> None:
+        try:
+            dataDict = recoverData(self.journalDir, self.meta)
+        except (OSError, ValueError, KeyError) as e:
+            self.failed.emit(self.meta, str(e))
+        else:
+            self.recovered.emit(self.meta, dataDict)
+
+
+class IndexBuilder(QThread):
+    '''
+    Builds the search index of a tab from its parsed data. The index queues
+    edits made meanwhile, the owner calls SearchIndex.finishBuild once the
+    thread is finished.
+    '''
+    def __init__(self, searchIndex, dataDict : dict, parent=None):
+        super().__init__(parent)
+        self.searchIndex = searchIndex
+        self.dataDict = dataDict
+
+    def run(self) -> None:
+        try:
+            self.searchIndex.build(self.dataDict)
+        finally:
+            self.dataDict = None
+
+
+class CompareWorker(QThread):
+    '''
+    Diffs two documents, see compare.diffData. differences, truncated and
+    root, their compare.buildDiffTree, are set once run() is done.
+    '''
+    def __init__(self, leftData, rightData, parent=None):
+        super().__init__(parent)
+        self.leftData = leftData
+        self.rightData = rightData
+        self.differences = []
+        self.truncated = False
+        self.root = None
+        self.startTime = None
+        self.endTime = None
+        self.threadId = None
+
+    def run(self) -> None:
+        self.threadId = threading.get_ident()
+        self.startTime = time.perf_counter()
+        try:
+            self.differences, self.truncated = diffData(self.leftData, self.rightData)
+            self.root = buildDiffTree(self.differences)
+        finally:
+            self.leftData = self.rightData = None
+            self.endTime = time.perf_counter()
+
+
+class SchemaValidation(QThread):
+    '''
+    Validates the data of a tab against its schema, see
+    schema.SchemaChecker.build. The owner calls SchemaChecker.finishBuild
+    once the thread is finished.
+    '''
+    def __init__(self, schemaChecker, dataDict : dict, parent=None):
+        super().__init__(parent)
+        self.schemaChecker = schemaChecker
+        self.dataDict = dataDict
+
+    def run(self) -> None:
+        try:
+            self.schemaChecker.build(self.dataDict)
+        finally:
+            self.dataDict = None